@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+
+# measures how long the hot paths of glman take, so that we can catch it when
+# a change makes them slower. It covers parsing glib files, culling, building
+# shapes, loading meshes, and drawing frames of the scenes in testShaders.
+#
+#   python benchmarks/benchmark.py --output results.json
+#   python benchmarks/benchmark.py --save-baseline benchmarks/baseline.json
+#   python benchmarks/benchmark.py --baseline benchmarks/baseline.json
+#
+# the OpenGL benchmarks draw the same way as headless rendering, so on a
+# machine without a display they draw with EGL, and without a graphics card
+# Mesa draws them with llvmpipe
+
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import tempfile
+import itertools
+import statistics
+
+import numpy as np
+
+repositoryDirectory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repositoryDirectory, "src", "main", "python"))
+
+# PyOpenGL picks between EGL and the window system when it is first imported,
+# which the modules we measure do
+import headless
+headless.chooseOpenGL(any([argument.startswith("--platform") for argument in sys.argv]))
+
+import glib
+import meshes
+import loaders
+import culling
+import transforms
+
+# run a function until we have enough samples, and return the median and
+# fastest time of a single run in milliseconds
+def measure(function, minimumRuns=5, minimumSeconds=0.5):
+    samples = []
+    startTime = time.perf_counter()
+    while len(samples) < minimumRuns or time.perf_counter() - startTime < minimumSeconds:
+        runStart = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - runStart) * 1000.0)
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "runs": len(samples)
+    }
+
+# write out a glib file with a lot of programs, uniform variables and shapes
+def makeSyntheticGLIB(directory, shapeCount, uniformCount):
+    glibFile = os.path.join(directory, "synthetic_{0}_{1}.glib".format(shapeCount, uniformCount))
+    with open(glibFile, 'w') as f:
+        f.write("vertex synthetic\n")
+        f.write("fragment synthetic\n")
+        # spread the uniform variables over programs of 100 variables each
+        for programNumber in range(0, uniformCount, 100):
+            f.write("program Program{0} {{\n".format(programNumber))
+            for variableNumber in range(programNumber, min(programNumber + 100, uniformCount)):
+                f.write("  u{0} <0.0 0.5 1.0>\n".format(variableNumber))
+            f.write("}\n")
+        for shapeNumber in range(shapeCount):
+            if shapeNumber % 2 == 0:
+                f.write("cube .5 .5 .5\n")
+            else:
+                f.write("sphere 1 32 32\n")
+    return glibFile
+
+def parsingBenchmarks(results):
+    directory = tempfile.mkdtemp()
+    for shapeCount, uniformCount in ((1000, 100), (10000, 1000), (50000, 5000)):
+        glibFile = makeSyntheticGLIB(directory, shapeCount, uniformCount)
+        label = "{0} lines, {1} uniforms".format(shapeCount, uniformCount)
+
+        results["parseGLIB " + label] = measure(lambda: glib.parseGLIB(glibFile))
+
+        # reading the file again, when none of it or one line of it changed
+        parser = glib.GLIBParser()
+        parser.parse(glibFile)
+        results["reparse unchanged " + label] = measure(lambda: parser.parse(glibFile))
+
+        # two copies of the file that differ in their last line, so every run
+        # reads the one the last run did not and has one line to parse
+        changedFiles = []
+        for size in (3, 4):
+            changedFile = glibFile.replace(".glib", "_box{0}.glib".format(size))
+            with open(glibFile) as f, open(changedFile, 'w') as changed:
+                changed.write(f.read() + "box 1 2 {0}\n".format(size))
+            changedFiles.append(changedFile)
+        parser.parse(changedFiles[1])
+        nextFile = itertools.cycle(changedFiles)
+        results["reparse one line changed " + label] = measure(lambda: parser.parse(next(nextFile)))
+
+# batching a scene of shapes spread over a grid by translate lines, and
+# culling it against a view that only sees some of them
+def cullingBenchmarks(results):
+    directory = tempfile.mkdtemp()
+    for side in (32, 100):
+        glibFile = os.path.join(directory, "placed_{0}.glib".format(side))
+        with open(glibFile, 'w') as f:
+            for row in range(side):
+                f.write("translate 0 {0} 0\n".format(1 if row else -side / 2.0))
+                for column in range(side):
+                    f.write("translate {0} 0 0\n".format(1 if column else -side / 2.0 if row == 0 else 1 - side))
+                    f.write("sphere .4 16 16\n" if (row + column) % 2 else "cube .5 .5 .5\n")
+        drawPlan = glib.parseGLIB(glibFile).drawPlan
+        label = "{0} shapes".format(side * side)
+
+        results["batchDrawPlan " + label] = measure(lambda: culling.batchDrawPlan(drawPlan))
+        centers, radii = culling.boundingSpheres(culling.batchDrawPlan(drawPlan))
+        view = transforms.ortho(-8.0, 8.0, -8.0, 8.0, 0.01, 1000.0) @ transforms.translate(0.0, 0.0, -10.0)
+        results["visibleShapes " + label] = measure(lambda: culling.visibleShapes(centers, radii, view))
+
+def tessellationBenchmarks(results):
+    for resolution in (16, 64, 256, 512):
+        results["sphereMesh {0}x{0}".format(resolution)] = measure(lambda: meshes.sphereMesh(1.0, resolution, resolution))
+
+# reading big meshes from files, the first time and from the cache after
+def meshLoadingBenchmarks(results):
+    directory = tempfile.mkdtemp()
+    mesh = meshes.sphereMesh(1.0, 512, 512)
+    triangles = mesh.indices.reshape(-1, 3) + 1
+    label = "{0} triangles".format(len(triangles))
+
+    objFile = os.path.join(directory, "sphere.obj")
+    with open(objFile, 'w') as f:
+        np.savetxt(f, mesh.positions, fmt='v %.6f %.6f %.6f')
+        np.savetxt(f, mesh.normals, fmt='vn %.6f %.6f %.6f')
+        np.savetxt(f, np.repeat(triangles, 2, axis=1), fmt='f %d//%d %d//%d %d//%d')
+
+    plyFile = os.path.join(directory, "sphere.ply")
+    vertices = np.hstack((mesh.positions, mesh.normals)).astype('<f4')
+    faces = np.zeros(len(triangles), dtype=[("corners", "u1"), ("indices", "<i4", (3,))])
+    faces["corners"] = 3
+    faces["indices"] = triangles - 1
+    with open(plyFile, 'wb') as f:
+        f.write("ply\nformat binary_little_endian 1.0\nelement vertex {0}\n".format(len(vertices)).encode('ascii'))
+        for name in ("x", "y", "z", "nx", "ny", "nz"):
+            f.write("property float {0}\n".format(name).encode('ascii'))
+        f.write("element face {0}\nproperty list uchar int vertex_indices\nend_header\n".format(len(faces)).encode('ascii'))
+        f.write(vertices.tobytes())
+        f.write(faces.tobytes())
+
+    results["loadOBJ " + label] = measure(lambda: loaders.loadOBJ(objFile), minimumRuns=3)
+    results["loadPLY " + label] = measure(lambda: loaders.loadPLY(plyFile))
+    loaders.loadMesh(objFile)
+    results["loadMesh cached " + label] = measure(lambda: loaders.loadMesh(objFile))
+
+# the benchmarks that need an OpenGL context, which we borrow from a hidden
+# MakeGLWidget. Returns False if we could not get a context
+def openglBenchmarks(results, platform, frames):
+    headless.startWorker(platform)
+
+    import OpenGL.GL as gl
+    import shapes
+
+    try:
+        glWidget = headless.makeWidget()
+    except RuntimeError:
+        return False
+    glWidget.resize(512, 512)
+    glWidget.grabFramebuffer()
+    if not glWidget.isValid():
+        return False
+
+    # building shapes, deleting each one so we do not run out of memory
+    def build(function, *arguments):
+        gl.glDeleteLists(function(*arguments), 1)
+
+    glWidget.makeCurrent()
+    results["shapes.cube"] = measure(lambda: build(shapes.cube, 1.0, 1.0, 1.0))
+    for resolution in (16, 64, 256, 512):
+        results["shapes.sphere {0}x{0}".format(resolution)] = measure(lambda: build(shapes.sphere, 1.0, resolution, resolution))
+    glWidget.doneCurrent()
+
+    # steady state frame times for every scene we ship
+    for glibFile in sorted(glob.glob(os.path.join(repositoryDirectory, "testShaders", "*", "*.glib"))):
+        glWidget.setGLIB(glibFile)
+        glWidget.loadGLIB()
+        glWidget.waitForProgram()
+        glWidget.waitForTextures()
+
+        def drawFrame():
+            glWidget.paintGL()
+            # wait for the graphics card so we measure the whole frame
+            gl.glFinish()
+
+        glWidget.makeCurrent()
+        # the first frames build the shapes, which is not the steady state
+        for x in range(3):
+            drawFrame()
+        results["paintGL " + os.path.basename(glibFile)] = measure(drawFrame, minimumRuns=frames)
+
+        # and again with the level of detail picking the tessellations
+        glWidget.setLevelOfDetail(True)
+        for x in range(3):
+            drawFrame()
+        results["paintGL lod " + os.path.basename(glibFile)] = measure(drawFrame, minimumRuns=frames)
+        glWidget.setLevelOfDetail(False)
+        glWidget.doneCurrent()
+
+    return True
+
+# returns a list of the benchmarks that got slower than the baseline by more
+# than the threshold
+def compareResults(results, baseline, threshold):
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            print("{0:<50} {1:10.3f} ms  (new)".format(name, result["median"]))
+            continue
+        baselineMedian = baseline[name]["median"]
+        change = (result["median"] - baselineMedian) / baselineMedian if baselineMedian > 0 else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print("{0:<50} {1:10.3f} ms  {2:+7.1%}{3}".format(name, result["median"], change, flag))
+    return regressions
+
+def main(arguments):
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths of glman.")
+    parser.add_argument("-o", "--output", help="write the results to this json file")
+    parser.add_argument("--baseline", help="compare the results against this json file")
+    parser.add_argument("--save-baseline", help="write the results to this json file to compare against later")
+    parser.add_argument("--threshold", type=float, default=0.2, help="how much slower than the baseline counts as a regression, 0.2 is 20%%")
+    parser.add_argument("--frames", type=int, default=100, help="how many frames to draw of each scene")
+    parser.add_argument("--skip-opengl", action="store_true", help="only run the benchmarks that do not need OpenGL")
+    parser.add_argument("--platform", help="the Qt platform to render with, like offscreen or eglfs")
+    options = parser.parse_args(arguments)
+
+    results = {}
+    parsingBenchmarks(results)
+    cullingBenchmarks(results)
+    tessellationBenchmarks(results)
+    meshLoadingBenchmarks(results)
+    if not options.skip_opengl and not openglBenchmarks(results, options.platform, options.frames):
+        print("Could not create an OpenGL context, skipping the OpenGL benchmarks")
+
+    for fileName in (options.output, options.save_baseline):
+        if fileName:
+            with open(fileName, 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+        regressions = compareResults(results, baseline, options.threshold)
+        if regressions:
+            print(len(regressions), "benchmarks got slower than the baseline")
+            return 1
+    elif not options.output and not options.save_baseline:
+        print(json.dumps(results, indent=2, sort_keys=True))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+
+# checks that the shaders still draw what they drew before. Every glib file in
+# testShaders is rendered, along with the sweeps over their uniform variables
+# in sweeps.json, and each image is compared against a golden image that was
+# rendered earlier and looked over by a person. The images that changed are
+# written to the output folder along with a heat map of where they changed.
+#
+#   python regression/regression.py --update
+#   python regression/regression.py --output failures
+#   python regression/regression.py --sweeps regression/sweeps.json --jobs 8
+#
+# the scenes are rendered the same way as headless rendering, so on a machine
+# without a display they are drawn with EGL, and without a graphics card Mesa
+# draws them with llvmpipe. Different graphics cards draw
+# slightly different pixels, so golden images should be made with --update on
+# the machine that runs the checks
+
+import os
+import sys
+import json
+import glob
+import argparse
+import itertools
+import multiprocessing
+
+import numpy as np
+
+regressionDirectory = os.path.dirname(os.path.abspath(__file__))
+repositoryDirectory = os.path.dirname(regressionDirectory)
+sys.path.insert(0, os.path.join(repositoryDirectory, "src", "main", "python"))
+
+import headless
+
+# how many images a worker process renders before it hands its results back.
+# The images of one glib file go to the same worker together, so the glib file
+# is only loaded and its shaders only compiled once for all of them
+casesPerJob = 32
+
+# the sRGB colors to CIE XYZ, and the XYZ of white, for comparing colors the
+# way people see them
+rgbToXYZ = np.array([
+    [0.4124, 0.3576, 0.1805],
+    [0.2126, 0.7152, 0.0722],
+    [0.0193, 0.1192, 0.9505]
+], dtype=np.float32)
+whitePoint = np.array([0.9505, 1.0, 1.0890], dtype=np.float32)
+
+# the glib files each worker process has loaded, by file
+widgets = {}
+
+# turn an image into rows of RGB bytes, top row first
+def imageToArray(image):
+    from PyQt5.QtGui import QImage
+
+    image = image.convertToFormat(QImage.Format_RGB888)
+    bits = image.constBits()
+    bits.setsize(image.byteCount())
+    rows = np.frombuffer(bits, dtype=np.uint8).reshape(image.height(), image.bytesPerLine())
+    # copy the pixels out, since the QImage owns the memory they are in
+    return np.array(rows[:, :image.width() * 3]).reshape(image.height(), image.width(), 3)
+
+def arrayToImage(pixels):
+    from PyQt5.QtGui import QImage
+
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    height, width = pixels.shape[:2]
+    # the QImage only borrows the pixels, so it has to copy them before they go
+    return QImage(pixels.data, width, height, width * 3, QImage.Format_RGB888).copy()
+
+# the pixels of an image file, or None if there is no such file
+def readImage(imageFile):
+    from PyQt5.QtGui import QImage
+
+    image = QImage(imageFile)
+    if image.isNull():
+        return None
+    return imageToArray(image)
+
+def writeImage(imageFile, pixels):
+    if not arrayToImage(pixels).save(imageFile):
+        raise IOError("Could not write " + imageFile)
+
+# the CIE L*a*b* color of every pixel, where a distance of about 2.3 is the
+# smallest difference people can see
+def srgbToLab(pixels):
+    rgb = pixels.astype(np.float32) / 255.0
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = np.dot(linear, rgbToXYZ.T) / whitePoint
+    f = np.where(xyz > (6.0 / 29.0) ** 3, np.cbrt(xyz), xyz / (3.0 * (6.0 / 29.0) ** 2) + 4.0 / 29.0)
+    return np.stack([
+        116.0 * f[..., 1] - 16.0,
+        500.0 * (f[..., 0] - f[..., 1]),
+        200.0 * (f[..., 1] - f[..., 2])
+    ], axis=-1)
+
+# the mean of every size x size window of an image, from the sums of the
+# image up to every pixel, so a window costs the same whatever its size
+def windowMeans(values, size):
+    sums = np.pad(values, ((1, 0), (1, 0)), mode="constant").cumsum(axis=0).cumsum(axis=1)
+    return (sums[size:, size:] - sums[:-size, size:] - sums[size:, :-size] + sums[:-size, :-size]) / float(size * size)
+
+# how alike the structure of two images is, from 1 when they are the same down
+# to 0, averaged over every 7x7 window of their lightness. A blur or a shifted
+# edge scores low even when the colors are close
+def structuralSimilarity(lightness, goldenLightness, size=7):
+    if min(lightness.shape) < size:
+        size = min(lightness.shape)
+    x = lightness.astype(np.float64) / 100.0
+    y = goldenLightness.astype(np.float64) / 100.0
+    meanX = windowMeans(x, size)
+    meanY = windowMeans(y, size)
+    varianceX = windowMeans(x * x, size) - meanX * meanX
+    varianceY = windowMeans(y * y, size) - meanY * meanY
+    covariance = windowMeans(x * y, size) - meanX * meanY
+    c1 = 0.01 ** 2
+    c2 = 0.03 ** 2
+    similarity = ((2.0 * meanX * meanY + c1) * (2.0 * covariance + c2)) / ((meanX * meanX + meanY * meanY + c1) * (varianceX + varianceY + c2))
+    return float(similarity.mean())
+
+# color the difference of every pixel from black through red and yellow to
+# white, which it reaches at four times the smallest visible difference
+def heatMap(deltaE, deltaETolerance):
+    heat = np.clip(deltaE / (4.0 * deltaETolerance), 0.0, 1.0)[..., np.newaxis]
+    ramp = np.clip(3.0 * heat - np.array([0.0, 1.0, 2.0]), 0.0, 1.0)
+    return (ramp * 255.0 + 0.5).astype(np.uint8)
+
+# compare an image against its golden image. Returns how they differ and
+# whether that is within the tolerances, along with the heat map
+def compareImages(pixels, golden, tolerances):
+    if pixels.shape != golden.shape:
+        return {
+            "passed": False,
+            "reason": "the image is {0}x{1} but the golden image is {2}x{3}".format(pixels.shape[1], pixels.shape[0], golden.shape[1], golden.shape[0])
+        }, None
+
+    # the difference of every pixel in its worst channel
+    difference = np.abs(pixels.astype(np.int16) - golden.astype(np.int16)).max(axis=-1)
+    differentPixels = float(np.count_nonzero(difference > tolerances["pixel"])) / difference.size
+
+    lab = srgbToLab(pixels)
+    goldenLab = srgbToLab(golden)
+    deltaE = np.sqrt(((lab - goldenLab) ** 2).sum(axis=-1))
+    visiblePixels = float(np.count_nonzero(deltaE > tolerances["deltaE"])) / deltaE.size
+    similarity = structuralSimilarity(lab[..., 0], goldenLab[..., 0])
+
+    reasons = []
+    if tolerances["strict"] and differentPixels > 0:
+        reasons.append("{0:.2%} of the pixels are off by more than {1}".format(differentPixels, tolerances["pixel"]))
+    if visiblePixels > tolerances["visible"]:
+        reasons.append("{0:.2%} of the pixels look different".format(visiblePixels))
+    if similarity < tolerances["similarity"]:
+        reasons.append("the structural similarity is {0:.4f}".format(similarity))
+
+    comparison = {
+        "passed": not reasons,
+        "reason": ", ".join(reasons),
+        "maxDifference": int(difference.max()),
+        "differentPixels": differentPixels,
+        "meanDeltaE": float(deltaE.mean()),
+        "visiblePixels": visiblePixels,
+        "similarity": similarity
+    }
+    return comparison, heatMap(deltaE, tolerances["deltaE"])
+
+# the values a sweep gives a uniform variable, either listed out or spread
+# evenly from one value to another
+def sweepValues(values):
+    if isinstance(values, dict):
+        return [float(value) for value in np.linspace(values["from"], values["to"], values["steps"])]
+    return [float(value) for value in values]
+
+# the scenes in testShaders/core are written for the core profile, with
+# #version 330 core shaders, and every other scene for the compatibility
+# profile, so each one is only checked with the profile it was written for
+def caseProfile(glibFile):
+    folder = os.path.basename(os.path.dirname(os.path.abspath(glibFile)))
+    return "core" if folder == "core" else "compatibility"
+
+# a name for an image that says which glib file and uniform values it is
+def caseName(glibFile, uniforms):
+    name = os.path.splitext(os.path.basename(glibFile))[0]
+    for uniformName, value in uniforms:
+        name += "_{0}={1:g}".format(uniformName, value)
+    return name
+
+# every image to check. That is every glib file in testShaders as it is, and
+# every combination of values in the sweeps, which look like
+#
+#   [{"glib": "../testShaders/lighting/lighting.glib",
+#     "uniforms": {"uKa": [0.0, 1.0], "uKd": {"from": 0.0, "to": 1.0, "steps": 5}}}]
+#
+# where the glib file is relative to the sweeps file. Then the glib files
+# that have to draw the same image as another one, which look like
+#
+#   [{"glib": "../testShaders/batching/batched.glib",
+#     "reference": "../testShaders/batching/alone.glib"}]
+#
+# where both are relative to the matches file
+def findCases(sweepsFile, matchesFile=None):
+    cases = []
+    for glibFile in sorted(glob.glob(os.path.join(repositoryDirectory, "testShaders", "*", "*.glib"))):
+        cases.append({"name": caseName(glibFile, []), "glib": glibFile, "uniforms": [], "profile": caseProfile(glibFile)})
+
+    if sweepsFile:
+        with open(sweepsFile) as f:
+            sweeps = json.load(f)
+        for sweep in sweeps:
+            glibFile = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(sweepsFile)), sweep["glib"]))
+            names = sorted(sweep["uniforms"])
+            for values in itertools.product(*[sweepValues(sweep["uniforms"][name]) for name in names]):
+                uniforms = list(zip(names, values))
+                cases.append({"name": caseName(glibFile, uniforms), "glib": glibFile, "uniforms": uniforms, "profile": caseProfile(glibFile)})
+
+    if matchesFile:
+        with open(matchesFile) as f:
+            matches = json.load(f)
+        for match in matches:
+            glibFile, referenceFile = [os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(matchesFile)), match[key])) for key in ("glib", "reference")]
+            name = caseName(glibFile, []) + "_matches_" + caseName(referenceFile, [])
+            cases.append({"name": name, "glib": glibFile, "uniforms": [], "profile": caseProfile(glibFile), "reference": referenceFile})
+
+    # two sweeps can reach the same values
+    uniqueCases = {}
+    for case in cases:
+        uniqueCases.setdefault(case["name"], case)
+    return list(uniqueCases.values())
+
+# a widget with the glib file loaded and its shaders compiled
+def loadWidget(glibFile, size):
+    if glibFile not in widgets:
+        widgets[glibFile] = headless.loadWidget(glibFile, size)
+    return widgets[glibFile]
+
+# render a case with every uniform variable it does not sweep at the value the
+# glib file gives it, since the widget is shared with the other cases. Every
+# program goes back to its own values, since programs can have variables with
+# the same name, while a swept variable is set in every program that has it
+def renderCase(case, options):
+    widget = loadWidget(case["glib"], options["size"])
+
+    uniformStores = [sceneProgram.uniformStore for sceneProgram in widget.scenePrograms if sceneProgram.uniformStore is not None]
+    sweptValues = dict(case["uniforms"])
+    for name in sweptValues:
+        if not any([name in uniformStore.variables for uniformStore in uniformStores]):
+            raise RuntimeError("Uniform Error: the glib file has no uniform variable called " + name)
+    for uniformStore in uniformStores:
+        for name, variable in uniformStore.declarations.items():
+            uniformStore.setValue(name, sweptValues.get(name, variable["value"]))
+
+    # the widget keeps its angles in sixteenths of a degree
+    for axis, angle in zip("xyz", options["rotation"]):
+        widget.setRotation(axis, int(round(angle * 16)))
+    widget.changeZoom(options["zoom"])
+
+    return imageToArray(widget.grabFramebuffer())
+
+# render and check a list of cases in a worker process. Returns what happened
+# to each of them
+def checkCases(job):
+    cases, options = job
+
+    results = []
+    for case in cases:
+        result = {"name": case["name"], "glib": case["glib"], "uniforms": case["uniforms"]}
+        results.append(result)
+        goldenFile = os.path.join(options["golden"], case["name"] + ".png")
+        try:
+            pixels = renderCase(case, options)
+
+            if "reference" in case:
+                # this case has to draw what another glib file draws, which is
+                # checked even when updating the golden images
+                golden = renderCase({"glib": case["reference"], "uniforms": []}, options)
+            elif options["update"]:
+                writeImage(goldenFile, pixels)
+                result["status"] = "updated"
+                continue
+            else:
+                golden = readImage(goldenFile)
+                if golden is None:
+                    result["status"] = "missing"
+                    result["reason"] = "there is no golden image, run with --update to make one"
+                    writeImage(os.path.join(options["output"], case["name"] + ".png"), pixels)
+                    continue
+
+            comparison, heat = compareImages(pixels, golden, options["tolerances"])
+            result.update(comparison)
+            result["status"] = "passed" if comparison["passed"] else "failed"
+            if not comparison["passed"]:
+                writeImage(os.path.join(options["output"], case["name"] + ".png"), pixels)
+                if heat is not None:
+                    writeImage(os.path.join(options["output"], case["name"] + "_diff.png"), heat)
+        except Exception as error:
+            result["status"] = "error"
+            result["reason"] = str(error)
+
+    return results
+
+# split the cases into jobs, keeping the cases of a glib file together
+def makeJobs(cases, options):
+    jobs = []
+    for glibFile, glibCases in itertools.groupby(sorted(cases, key=lambda case: case["glib"]), key=lambda case: case["glib"]):
+        glibCases = list(glibCases)
+        for start in range(0, len(glibCases), casesPerJob):
+            jobs.append((glibCases[start:start + casesPerJob], options))
+    return jobs
+
+def main(arguments):
+    parser = argparse.ArgumentParser(description="Check that the test shaders still render the same images.")
+    parser.add_argument("--sweeps", default=os.path.join(regressionDirectory, "sweeps.json"), help="a json file of uniform values to render the glib files with")
+    parser.add_argument("--matches", default=os.path.join(regressionDirectory, "matches.json"), help="a json file of glib files that have to draw the same image as another one")
+    parser.add_argument("--golden", default=os.path.join(regressionDirectory, "golden"), help="the folder the golden images are in")
+    parser.add_argument("-o", "--output", default="regression_output", help="the folder to write the images that changed and their heat maps into")
+    parser.add_argument("--update", action="store_true", help="render new golden images instead of checking against them")
+    parser.add_argument("-k", "--filter", help="only check the images with this in their name")
+    parser.add_argument("-s", "--size", type=headless.parseSize, default=(256, 256), help="the size of the images, like 256x256")
+    parser.add_argument("-r", "--rotation", type=headless.parseRotation, default=(23, 315, 1), help="x,y,z rotation in degrees")
+    parser.add_argument("-z", "--zoom", type=int, default=100, help="the zoom level, where 100 is normal size")
+    parser.add_argument("--pixel-tolerance", type=int, default=2, help="how far off a channel of a pixel can be before it counts as different, out of 255")
+    parser.add_argument("--strict", action="store_true", help="fail on any pixel that is further off than the pixel tolerance")
+    parser.add_argument("--delta-e", type=float, default=2.3, help="how far apart two colors can be in CIE L*a*b* before they look different")
+    parser.add_argument("--max-visible", type=float, default=0.001, help="the fraction of the pixels that can look different, 0.001 is 0.1%%")
+    parser.add_argument("--min-similarity", type=float, default=0.98, help="the lowest structural similarity that passes")
+    parser.add_argument("--report", help="write what happened to every image to this json file")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="how many processes to render with")
+    parser.add_argument("--platform", help="render through a Qt platform, like xcb or eglfs, instead of EGL when there is no display")
+    parser.add_argument("--core", action="store_true", help="render with an OpenGL 3.3 core profile context")
+    options = parser.parse_args(arguments)
+
+    cases = findCases(options.sweeps if os.path.isfile(options.sweeps) else None, options.matches if os.path.isfile(options.matches) else None)
+    profile = "core" if options.core else "compatibility"
+    cases = [case for case in cases if case["profile"] == profile]
+    if options.filter:
+        cases = [case for case in cases if options.filter in case["name"]]
+    if not cases:
+        print("There are no images to check")
+        return 1
+
+    # the cases that match another glib file write their failures to the
+    # output folder even when updating
+    for directory in (options.golden if options.update else None, options.output):
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    checkOptions = {
+        "golden": options.golden,
+        "output": options.output,
+        "update": options.update,
+        "size": options.size,
+        "rotation": options.rotation,
+        "zoom": options.zoom,
+        "tolerances": {
+            "pixel": options.pixel_tolerance,
+            "strict": options.strict,
+            "deltaE": options.delta_e,
+            "visible": options.max_visible,
+            "similarity": options.min_similarity
+        }
+    }
+    jobs = makeJobs(cases, checkOptions)
+
+    # every process gets its own Qt application and OpenGL context, spawned
+    # fresh since Qt does not survive being forked
+    headless.chooseOpenGL(options.platform)
+    processes = max(1, min(options.jobs, len(jobs)))
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with context.Pool(processes, initializer=headless.startWorker, initargs=(options.platform, options.core)) as pool:
+        for jobResults in pool.imap_unordered(checkCases, jobs):
+            for result in jobResults:
+                results.append(result)
+                if result["status"] in ("failed", "missing", "error"):
+                    print("{0:<50} {1}: {2}".format(result["name"], result["status"].upper(), result["reason"]))
+
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    print(", ".join("{0} {1}".format(count, status) for status, count in sorted(counts.items())))
+
+    if options.report:
+        with open(options.report, 'w') as f:
+            json.dump(sorted(results, key=lambda result: result["name"]), f, indent=2)
+
+    return 1 if len(results) != counts.get("passed", 0) + counts.get("updated", 0) else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,73 @@
+import ctypes
+
+import numpy as np
+
+import OpenGL.GL as gl
+
+from programs import PendingProgram
+
+# the axes for the core profile, where there are no display lists or
+# glBegin, so the lines live in a vertex array and are drawn with their own
+# little shader program. They look just like MakeGLWidget.Arrow
+
+# a line from the middle out half a unit along each axis, bright for the
+# positive direction and dark for the negative one. Each vertex is a position
+# and a color
+axisLines = np.array([
+    [0, 0, 0, 1, 0, 0], [ .5, 0, 0, 1, 0, 0],
+    [0, 0, 0, .2, 0, 0], [-.5, 0, 0, .2, 0, 0],
+    [0, 0, 0, 0, 1, 0], [0,  .5, 0, 0, 1, 0],
+    [0, 0, 0, 0, .2, 0], [0, -.5, 0, 0, .2, 0],
+    [0, 0, 0, 0, 0, 1], [0, 0,  .5, 0, 0, 1],
+    [0, 0, 0, 0, 0, .2], [0, 0, -.5, 0, 0, .2]
+], dtype=np.float32)
+
+axesVertexShader = """#version 330 core
+uniform mat4 uModelViewProjectionMatrix;
+in vec3 aPosition;
+in vec3 aColor;
+out vec3 vColor;
+
+void main() {
+  vColor = aColor;
+  gl_Position = uModelViewProjectionMatrix * vec4(aPosition, 1.0);
+}
+"""
+
+axesFragmentShader = """#version 330 core
+in vec3 vColor;
+out vec4 fragColor;
+
+void main() {
+  fragColor = vec4(vColor, 1.0);
+}
+"""
+
+# these need an OpenGL context to be current
+class CoreAxes(object):
+    def __init__(self):
+        super(CoreAxes, self).__init__()
+        shaderSources = [(gl.GL_VERTEX_SHADER, axesVertexShader), (gl.GL_FRAGMENT_SHADER, axesFragmentShader)]
+        self.program = PendingProgram("axes", shaderSources, attributeLocations={"aPosition": 0, "aColor": 1}).finish()
+        self.matrixLocation = gl.glGetUniformLocation(self.program, "uModelViewProjectionMatrix")
+
+        self.vertexArray = int(gl.glGenVertexArrays(1))
+        gl.glBindVertexArray(self.vertexArray)
+        self.vertexBuffer = int(gl.glGenBuffers(1))
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vertexBuffer)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, axisLines, gl.GL_STATIC_DRAW)
+        # each vertex is three floats of position and then three of color
+        gl.glEnableVertexAttribArray(0)
+        gl.glVertexAttribPointer(0, 3, gl.GL_FLOAT, gl.GL_FALSE, 24, ctypes.c_void_p(0))
+        gl.glEnableVertexAttribArray(1)
+        gl.glVertexAttribPointer(1, 3, gl.GL_FLOAT, gl.GL_FALSE, 24, ctypes.c_void_p(12))
+        gl.glBindVertexArray(0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    def draw(self, modelViewProjection):
+        gl.glUseProgram(self.program)
+        # our matrices are written row by row, so OpenGL has to transpose them
+        gl.glUniformMatrix4fv(self.matrixLocation, 1, gl.GL_TRUE, modelViewProjection)
+        gl.glBindVertexArray(self.vertexArray)
+        gl.glDrawArrays(gl.GL_LINES, 0, len(axisLines))
+        gl.glBindVertexArray(0)
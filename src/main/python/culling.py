@@ -0,0 +1,109 @@
+import numpy as np
+
+import shapes
+import meshes
+
+# works out which shapes in a scene are on the screen, and merges shapes that
+# sit at the same place into batches that are drawn with a single call. Every
+# shape, and every batch, has a bounding sphere around it, and every frame the
+# whole scene is tested against the view at once with numpy, so a frame costs
+# about as much as what is on the screen rather than what is in the file
+
+# whether a shape can be merged into the shapes around it. Instanced shapes
+# are already drawn with one call, and meshes from files are big enough to be
+# drawn on their own
+def canBatch(command):
+    return "instances" not in command and command["name"] in shapes.shapeMeshes
+
+# the middle of a shape's bounding sphere, once it has been moved to its
+# position
+def worldCenter(command):
+    return tuple(position + center for position, center in zip(command["position"], command["center"]))
+
+# build the mesh of a batch, where every member is the name of a shape and the
+# arguments to build it with. The members all sit at the batch's position, so
+# their vertices stay where they would be if they were drawn on their own, and
+# shaders reading gl_Vertex see the same numbers either way
+def batchMesh(*members):
+    return meshes.mergeMeshes([shapes.shapeMeshes[name](*arguments) for name, arguments in members])
+
+# a draw command for several shapes at the same position merged into one. It
+# draws from a buffer like a mesh does, and its arguments are its members
+def makeBatch(commands):
+    centers = np.array([command["center"] for command in commands])
+    radii = np.array([command["radius"] for command in commands])
+    center = (centers.min(axis=0) + centers.max(axis=0)) / 2.0
+    return {
+        "name": "batch",
+        "function": None,
+        "mesh": batchMesh,
+        "arguments": tuple((command["name"], command["arguments"]) for command in commands),
+        # the shapes in the batch, for when the level of detail picks
+        # different arguments for them
+        "batched": commands,
+        # the shapes of a batch are all drawn with the same program
+        "program": commands[0]["program"],
+        "position": commands[0]["position"],
+        "center": tuple(float(value) for value in center),
+        "radius": float((np.linalg.norm(centers - center, axis=1) + radii).max())
+    }
+
+# split shapes into the groups that sit at the same position, in the order
+# the glib file first puts a shape at each position
+def positionGroups(commands):
+    groups = {}
+    for command in commands:
+        groups.setdefault(tuple(command["position"]), []).append(command)
+    return list(groups.values())
+
+# turn the draw plan of a glib file into the list of things to draw each
+# frame, where the shapes of every run that can be batched are merged into a
+# batch for each position they sit at.
+# Shapes drawn with different programs can not be merged, so the shapes of
+# each program are batched on their own
+def batchDrawPlan(drawPlan):
+    drawItems = []
+    run = []
+
+    def finishRun():
+        for group in positionGroups(run):
+            drawItems.append(makeBatch(group) if len(group) > 1 else group[0])
+        del run[:]
+
+    programs = {}
+    for command in drawPlan:
+        programs.setdefault(command["program"], []).append(command)
+
+    for commands in programs.values():
+        for command in commands:
+            if canBatch(command):
+                run.append(command)
+            else:
+                if run:
+                    finishRun()
+                drawItems.append(command)
+        if run:
+            finishRun()
+    return drawItems
+
+# the order to draw things in, so that everything drawn with the same program
+# is drawn together and the program only has to be switched to once, and the
+# same shapes are drawn one after another within each program. The shapes keep
+# the order of the glib file otherwise
+def sortDrawItems(drawItems):
+    return sorted(drawItems, key=lambda command: (command["program"], command["name"], repr(command["arguments"])))
+
+# the bounding spheres of everything we draw, packed into arrays
+def boundingSpheres(drawItems):
+    centers = np.array([worldCenter(command) for command in drawItems], dtype=np.float64).reshape(-1, 3)
+    radii = np.array([command["radius"] for command in drawItems], dtype=np.float64)
+    return centers, radii
+
+# which of the bounding spheres can be seen through modelViewProjection, which
+# has to keep w at 1 like glOrtho does. A sphere is kept if any of it is
+# inside the -1 to 1 cube that OpenGL draws
+def visibleShapes(centers, radii, modelViewProjection):
+    clip = centers @ modelViewProjection[:3, :3].T + modelViewProjection[:3, 3]
+    # how far the radius of a sphere reaches along each axis once projected
+    reach = np.outer(radii, np.linalg.norm(modelViewProjection[:3, :3], axis=1))
+    return (np.abs(clip) <= 1.0 + reach).all(axis=1)
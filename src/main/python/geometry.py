@@ -0,0 +1,175 @@
+import ctypes
+from collections import OrderedDict
+
+import numpy as np
+
+import OpenGL.GL as gl
+
+# free up the memory on the graphics card that a shape was using
+def deleteGeometry(geometry):
+    gl.glDeleteLists(geometry, 1)
+
+# where every vertex attribute lives in the core profile, where there is no
+# gl_Vertex, gl_Normal or gl_MultiTexCoord0. Every program is linked with its
+# attributes at these locations, so one vertex array works with any of them.
+# the instance matrix takes up four locations, one for each column
+attributeLocations = {
+    "aPosition": 0,
+    "aNormal": 1,
+    "aTexCoord": 2,
+    "aInstanceMatrix": 3
+}
+
+# the vertices and triangles of a mesh, kept in buffers on the graphics card so
+# that they can be drawn many times over in a single call. With the core
+# profile the buffers are drawn through a vertex array object, otherwise
+# through the fixed function vertex arrays
+class MeshBuffer(object):
+    def __init__(self, mesh, core=False):
+        super(MeshBuffer, self).__init__()
+        self.indexCount = len(mesh.indices)
+
+        # the vertex array remembers the buffers and where each attribute is
+        # in them, so drawing only has to bind it
+        self.vertexArray = None
+        if core:
+            self.vertexArray = int(gl.glGenVertexArrays(1))
+            gl.glBindVertexArray(self.vertexArray)
+
+        self.vertexBuffer = int(gl.glGenBuffers(1))
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vertexBuffer)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, mesh.interleaved(), gl.GL_STATIC_DRAW)
+
+        if core:
+            # each vertex is a texture coordinate, a normal and a position,
+            # 32 bytes in all, like GL_T2F_N3F_V3F
+            for name, size, offset in (("aTexCoord", 2, 0), ("aNormal", 3, 8), ("aPosition", 3, 20)):
+                location = attributeLocations[name]
+                gl.glEnableVertexAttribArray(location)
+                gl.glVertexAttribPointer(location, size, gl.GL_FLOAT, gl.GL_FALSE, 32, ctypes.c_void_p(offset))
+
+        self.indexBuffer = int(gl.glGenBuffers(1))
+        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, self.indexBuffer)
+        gl.glBufferData(gl.GL_ELEMENT_ARRAY_BUFFER, mesh.indices, gl.GL_STATIC_DRAW)
+
+        if core:
+            gl.glBindVertexArray(0)
+        else:
+            gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, 0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    # point the vertex attributes at our buffers. Without the core profile we
+    # use the same vertex layout as the display lists, so gl_Vertex, gl_Normal
+    # and gl_MultiTexCoord0 work just like they do for every other shape
+    def bindVertices(self):
+        if self.vertexArray is not None:
+            gl.glBindVertexArray(self.vertexArray)
+            return
+        gl.glPushClientAttrib(gl.GL_CLIENT_VERTEX_ARRAY_BIT)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vertexBuffer)
+        gl.glInterleavedArrays(gl.GL_T2F_N3F_V3F, 0, ctypes.c_void_p(0))
+        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, self.indexBuffer)
+
+    # put everything back the way it was
+    def unbindVertices(self):
+        if self.vertexArray is not None:
+            gl.glBindVertexArray(0)
+            return
+        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, 0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        gl.glPopClientAttrib()
+
+    def draw(self):
+        self.bindVertices()
+        gl.glDrawElements(gl.GL_TRIANGLES, self.indexCount, gl.GL_UNSIGNED_INT, ctypes.c_void_p(0))
+        self.unbindVertices()
+
+    # draw instanceCount copies of the mesh, each one moved by its own matrix
+    # from the instance buffer. The matrix is handed to the shader as the
+    # attribute at matrixLocation, and a mat4 attribute takes up four
+    # locations, one for each column
+    def drawInstanced(self, instanceBuffer, matrixLocation):
+        self.bindVertices()
+
+        if matrixLocation >= 0:
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, instanceBuffer.buffer)
+            for column in range(4):
+                gl.glEnableVertexAttribArray(matrixLocation + column)
+                gl.glVertexAttribPointer(matrixLocation + column, 4, gl.GL_FLOAT, gl.GL_FALSE, 64, ctypes.c_void_p(16 * column))
+                # move on to the next matrix once per copy instead of once per vertex
+                gl.glVertexAttribDivisor(matrixLocation + column, 1)
+
+        gl.glDrawElementsInstanced(gl.GL_TRIANGLES, self.indexCount, gl.GL_UNSIGNED_INT, ctypes.c_void_p(0), instanceBuffer.count)
+
+        if matrixLocation >= 0:
+            for column in range(4):
+                gl.glVertexAttribDivisor(matrixLocation + column, 0)
+                gl.glDisableVertexAttribArray(matrixLocation + column)
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        self.unbindVertices()
+
+    def release(self):
+        if self.vertexArray is not None:
+            gl.glDeleteVertexArrays(1, [self.vertexArray])
+        gl.glDeleteBuffers(2, [self.vertexBuffer, self.indexBuffer])
+
+# a matrix for every copy of an instanced shape, kept on the graphics card
+class InstanceBuffer(object):
+    def __init__(self, matrices):
+        super(InstanceBuffer, self).__init__()
+        self.count = len(matrices)
+        # OpenGL reads a matrix one column at a time, so swap the rows and
+        # columns of every matrix before we send them over
+        columns = np.ascontiguousarray(np.transpose(matrices, (0, 2, 1)), dtype=np.float32)
+
+        self.buffer = int(gl.glGenBuffers(1))
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.buffer)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, columns, gl.GL_STATIC_DRAW)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    def release(self):
+        gl.glDeleteBuffers(1, [self.buffer])
+
+# holds on to the display list that each shape function builds so that a shape
+# is only built once, no matter how many frames we draw it in. It can hold on
+# to buffers too, as long as it is told how to delete them.
+# shapes are looked up by their name and the arguments they were built with,
+# and the least recently used shapes are deleted once we hold more than
+# capacity of them. All of these functions need an OpenGL context to be current
+class GeometryRegistry(object):
+    def __init__(self, capacity=256):
+        super(GeometryRegistry, self).__init__()
+        self.capacity = capacity
+        # the built shapes, ordered from least to most recently used
+        self.entries = OrderedDict()
+        # how many times we reused a shape, and how many times we had to build one
+        self.hits = 0
+        self.misses = 0
+
+    # release is called with the shape once we no longer want it
+    def get(self, name, function, arguments, release=deleteGeometry):
+        key = (name, tuple(arguments))
+
+        if key in self.entries:
+            self.hits += 1
+            # mark the shape as the most recently used one
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+        self.misses += 1
+        geometry = function(*arguments)
+        self.entries[key] = (geometry, release)
+        self.evict()
+        return geometry
+
+    # delete the least recently used shapes until we are back under capacity
+    def evict(self):
+        while len(self.entries) > self.capacity:
+            key, (geometry, release) = self.entries.popitem(last=False)
+            release(geometry)
+
+    # delete every shape we are holding on to
+    def clear(self):
+        for geometry, release in self.entries.values():
+            release(geometry)
+        self.entries.clear()
@@ -0,0 +1,559 @@
+import os
+import re
+
+import shapes
+import instancing
+import loaders
+import passes
+
+# an error in the contents of a glib file, along with where in the file it is
+# if we know. Lines and columns count from 1 like in a text editor
+class GLIBError(Exception):
+    def __init__(self, message, line=None, column=None, glibFile=None):
+        super(GLIBError, self).__init__(message)
+        self.message = message
+        self.line = line
+        self.column = column
+        self.glibFile = glibFile
+
+    def __str__(self):
+        location = []
+        if self.glibFile:
+            location.append(os.path.basename(self.glibFile))
+        if self.line is not None:
+            location.append("line " + str(self.line))
+        if self.column is not None:
+            location.append("column " + str(self.column))
+        if not location:
+            return self.message
+        return ", ".join(location) + ": " + self.message
+
+tokenPattern = re.compile(r'\S+')
+
+# split a line by white space into a list of (column, text) pairs
+def tokenize(text):
+    return [(match.start() + 1, match.group()) for match in tokenPattern.finditer(text)]
+
+# turn the argument of a shape into the type that the shape expects
+def parseArgument(argument, argumentType):
+    value = float(argument)
+    # don't silently round an argument that is supposed to be a whole number
+    if argumentType is int and not value.is_integer():
+        raise ValueError("expected a whole number")
+    return argumentType(value)
+
+# turn a token into the type we expect, or raise an error pointing at it
+def parseToken(token, argumentType, what):
+    column, text = token
+    try:
+        return parseArgument(text, argumentType)
+    except ValueError:
+        expected = "a whole number" if argumentType is int else "a number"
+        raise GLIBError("Expected " + expected + " for " + what + " but found '" + text + "'", column=column)
+
+# a mesh line draws a mesh from an OBJ or PLY file
+#   mesh bunny.obj
+def parseMeshFile(tokens, workingDirectory):
+    column = tokens[0][0]
+    if len(tokens) != 2:
+        raise GLIBError("'mesh' takes the name of an OBJ or PLY file", column=column)
+    column, fileName = tokens[1]
+    meshFile = os.path.join(workingDirectory, fileName)
+    if not os.path.isfile(meshFile):
+        raise GLIBError("Could not find the mesh '" + fileName + "'", column=column)
+    if os.path.splitext(meshFile)[1].lower() not in loaders.meshExtensions:
+        raise GLIBError("Can only load meshes from " + " and ".join(loaders.meshExtensions) + " files", column=column)
+
+    # load the mesh now so that a broken file is reported here rather than
+    # when we draw it. Drawing it then uses the mesh we loaded, and reading
+    # the glib file again does not load it while the file stays the same
+    modifiedTime = os.path.getmtime(meshFile)
+    try:
+        radius = loaders.meshRadius(meshFile, modifiedTime)
+    except (IOError, ValueError) as error:
+        raise GLIBError("Could not load the mesh '" + fileName + "': " + str(error), column=column)
+
+    return {
+        "name": "mesh",
+        # meshes are drawn straight from buffers rather than a display list
+        "function": None,
+        "mesh": loaders.loadMesh,
+        "arguments": (meshFile, modifiedTime),
+        "files": [meshFile],
+        "center": (0.0, 0.0, 0.0),
+        "radius": radius
+    }
+
+# check the arguments of a shape and turn them into the types it expects
+def parseShape(tokens, workingDirectory):
+    column, name = tokens[0]
+    command = name.lower()
+    if command == "mesh":
+        return parseMeshFile(tokens, workingDirectory)
+    if command not in shapes.shapeArguments:
+        raise GLIBError("Unknown command '" + name + "'", column=column)
+
+    argumentTypes = shapes.shapeArguments[command]
+    if len(tokens) - 1 != len(argumentTypes):
+        raise GLIBError("'" + name + "' takes " + str(len(argumentTypes)) + " arguments but was given " + str(len(tokens) - 1), column=column)
+
+    arguments = tuple(parseToken(token, argumentType, "'" + name + "'") for token, argumentType in zip(tokens[1:], argumentTypes))
+
+    return {
+        "name": command,
+        "function": getattr(shapes, command),
+        "mesh": shapes.shapeMeshes[command],
+        "arguments": arguments,
+        # a sphere around the shape, for telling whether it is on the screen
+        "center": (0.0, 0.0, 0.0),
+        "radius": shapes.shapeRadius[command](*arguments)
+    }
+
+# an instance line draws many copies of a shape at once, placed either by one
+# of the layouts in instancing or by a file
+#   instance grid 1000 .2 cube .1 .1 .1
+#   instance file positions.txt sphere .05 16 16
+def parseInstances(tokens, workingDirectory):
+    column = tokens[0][0]
+    if len(tokens) < 2:
+        raise GLIBError("'instance' needs a layout, like grid, random, ring or file", column=column)
+    column, layout = tokens[1]
+    layout = layout.lower()
+
+    if layout == "file":
+        if len(tokens) < 4:
+            raise GLIBError("'instance file' needs a file and a shape", column=column)
+        column, fileName = tokens[2]
+        instanceFile = os.path.join(workingDirectory, fileName)
+        try:
+            matrices = instancing.fileInstances(instanceFile)
+        except (IOError, ValueError) as error:
+            raise GLIBError("Could not read instances from '" + fileName + "': " + str(error), column=column)
+        # look the file up again if it changes on disk
+        instances = (layout, instanceFile, os.path.getmtime(instanceFile))
+        instanceFiles = [instanceFile]
+        shapeTokens = tokens[3:]
+    else:
+        if layout not in instancing.instanceLayouts:
+            raise GLIBError("Unknown instance layout '" + tokens[1][1] + "'", column=column)
+        if len(tokens) < 5:
+            raise GLIBError("'instance " + tokens[1][1] + "' needs a count, a size and a shape", column=column)
+        count = parseToken(tokens[2], int, "the instance count")
+        size = parseToken(tokens[3], float, "the instance size")
+        if count < 1:
+            raise GLIBError("'instance' needs a count of at least 1", column=tokens[2][0])
+        matrices = instancing.instanceLayouts[layout](count, size)
+        instances = (layout, count, size)
+        instanceFiles = []
+        shapeTokens = tokens[4:]
+
+    command = parseShape(shapeTokens, workingDirectory)
+    command["files"] = instanceFiles + command.get("files", [])
+    command["instances"] = instances
+    command["matrices"] = matrices
+    # the sphere has to hold every copy
+    command["center"], command["radius"] = instancing.instanceBounds(matrices, command["radius"])
+    return command
+
+# a translate line moves every shape after it, on top of any translate lines
+# before it
+#   translate 1 0 -2.5
+def parseTranslate(tokens):
+    column = tokens[0][0]
+    if len(tokens) != 4:
+        raise GLIBError("'translate' takes an x, y and z distance", column=column)
+    return tuple(parseToken(token, float, "'translate'") for token in tokens[1:])
+
+# a texture line reads an image into the sampler uniform it names
+#   texture uTexture bricks.png
+def parseTexture(tokens, workingDirectory):
+    column = tokens[0][0]
+    if len(tokens) != 3:
+        raise GLIBError("A texture looks like 'texture uSampler image.png'", column=column)
+    column, fileName = tokens[2]
+    imageFile = os.path.join(workingDirectory, fileName)
+    if not os.path.isfile(imageFile):
+        raise GLIBError("Could not find the image '" + fileName + "'", column=column)
+    return {"name": tokens[1][1], "file": imageFile}
+
+# a target line draws the scene into an offscreen target instead of the
+# window, so that passes can read it. The format is rgba8 unless it is given
+#   target scene rgba16f
+def parseTarget(tokens):
+    column = tokens[0][0]
+    if len(tokens) not in (2, 3):
+        raise GLIBError("A target looks like 'target name' or 'target name rgba16f'", column=column)
+    targetFormat = "rgba8"
+    if len(tokens) == 3:
+        column, targetFormat = tokens[2]
+        targetFormat = targetFormat.lower()
+        if targetFormat not in passes.targetFormats:
+            raise GLIBError("A target can be " + ", ".join(sorted(passes.targetFormats)) + " but not '" + tokens[2][1] + "'", column=column)
+    return {"name": tokens[1][1], "format": targetFormat}
+
+# a pass line draws a rectangle over the whole window with the shaders of the
+# same name, after the scene. Its inputs are sampler uniforms set to targets
+# drawn before it, and after a > is the target it draws into, which is the
+# window if it does not have one
+#   pass blur uImage=scene > blurred rgba16f
+#   pass combine uScene=scene uBlurred=blurred
+def parsePass(tokens, workingDirectory):
+    column = tokens[0][0]
+    if len(tokens) < 2:
+        raise GLIBError("A pass looks like 'pass shader uImage=target > output'", column=column)
+    column, shader = tokens[1]
+    fragmentFile = os.path.join(workingDirectory, shader + ".frag")
+    if not os.path.isfile(fragmentFile):
+        raise GLIBError("Could not find the fragment shader '" + shader + ".frag'", column=column)
+    # a pass does not need a vertex shader of its own
+    vertexFile = os.path.join(workingDirectory, shader + ".vert")
+    if not os.path.isfile(vertexFile):
+        vertexFile = None
+
+    inputTokens = tokens[2:]
+    output = None
+    targetFormat = "rgba8"
+    arrows = [index for index, (column, text) in enumerate(inputTokens) if text == ">"]
+    if arrows:
+        arrowColumn = inputTokens[arrows[0]][0]
+        outputTokens = inputTokens[arrows[0] + 1:]
+        inputTokens = inputTokens[:arrows[0]]
+        if len(outputTokens) not in (1, 2):
+            raise GLIBError("Expected the name of a target after >, and maybe its format", column=arrowColumn)
+        output = parseTarget([tokens[0]] + outputTokens)
+        targetFormat = output["format"]
+        output = output["name"]
+
+    inputs = []
+    for column, text in inputTokens:
+        uniform, equals, target = text.partition("=")
+        if not equals or not uniform or not target:
+            raise GLIBError("Expected an input like uImage=scene but found '" + text + "'", column=column)
+        inputs.append({"uniform": uniform, "target": target, "column": column})
+
+    return {
+        "shader": shader,
+        "vertex": vertexFile,
+        "fragment": fragmentFile,
+        "inputs": inputs,
+        "output": output,
+        "format": targetFormat
+    }
+
+# the types a uniform variable can be declared with, along with how many
+# numbers make up one of them and what kind of numbers they are. Colors have
+# three numbers, or four with an alpha
+uniformTypes = {
+    "float": ((1,), float),
+    "int": ((1,), int),
+    "bool": ((1,), bool),
+    "vec2": ((2,), float),
+    "vec3": ((3,), float),
+    "vec4": ((4,), float),
+    "color": ((3, 4), float),
+    "mat4": ((16,), float)
+}
+
+# the types that have a slider, and so a range written around their values
+rangedTypes = ("float", "int", "vec2", "vec3", "vec4")
+
+# what the types without a range are set to when no values are given
+defaultValues = {
+    "bool": [False],
+    "color": [1.0, 1.0, 1.0],
+    "mat4": [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+}
+
+# turn a token into true or false
+def parseBool(token, what):
+    column, text = token
+    if text.lower() in ("true", "on", "1"):
+        return True
+    if text.lower() in ("false", "off", "0"):
+        return False
+    raise GLIBError("Expected true or false for " + what + " but found '" + text + "'", column=column)
+
+# a uniform variable of a program, like
+#   uShine <0.0 0.1 1.0>
+# or with a type, where the numbers between the minimum and the maximum are
+# the value, and arrays either give every element or one for all of them
+#   int   uSteps <1 8 32>
+#   bool  uOutline true
+#   vec3  uLight <-10 1 2 3 10>
+#   color uTint 1 .5 .2
+#   mat4  uTransform 1 0 0 0  0 1 0 0  0 0 1 0  0 0 0 1
+#   float uKernel[3] <0 .25 .5 .25 1>
+def parseVariable(tokens):
+    column, name = tokens[0]
+    variableType = "float"
+    if name in uniformTypes and len(tokens) > 1:
+        variableType = name
+        tokens = tokens[1:]
+        column, name = tokens[0]
+    componentCounts, kind = uniformTypes[variableType]
+
+    # an array has its size in brackets after its name
+    size = None
+    match = re.match(r'^(\w+)\[(\d+)\]$', name)
+    if match is not None:
+        name, size = match.group(1), int(match.group(2))
+        if size < 1:
+            raise GLIBError("The array '" + name + "' needs at least one element", column=column)
+    elif not re.match(r'^\w+$', name):
+        raise GLIBError("'" + name + "' is not a name a uniform variable can have", column=column)
+
+    valueTokens = tokens[1:]
+    variable = {"name": name, "type": variableType, "size": size}
+    if variableType in rangedTypes:
+        usage = ("" if variableType == "float" else variableType + " ") + tokens[0][1] + " <min value max>"
+        if len(valueTokens) < 3 or not valueTokens[0][1].startswith("<") or not valueTokens[-1][1].endswith(">"):
+            raise GLIBError("A uniform variable looks like '" + usage + "'", column=column)
+        # remove the opening < and the closing >
+        minToken = (valueTokens[0][0] + 1, valueTokens[0][1][1:])
+        maxToken = (valueTokens[-1][0], valueTokens[-1][1][:-1])
+        variable["min"] = parseToken(minToken, kind, "the minimum of '" + name + "'")
+        variable["max"] = parseToken(maxToken, kind, "the maximum of '" + name + "'")
+        # the sliders can not cover an empty range
+        if variable["min"] >= variable["max"]:
+            raise GLIBError("The minimum of '" + name + "' has to be less than its maximum", column=valueTokens[0][0])
+        valueTokens = valueTokens[1:-1]
+        values = [parseToken(token, kind, "the value of '" + name + "'") for token in valueTokens]
+    elif kind is bool:
+        values = [parseBool(token, "the value of '" + name + "'") for token in valueTokens]
+    else:
+        values = [parseToken(token, kind, "the value of '" + name + "'") for token in valueTokens]
+    if not values and variableType in defaultValues:
+        values = list(defaultValues[variableType])
+
+    # the values can be one element, which every element of an array starts
+    # out as, or all of the elements
+    elements = size or 1
+    for components in componentCounts:
+        if len(values) in (components, components * elements):
+            break
+    else:
+        expected = " or ".join([str(components) for components in componentCounts])
+        expected += " value" if expected == "1" else " values"
+        if size is not None:
+            expected += " for every element, or " + " or ".join([str(components * size) for components in componentCounts]) + " for all of them,"
+        raise GLIBError("'" + name + "' takes " + expected + " but has " + str(len(values)), column=column)
+    if len(values) == components:
+        values = values * elements
+    if variableType == "color" and not all([0.0 <= value <= 1.0 for value in values]):
+        raise GLIBError("The color '" + name + "' has to be between 0 and 1", column=column)
+
+    variable["components"] = components
+    # a single number is kept as it is, everything else as a flat list
+    variable["value"] = values[0] if size is None and components == 1 else values
+    return variable
+
+# everything a glib file describes
+class Scene(object):
+    def __init__(self):
+        super(Scene, self).__init__()
+        # the names of the shaders, without the .vert and .frag
+        self.vertex = None
+        self.fragment = None
+        # every program, each with a name, the names of the shaders it is
+        # built from, and a list of uniform variables that each have a name,
+        # type, array size, value, and a min and max if they have a slider
+        self.programs = []
+        # the offscreen target the scene is drawn into, with its name and
+        # format, or None to draw it straight into the window
+        self.target = None
+        # the passes drawn after the scene, in order, each with its shaders,
+        # its inputs, and the target it draws into
+        self.passes = []
+        # the images to read into sampler uniforms, each with the name of the
+        # uniform and the image file. They get texture units in this order
+        self.textures = []
+        # the shapes to draw, in order. Each one has the position that the
+        # translate lines before it moved it to, and the number of the program
+        # it is drawn with
+        self.drawPlan = []
+
+# reads glib files into a Scene in a single pass over the file, a line at a
+# time. Every line is turned into a statement, like a shape to draw or a
+# uniform variable, and the statements are remembered by the text of their
+# line. When the file is read again, only the lines that changed have to be
+# parsed, which makes saving a small change to a large generated file cheap.
+# every error points at the line and column it was found on
+class GLIBParser(object):
+    def __init__(self):
+        super(GLIBParser, self).__init__()
+        # the statement for every line of the last file we read
+        self.statements = {}
+        # how many lines we had to parse the last time, and how many we reused
+        self.parsedLines = 0
+        self.reusedLines = 0
+
+    def parse(self, glibFile):
+        workingDirectory = os.path.dirname(glibFile)
+        scene = Scene()
+        statements = {}
+        self.parsedLines = 0
+        self.reusedLines = 0
+
+        # the program whose uniform variables we are reading, if we are in
+        # one, and the line it started on
+        program = None
+        programLine = 0
+        # where the translate lines so far have moved the shapes to
+        position = (0.0, 0.0, 0.0)
+        # the number of the program the shapes are drawn with, which is the
+        # first one until a program line picks another
+        drawProgram = 0
+
+        with open(glibFile) as f:
+            for lineNumber, text in enumerate(f, 1):
+                text = text.rstrip("\r\n")
+                # skip over empty lines
+                if not text.strip():
+                    continue
+
+                # a line means something different inside of a program
+                key = (program is not None, text)
+                # look for the line in this file first, since generated files
+                # repeat a lot of lines, and then in the last file we read
+                statement = statements.get(key) or self.statements.get(key)
+                if statement is None:
+                    try:
+                        statement = self.parseLine(tokenize(text), program is not None, workingDirectory)
+                    except GLIBError as error:
+                        error.line = lineNumber
+                        error.glibFile = glibFile
+                        raise
+                    self.parsedLines += 1
+                else:
+                    self.reusedLines += 1
+                # the files a line reads from can change without the line
+                # changing, so those lines are always parsed again
+                if statement[0] not in ("draw file", "pass", "texture"):
+                    statements[key] = statement
+
+                kind = statement[0]
+                if kind == "vertex":
+                    scene.vertex = statement[1]
+                elif kind == "fragment":
+                    scene.fragment = statement[1]
+                elif kind == "program":
+                    names = [declared["name"] for declared in scene.programs]
+                    # naming a program again goes back to drawing with it
+                    if statement[1] in names:
+                        if statement[2]:
+                            raise GLIBError("There is already a program called '" + statement[1] + "'", lineNumber, tokenize(text)[1][0], glibFile)
+                        drawProgram = names.index(statement[1])
+                        continue
+                    # a program is built from the shaders named before it
+                    scene.programs.append({"name": statement[1], "vertex": scene.vertex, "fragment": scene.fragment, "variables": []})
+                    drawProgram = len(scene.programs) - 1
+                    # only a program with a scope has uniform variables
+                    if statement[2]:
+                        program = scene.programs[-1]
+                        programLine = lineNumber
+                elif kind == "variable":
+                    program["variables"].append(dict(statement[1]))
+                elif kind == "end":
+                    program = None
+                elif kind in ("target", "pass"):
+                    self.addPass(scene, kind, statement[1], lineNumber, text, glibFile)
+                elif kind == "texture":
+                    if statement[1]["name"] in [texture["name"] for texture in scene.textures]:
+                        raise GLIBError("The sampler '" + statement[1]["name"] + "' already has a texture", lineNumber, tokenize(text)[1][0], glibFile)
+                    scene.textures.append(statement[1])
+                elif kind == "translate":
+                    position = tuple(a + b for a, b in zip(position, statement[1]))
+                else:
+                    # the same line can be at a different position every time
+                    # it shows up, so the position goes on a copy
+                    command = dict(statement[1])
+                    command["position"] = position
+                    # and is drawn with the program picked before it
+                    command["program"] = drawProgram
+                    scene.drawPlan.append(command)
+
+        if program is not None:
+            raise GLIBError("Program '" + program["name"] + "' is missing its closing }", programLine, None, glibFile)
+        # a program that comes before the shaders are named is built from the
+        # last ones in the file
+        for program in scene.programs:
+            program["vertex"] = program["vertex"] or scene.vertex
+            program["fragment"] = program["fragment"] or scene.fragment
+        if scene.target is not None and (not scene.passes or scene.passes[-1]["output"] is not None):
+            raise GLIBError("The scene is drawn into '" + scene.target["name"] + "', so the last pass has to draw into the window", None, None, glibFile)
+
+        # forget the lines that are no longer in the file
+        self.statements = statements
+        return scene
+
+    # add the scene target or a pass to the scene, making sure that every
+    # target a pass reads has been drawn before it
+    def addPass(self, scene, kind, statement, lineNumber, text, glibFile):
+        targets = [renderPass["output"] for renderPass in scene.passes if renderPass["output"] is not None]
+        if scene.target is not None:
+            targets.append(scene.target["name"])
+
+        if kind == "target":
+            if scene.target is not None:
+                raise GLIBError("The scene already has a target", lineNumber, 1, glibFile)
+            if statement["name"] in targets:
+                raise GLIBError("There is already a target called '" + statement["name"] + "'", lineNumber, tokenize(text)[1][0], glibFile)
+            scene.target = statement
+            return
+
+        for passInput in statement["inputs"]:
+            if passInput["target"] not in targets:
+                raise GLIBError("There is no target called '" + passInput["target"] + "' drawn before this pass", lineNumber, passInput["column"], glibFile)
+        if statement["output"] in targets:
+            raise GLIBError("There is already a target called '" + statement["output"] + "'", lineNumber, None, glibFile)
+        scene.passes.append(statement)
+
+    # turn the tokens of a single line into a statement
+    def parseLine(self, tokens, inProgram, workingDirectory):
+        column, word = tokens[0]
+
+        if inProgram:
+            if word == "}":
+                if len(tokens) > 1:
+                    raise GLIBError("Expected nothing after }", column=tokens[1][0])
+                return ("end",)
+            return ("variable", parseVariable(tokens))
+
+        command = word.lower()
+        if command == "{":
+            raise GLIBError("Unexpected open bracket, place it at the end of your program line", column=column)
+        if command == "}":
+            raise GLIBError("Unexpected close bracket, there is no program to close", column=column)
+
+        if command in ("vertex", "fragment"):
+            if len(tokens) != 2:
+                raise GLIBError("'" + word + "' takes the name of a shader", column=column)
+            return (command, tokens[1][1])
+
+        if command == "program":
+            if len(tokens) < 2 or len(tokens) > 3 or (len(tokens) == 3 and tokens[2][1] != "{"):
+                raise GLIBError("A program looks like 'program Name {'", column=column)
+            return ("program", tokens[1][1], len(tokens) == 3)
+
+        if command == "target":
+            return ("target", parseTarget(tokens))
+
+        if command == "pass":
+            return ("pass", parsePass(tokens, workingDirectory))
+
+        if command == "texture":
+            return ("texture", parseTexture(tokens, workingDirectory))
+
+        if command == "translate":
+            return ("translate", parseTranslate(tokens))
+
+        if command == "instance":
+            command = parseInstances(tokens, workingDirectory)
+        else:
+            command = parseShape(tokens, workingDirectory)
+        return ("draw file" if command.get("files") else "draw", command)
+
+# read a whole glib file into a Scene, without keeping anything around for
+# the next time it is read
+def parseGLIB(glibFile):
+    return GLIBParser().parse(glibFile)
@@ -0,0 +1,185 @@
+import os
+import sys
+import argparse
+import itertools
+import multiprocessing
+
+# renders glib files to png images without ever opening a window, so that
+# scenes can be rendered on machines without a display. Each glib file is
+# rendered by the same MakeGLWidget the application uses, in its own process.
+# Qt can only make an OpenGL context through a window system, so without a
+# display we make the context with EGL and draw into a framebuffer object
+#
+#   python main.py --headless scene.glib other.glib --output renders --rotation 23,315,1
+
+# the Qt application for the process we are running in
+application = None
+
+def parseRotation(text):
+    rotation = [float(x) for x in text.split(",")]
+    if len(rotation) != 3:
+        raise argparse.ArgumentTypeError("a rotation is three angles in degrees, like 23,315,1")
+    return tuple(rotation)
+
+def parseSize(text):
+    try:
+        width, height = [int(x) for x in text.lower().split("x")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("a size looks like 512x512")
+    return (width, height)
+
+def parseUniform(text):
+    name, equals, value = text.partition("=")
+    if equals == "":
+        raise argparse.ArgumentTypeError("a uniform looks like uKa=0.5")
+    # vectors, colors, matrices and arrays give all of their numbers
+    values = [float(number) for number in value.split(",")]
+    return (name, values[0] if len(values) == 1 else values)
+
+def makeParser():
+    parser = argparse.ArgumentParser(prog="glman --headless", description="Render glib files to png images without a window.")
+    parser.add_argument("glibFiles", nargs="+", metavar="glib", help="the glib files to render")
+    parser.add_argument("-o", "--output", default=".", help="the folder to write images into")
+    parser.add_argument("-s", "--size", type=parseSize, default=(512, 512), help="the size of the images, like 512x512")
+    parser.add_argument("-r", "--rotation", type=parseRotation, action="append", help="x,y,z rotation in degrees, can be given more than once")
+    parser.add_argument("-z", "--zoom", type=int, action="append", help="the zoom level, where 100 is normal size, can be given more than once")
+    parser.add_argument("-u", "--uniform", type=parseUniform, action="append", default=[], help="set a uniform variable, like uKa=0.5 or uLight=1,2,3")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="how many processes to render with")
+    parser.add_argument("--platform", help="render through a Qt platform, like xcb or eglfs, instead of EGL when there is no display")
+    parser.add_argument("--core", action="store_true", help="render with an OpenGL 3.3 core profile context")
+    return parser
+
+# pick how we make OpenGL contexts. This has to happen before anything
+# imports PyOpenGL, and the processes we spawn inherit it. Without a display
+# and without a Qt platform to use, we draw with EGL, which Mesa can do on the
+# processor with llvmpipe when there is no graphics card
+def chooseOpenGL(platform):
+    noDisplay = not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY")
+    if not platform and "QT_QPA_PLATFORM" not in os.environ and sys.platform.startswith("linux") and noDisplay:
+        os.environ["PYOPENGL_PLATFORM"] = "egl"
+        os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+def usingEGL():
+    return os.environ.get("PYOPENGL_PLATFORM") == "egl"
+
+# set up Qt in a process that is going to render scenes
+def startWorker(platform, core=False):
+    global application
+
+    from PyQt5.QtCore import Qt, QCoreApplication
+    from PyQt5.QtWidgets import QApplication
+
+    if platform:
+        os.environ["QT_QPA_PLATFORM"] = platform
+    # without a display the widgets still need a Qt platform, even though
+    # they draw with EGL rather than through Qt
+    elif "QT_QPA_PLATFORM" not in os.environ and sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        os.environ["QT_QPA_PLATFORM"] = "offscreen"
+
+    # an OpenGL widget that is never shown needs a context to share with
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    if core:
+        from main import useCoreProfile
+        useCoreProfile()
+    application = QApplication.instance() or QApplication([])
+
+# a widget that is never shown, drawing with EGL or through Qt
+def makeWidget():
+    if usingEGL():
+        from offscreen import OffscreenGLWidget
+        widget = OffscreenGLWidget()
+    else:
+        from main import MakeGLWidget
+        widget = MakeGLWidget()
+    widget.headless = True
+    return widget
+
+# a widget with the glib file loaded and its shaders compiled
+def loadWidget(glibFile, size):
+    widget = makeWidget()
+    widget.resize(*size)
+    widget.setGLIB(glibFile)
+    widget.loadGLIB()
+
+    # the first frame sets up our OpenGL context and starts the shaders
+    # compiling, then we wait for them to be ready
+    widget.grabFramebuffer()
+    if not widget.isValid():
+        raise RuntimeError("OpenGL Error: could not create an OpenGL context, try a different --platform")
+    widget.waitForProgram()
+    # and for the textures to be decoded
+    widget.waitForTextures()
+    if widget.programOn and not widget.programsLinked():
+        raise RuntimeError("Shader Error: the shaders failed to compile")
+    return widget
+
+# render every view of a single glib file. Returns the glib file, the images
+# that were written, and an error message if something went wrong
+def renderGLIB(job):
+    glibFile, options = job
+
+    images = []
+    widget = None
+    try:
+        widget = loadWidget(glibFile, options["size"])
+
+        for name, value in options["uniforms"]:
+            try:
+                found = widget.setUniformValue(name, value)
+            except ValueError as error:
+                raise RuntimeError("Uniform Error: " + str(error))
+            if not found:
+                raise RuntimeError("Uniform Error: the glib file has no uniform variable called " + name)
+
+        baseName = os.path.splitext(os.path.basename(glibFile))[0]
+        views = itertools.product(options["rotations"], options["zooms"])
+        for viewNumber, (rotation, zoom) in enumerate(views):
+            # the widget keeps its angles in sixteenths of a degree
+            for axis, angle in zip("xyz", rotation):
+                widget.setRotation(axis, int(round(angle * 16)))
+            widget.changeZoom(zoom)
+
+            imageFile = os.path.join(options["output"], "{0}_{1:03d}.png".format(baseName, viewNumber))
+            if not widget.grabFramebuffer().save(imageFile):
+                raise IOError("Could not write " + imageFile)
+            images.append(imageFile)
+    except Exception as error:
+        return (glibFile, images, str(error))
+    finally:
+        # a process renders many files, and each has its own EGL context
+        if widget is not None and usingEGL():
+            widget.release()
+
+    return (glibFile, images, None)
+
+def main(arguments):
+    options = makeParser().parse_args(arguments)
+
+    if not os.path.isdir(options.output):
+        os.makedirs(options.output)
+
+    renderOptions = {
+        "output": options.output,
+        "size": options.size,
+        # the same starting view as the window
+        "rotations": options.rotation or [(23, 315, 1)],
+        "zooms": options.zoom or [100],
+        "uniforms": options.uniform
+    }
+    jobs = [(os.path.abspath(glibFile), renderOptions) for glibFile in options.glibFiles]
+
+    # every process gets its own Qt application and OpenGL context. Spawn them
+    # fresh rather than forking, since Qt does not survive being forked
+    chooseOpenGL(options.platform)
+    processes = max(1, min(options.jobs, len(jobs)))
+    context = multiprocessing.get_context("spawn")
+    failures = 0
+    with context.Pool(processes, initializer=startWorker, initargs=(options.platform, options.core)) as pool:
+        for glibFile, images, error in pool.imap_unordered(renderGLIB, jobs):
+            if error is None:
+                print("Rendered", glibFile, "to", len(images), "images")
+            else:
+                failures += 1
+                print("Failed to render", glibFile + ":", error)
+
+    return 1 if failures > 0 else 0
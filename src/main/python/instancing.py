@@ -0,0 +1,76 @@
+import numpy as np
+
+# builds the matrices that place every copy of an instanced shape. Each
+# function returns an array of count 4x4 matrices, one per copy
+
+# the number of values on each line of an instance file that we understand
+instanceFileColumns = (3, 4, 16)
+
+def translations(positions):
+    matrices = np.tile(np.identity(4, dtype=np.float32), (len(positions), 1, 1))
+    matrices[:, :3, 3] = positions
+    return matrices
+
+# copies in a cube shaped grid, spacing apart, centered on the origin
+def gridInstances(count, spacing):
+    side = int(np.ceil(round(count ** (1.0 / 3.0), 6)))
+    index = np.arange(count)
+    cell = np.stack((index % side, (index // side) % side, index // (side * side)), axis=1)
+    return translations((cell - (side - 1) / 2.0) * spacing)
+
+# copies scattered through a cube that reaches out to size in every direction.
+# the same seed is used every time so that the scene looks the same every time
+# it is drawn
+def randomInstances(count, size):
+    random = np.random.RandomState(0)
+    return translations(random.uniform(-size, size, (count, 3)))
+
+# copies spread around a circle of radius in the xz plane, each one turned to
+# face out from the middle
+def ringInstances(count, radius):
+    angle = np.linspace(0.0, 2.0 * np.pi, count, endpoint=False)
+    cos = np.cos(angle)
+    sin = np.sin(angle)
+    matrices = translations(np.stack((radius * cos, np.zeros(count), -radius * sin), axis=1))
+    # turn each copy around the y axis
+    matrices[:, 0, 0] = cos
+    matrices[:, 0, 2] = sin
+    matrices[:, 2, 0] = -sin
+    matrices[:, 2, 2] = cos
+    return matrices
+
+# how much the biggest copy is scaled up, from the longest of the x, y and z
+# axes of its matrix
+def largestScale(matrices):
+    return float(np.linalg.norm(matrices[:, :3, :3], axis=1).max())
+
+# the middle of a sphere that holds every copy of a shape that reaches radius
+# from its own middle, and the radius of that sphere
+def instanceBounds(matrices, radius):
+    positions = matrices[:, :3, 3]
+    center = (positions.min(axis=0) + positions.max(axis=0)) / 2.0
+    reach = np.linalg.norm(positions - center, axis=1) + radius * np.linalg.norm(matrices[:, :3, :3], axis=1).max(axis=1)
+    return tuple(float(value) for value in center), float(reach.max())
+
+instanceLayouts = {
+    "grid": gridInstances,
+    "random": randomInstances,
+    "ring": ringInstances
+}
+
+# read the copies from a text file with one copy per line. A line is either a
+# position (x y z), a position and a size (x y z scale) or a whole matrix
+# written out row by row (16 numbers)
+def fileInstances(instanceFile):
+    values = np.loadtxt(instanceFile, dtype=np.float32, ndmin=2)
+    if values.shape[1] not in instanceFileColumns:
+        raise ValueError("every line needs 3, 4 or 16 numbers")
+
+    if values.shape[1] == 16:
+        return values.reshape(-1, 4, 4)
+
+    matrices = translations(values[:, :3])
+    if values.shape[1] == 4:
+        for axis in range(3):
+            matrices[:, axis, axis] = values[:, 3]
+    return matrices
@@ -0,0 +1,379 @@
+import os
+import re
+import mmap
+import zipfile
+import tempfile
+
+import numpy as np
+
+from meshes import Mesh
+
+# reads meshes from OBJ and binary PLY files. Files with millions of triangles
+# are read without a python loop per line: the file is memory mapped, every
+# kind of line is pulled out with a regular expression, and the numbers are
+# converted by numpy in bulk. The mesh is then saved in a .glmesh file next to
+# the original, so the next time it is loaded we only have to read the arrays
+
+# the extensions of the files we can read
+meshExtensions = (".obj", ".ply")
+
+# bump this whenever the layout of a .glmesh file changes
+cacheVersion = 1
+
+# the bounding radius of every mesh file we have read, by the file and when it
+# was last changed, so saving a glib file does not load its meshes again
+meshRadii = {}
+# the meshes that were loaded for their radius and have not been drawn yet,
+# so that drawing them does not load them a second time
+unusedMeshes = {}
+
+def cacheFile(meshFile):
+    return meshFile + ".glmesh"
+
+# returns the mesh in a file, from its .glmesh file if it is up to date.
+# modifiedTime is when the file was last changed, which is looked up if it
+# is not given
+def loadMesh(meshFile, modifiedTime=None):
+    if modifiedTime is None:
+        modifiedTime = os.path.getmtime(meshFile)
+    mesh = unusedMeshes.pop((meshFile, modifiedTime), None)
+    if mesh is not None:
+        return mesh
+    # the cache is only good for the exact file it was made from
+    source = np.array([cacheVersion, modifiedTime, os.path.getsize(meshFile)], dtype=np.float64)
+
+    mesh = readCache(cacheFile(meshFile), source)
+    if mesh is not None:
+        return mesh
+
+    extension = os.path.splitext(meshFile)[1].lower()
+    if extension == ".obj":
+        mesh = loadOBJ(meshFile)
+    elif extension == ".ply":
+        mesh = loadPLY(meshFile)
+    else:
+        raise ValueError("can only load " + " and ".join(meshExtensions) + " files")
+
+    writeCache(cacheFile(meshFile), source, mesh)
+    return mesh
+
+# the radius of the sphere around a mesh, which only loads the mesh if the
+# file is new or has changed
+def meshRadius(meshFile, modifiedTime):
+    key = (meshFile, modifiedTime)
+    if key not in meshRadii:
+        mesh = loadMesh(meshFile, modifiedTime)
+        # an older version of the same file is no use anymore
+        for oldKey in [oldKey for oldKey in meshRadii if oldKey[0] == meshFile]:
+            del meshRadii[oldKey]
+            unusedMeshes.pop(oldKey, None)
+        meshRadii[key] = mesh.boundingRadius()
+        unusedMeshes[key] = mesh
+    return meshRadii[key]
+
+# forget every mesh we loaded, for when a new glib file is loaded
+def clearMeshes():
+    meshRadii.clear()
+    unusedMeshes.clear()
+
+def readCache(meshCache, source):
+    if not os.path.isfile(meshCache):
+        return None
+    try:
+        with np.load(meshCache) as arrays:
+            if not np.array_equal(arrays["source"], source):
+                return None
+            return Mesh(arrays["positions"], arrays["normals"], arrays["texcoords"], arrays["indices"])
+    except (IOError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        # a cache we can not read, like one cut short, is no worse than no
+        # cache at all, and gets written again
+        return None
+
+def writeCache(meshCache, source, mesh):
+    # write to a temporary file of our own first, so that a half written file
+    # is never mistaken for a mesh, and two processes loading the same mesh do
+    # not write into the same file
+    temporaryFile = None
+    try:
+        handle, temporaryFile = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(meshCache))
+        with os.fdopen(handle, 'wb') as f:
+            np.savez(f, source=source, positions=mesh.positions, normals=mesh.normals, texcoords=mesh.texcoords, indices=mesh.indices)
+        os.replace(temporaryFile, meshCache)
+    except OSError:
+        # the mesh might live somewhere we can not write to, in which case we
+        # just read it from scratch every time
+        if temporaryFile is not None:
+            try:
+                os.remove(temporaryFile)
+            except OSError:
+                pass
+
+# the text after the keyword of every line that starts with it
+def findLines(data, keyword):
+    # searching for a new line and then the keyword is a lot faster than
+    # asking the regular expression to find the start of every line
+    lines = re.findall(rb'\n' + keyword + rb'[ \t]+([^\r\n#]*)', data)
+    # the first line of the file has no new line in front of it
+    first = re.match(keyword + rb'[ \t]+([^\r\n#]*)', data)
+    if first is not None:
+        lines.insert(0, first.group(1))
+    return lines
+
+# the numbers on every line that starts with a keyword, as an array with a row
+# per line and a column per number
+def readLines(data, keyword, columns):
+    lines = findLines(data, keyword)
+    if not lines:
+        return np.zeros((0, columns), dtype=np.float32)
+
+    values = np.fromstring(b' '.join(lines), dtype=np.float32, sep=' ')
+    # every line has to have the same amount of numbers, but there can be more
+    # of them than we need, like the w of a position
+    if len(values) % len(lines) != 0:
+        raise ValueError("the '" + keyword.decode() + "' lines do not all have the same amount of numbers")
+    rows = values.reshape(len(lines), -1)
+    if rows.shape[1] < columns:
+        raise ValueError("the '" + keyword.decode() + "' lines need at least " + str(columns) + " numbers")
+    return rows[:, :columns]
+
+# OBJ indices count from 1, and negative indices count back from the end
+def fixIndices(indices, count):
+    return np.where(indices < 0, indices + count, indices - 1)
+
+# work out a normal for every vertex by adding up the normals of the
+# triangles around it, weighted by how big they are
+def smoothNormals(positions, triangles):
+    a, b, c = positions[triangles[:, 0]], positions[triangles[:, 1]], positions[triangles[:, 2]]
+    faceNormals = np.cross(b - a, c - a)
+    normals = np.zeros_like(positions)
+    for corner in range(3):
+        np.add.at(normals, triangles[:, corner], faceNormals)
+    lengths = np.linalg.norm(normals, axis=1)
+    lengths[lengths == 0] = 1.0
+    return normals / lengths[:, np.newaxis]
+
+# split every polygon into a fan of triangles, given the number of corners of
+# each polygon and the index of its first corner
+def fanTriangles(corners, firsts):
+    triangleCounts = corners - 2
+    total = int(triangleCounts.sum())
+    first = np.repeat(firsts, triangleCounts)
+    # which triangle of its polygon each triangle is
+    step = np.arange(total) - np.repeat(np.cumsum(triangleCounts) - triangleCounts, triangleCounts)
+    return np.stack((first, first + step + 1, first + step + 2), axis=1)
+
+def loadOBJ(objFile):
+    with open(objFile, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            positions = readLines(data, rb'v', 3)
+            texcoords = readLines(data, rb'vt', 2)
+            normals = readLines(data, rb'vn', 3)
+            faces = findLines(data, rb'f')
+        finally:
+            data.close()
+
+    if not faces:
+        raise ValueError("the file has no faces")
+
+    # every corner of every face, like 1/2/3, 1//3 or just 1, with a line
+    # for each face
+    faceText = b'\n'.join(faces)
+
+    # how many corners each face has, found by counting where each corner
+    # starts, which is anything that is not a space right after a space
+    characters = np.frombuffer(faceText, dtype=np.uint8)
+    gaps = (characters == ord(' ')) | (characters == ord('\t')) | (characters == ord('\n'))
+    starts = ~gaps & np.concatenate(([True], gaps[:-1]))
+    faceNumbers = np.cumsum(characters == ord('\n'))
+    corners = np.bincount(faceNumbers[starts], minlength=len(faces))
+    if corners.min() < 3:
+        raise ValueError("every face needs at least 3 corners")
+
+    # the corners are only ever written one way in a file, so we can read all
+    # of them with the layout of the first one
+    firstCorner = faces[0].split()[0]
+    layout = firstCorner.count(b'/')
+    hasTexcoords = layout > 0 and b'//' not in firstCorner
+    hasNormals = layout == 2
+    columns = 1 + hasTexcoords + hasNormals
+    numbers = np.fromstring(faceText.replace(b'//', b' ').replace(b'/', b' '), dtype=np.int64, sep=' ')
+    if len(numbers) != corners.sum() * columns:
+        raise ValueError("the faces do not all list their corners the same way")
+    cornerIndices = numbers.reshape(-1, columns)
+
+    # which position, texture coordinate and normal each corner uses
+    attributes = [positions]
+    if hasTexcoords:
+        attributes.append(texcoords)
+    if hasNormals:
+        attributes.append(normals)
+    for column, values in enumerate(attributes):
+        cornerIndices[:, column] = fixIndices(cornerIndices[:, column], len(values))
+        if len(cornerIndices) and (cornerIndices[:, column].min() < 0 or cornerIndices[:, column].max() >= len(values)):
+            raise ValueError("a face uses a vertex that does not exist")
+
+    # an OBJ corner can use a different position, texture coordinate and
+    # normal, but OpenGL needs one index for all three, so every different
+    # combination becomes its own vertex. Packing each combination into a
+    # single number makes finding the different ones a lot faster
+    key = np.zeros(len(cornerIndices), dtype=np.int64)
+    for column, values in enumerate(attributes):
+        key = key * len(values) + cornerIndices[:, column]
+    uniqueKeys, firstUses, vertexIndices = np.unique(key, return_index=True, return_inverse=True)
+    uniqueCorners = cornerIndices[firstUses]
+
+    vertexPositions = positions[uniqueCorners[:, 0]]
+    if hasTexcoords:
+        vertexTexcoords = texcoords[uniqueCorners[:, 1]]
+    else:
+        vertexTexcoords = np.zeros((len(uniqueCorners), 2), dtype=np.float32)
+
+    firsts = np.cumsum(corners) - corners
+    triangles = vertexIndices.ravel()[fanTriangles(corners, firsts)]
+
+    if hasNormals:
+        vertexNormals = normals[uniqueCorners[:, -1]]
+    else:
+        vertexNormals = smoothNormals(vertexPositions, triangles)
+
+    return Mesh(vertexPositions, vertexNormals, vertexTexcoords, triangles)
+
+# the numpy type of each PLY property type
+plyTypes = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8"
+}
+
+# the names PLY files use for texture coordinates
+plyTexcoordNames = (("s", "t"), ("u", "v"), ("texture_u", "texture_v"), ("texture_s", "texture_t"))
+
+def loadPLY(plyFile):
+    with open(plyFile, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return readPLY(data)
+        finally:
+            data.close()
+
+def readPLY(data):
+    headerEnd = data.find(b'end_header')
+    if not data[:3] == b'ply' or headerEnd < 0:
+        raise ValueError("the file is not a PLY file")
+    offset = data.find(b'\n', headerEnd) + 1
+    header = data[:headerEnd].decode('ascii').splitlines()
+
+    # the elements of the file, in order, each with its properties
+    elements = []
+    byteOrder = None
+    for line in header:
+        words = line.split()
+        if not words:
+            continue
+        if words[0] == "format":
+            if len(words) < 2:
+                raise ValueError("the format line needs a format")
+            if words[1] == "binary_little_endian":
+                byteOrder = "<"
+            elif words[1] == "binary_big_endian":
+                byteOrder = ">"
+            else:
+                raise ValueError("only binary PLY files can be loaded")
+        elif words[0] == "element":
+            if len(words) != 3:
+                raise ValueError("an element needs a name and a count")
+            elements.append({"name": words[1], "count": int(words[2]), "properties": []})
+        elif words[0] == "property":
+            if not elements:
+                raise ValueError("a property comes before any element")
+            if len(words) != (5 if words[1:2] == ["list"] else 3):
+                raise ValueError("a property needs a type and a name")
+            types = words[2:4] if words[1] == "list" else words[1:2]
+            for plyType in types:
+                if plyType not in plyTypes:
+                    raise ValueError("unknown property type '" + plyType + "'")
+            if words[1] == "list":
+                elements[-1]["properties"].append((words[4], plyTypes[words[2]], plyTypes[words[3]]))
+            else:
+                elements[-1]["properties"].append((words[2], plyTypes[words[1]], None))
+
+    if byteOrder is None:
+        raise ValueError("the file does not say what format it is in")
+
+    positions = texcoords = normals = triangles = None
+    for element in elements:
+        if element["name"] == "vertex":
+            dtype = np.dtype([(name, byteOrder + numberType) for name, numberType, listType in element["properties"]])
+            vertices = np.frombuffer(data, dtype=dtype, count=element["count"], offset=offset)
+            offset += dtype.itemsize * element["count"]
+
+            names = dtype.names
+            if not all([axis in names for axis in "xyz"]):
+                raise ValueError("the vertices need x, y and z")
+            positions = np.stack([vertices[axis] for axis in "xyz"], axis=1)
+            if all([name in names for name in ("nx", "ny", "nz")]):
+                normals = np.stack([vertices[name] for name in ("nx", "ny", "nz")], axis=1)
+            for s, t in plyTexcoordNames:
+                if s in names and t in names:
+                    texcoords = np.stack((vertices[s], vertices[t]), axis=1)
+                    break
+
+        elif element["name"] == "face":
+            triangles, offset = readPLYFaces(data, element, byteOrder, offset)
+
+        else:
+            # skip over anything else, like edges, as long as we know how big it is
+            if any([listType is not None for name, numberType, listType in element["properties"]]):
+                break
+            dtype = np.dtype([(name, byteOrder + numberType) for name, numberType, listType in element["properties"]])
+            offset += dtype.itemsize * element["count"]
+
+    if positions is None or triangles is None:
+        raise ValueError("the file needs vertices and faces")
+    # a face that uses a vertex past the end would read memory that is not ours
+    if len(triangles) > 0 and (triangles.min() < 0 or triangles.max() >= len(positions)):
+        raise ValueError("a face uses a vertex that does not exist")
+    if texcoords is None:
+        texcoords = np.zeros((len(positions), 2), dtype=np.float32)
+    if normals is None:
+        normals = smoothNormals(positions.astype(np.float32), triangles)
+
+    return Mesh(positions, normals, texcoords, triangles)
+
+# faces are a list of corners each, which means every face could be a
+# different size. Almost every file is all triangles or all quads though, so
+# we try reading them that way first, and only walk the faces one at a time
+# if that does not work
+def readPLYFaces(data, element, byteOrder, offset):
+    count = element["count"]
+    name, countType, indexType = element["properties"][0]
+    if indexType is None or len(element["properties"]) != 1:
+        raise ValueError("faces can only have a list of corners")
+    countType = np.dtype(byteOrder + countType)
+    indexType = np.dtype(byteOrder + indexType)
+
+    firstCorners = int(np.frombuffer(data, dtype=countType, count=1, offset=offset)[0]) if count > 0 else 3
+    dtype = np.dtype([("corners", countType), ("indices", indexType, (firstCorners,))])
+    if offset + dtype.itemsize * count <= len(data):
+        faces = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        if np.all(faces["corners"] == firstCorners):
+            corners = np.full(count, firstCorners)
+            firsts = np.arange(count) * firstCorners
+            triangles = faces["indices"].ravel()[fanTriangles(corners, firsts)]
+            return triangles, offset + dtype.itemsize * count
+
+    # the faces are all different sizes
+    corners = np.zeros(count, dtype=np.int64)
+    indices = []
+    for face in range(count):
+        corners[face] = int(np.frombuffer(data, dtype=countType, count=1, offset=offset)[0])
+        offset += countType.itemsize
+        indices.append(np.frombuffer(data, dtype=indexType, count=corners[face], offset=offset))
+        offset += indexType.itemsize * corners[face]
+    if corners.min() < 3:
+        raise ValueError("every face needs at least 3 corners")
+    firsts = np.cumsum(corners) - corners
+    triangles = np.concatenate(indices)[fanTriangles(corners, firsts)]
+    return triangles, offset
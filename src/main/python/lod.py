@@ -0,0 +1,100 @@
+import math
+
+import instancing
+
+# picks how finely to tessellate a shape from how big it is on the screen, so
+# a sphere that only covers a few pixels is drawn with a few dozen triangles
+# while one that fills the window is drawn with tens of thousands. Each shape
+# gets a small pyramid of tessellations, from coarse to fine, and every frame
+# we draw the coarsest one that still looks smooth
+
+# how long each edge around the outside of a shape should be on the screen,
+# in pixels
+pixelsPerSegment = 6.0
+
+# a coarser level is only picked once it has this much room to spare, so that
+# a shape sitting right between two levels does not flip back and forth
+# between them while we zoom
+hysteresis = 0.75
+
+# the number of slices in each level of a sphere's pyramid. The stacks keep
+# the same proportion to the slices that the glib file asked for
+sphereSlices = (8, 16, 32, 64, 128, 256)
+
+# every level of a sphere, as the number of segments around its middle and the
+# arguments that build it
+def sphereLevels(radius, slices, stacks):
+    return [(levelSlices, (radius, levelSlices, max(4, int(round(levelSlices * stacks / float(slices)))))) for levelSlices in sphereSlices]
+
+# how many segments go around the middle of a sphere that is pixelsPerUnit
+# pixels across for every unit of radius
+def sphereSegments(pixelsPerUnit, radius, slices, stacks):
+    return 2.0 * math.pi * radius * pixelsPerUnit / pixelsPerSegment
+
+# every shape with more than one level of detail, with the function that
+# builds its pyramid and the one that says how many segments it needs
+shapeLevels = {
+    "sphere": (sphereLevels, sphereSegments)
+}
+
+class LevelOfDetail(object):
+    def __init__(self):
+        super(LevelOfDetail, self).__init__()
+        self.enabled = False
+        # the pyramid of every shape we have drawn, by its name and arguments
+        self.pyramids = {}
+        # the level that every shape was drawn at last frame
+        self.levels = {}
+        # how much the copies of every instanced shape are scaled up, at most
+        self.instanceScales = {}
+
+    # forget the levels we picked, for when a new glib file is loaded
+    def clear(self):
+        self.pyramids.clear()
+        self.levels.clear()
+        self.instanceScales.clear()
+
+    # the arguments to build a shape with this frame, when each unit is
+    # pixelsPerUnit pixels across on the screen
+    def arguments(self, command, pixelsPerUnit):
+        name = command["name"]
+        if not self.enabled:
+            return command["arguments"]
+        # a batch is built from its shapes at their own levels
+        if "batched" in command:
+            return tuple((shape["name"], self.arguments(shape, pixelsPerUnit)) for shape in command["batched"])
+        if name not in shapeLevels:
+            return command["arguments"]
+
+        levels, segments = shapeLevels[name]
+        shapeKey = (name, command["arguments"])
+        if shapeKey not in self.pyramids:
+            self.pyramids[shapeKey] = levels(*command["arguments"])
+        pyramid = self.pyramids[shapeKey]
+
+        # the biggest copy of an instanced shape is the one that has to look
+        # smooth
+        if "instances" in command:
+            instances = command["instances"]
+            if instances not in self.instanceScales:
+                self.instanceScales[instances] = instancing.largestScale(command["matrices"])
+            pixelsPerUnit *= self.instanceScales[instances]
+        needed = segments(pixelsPerUnit, *command["arguments"])
+
+        # the coarsest level with enough segments, or the finest one we have
+        level = len(pyramid) - 1
+        for index, (levelSegments, arguments) in enumerate(pyramid):
+            if levelSegments >= needed:
+                level = index
+                break
+
+        # only go down to a coarser level than last frame once it has room to
+        # spare. Going up to a finer level happens straight away
+        levelKey = (shapeKey, command.get("instances"))
+        current = self.levels.get(levelKey)
+        if current is not None:
+            while level < current and needed > pyramid[level][0] * hysteresis:
+                level += 1
+        self.levels[levelKey] = level
+
+        return pyramid[level][1]
@@ -1,26 +1,40 @@
 #!/usr/bin/env python
 
 import sys
-import math
 import os
 
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 
-# the following should not be happening and is some kind of scoping issue
-# TODO: only import the shapes library once
-# this is so we can call the functions
-from shapes import *
-# this is so we can scan the functions
-import shapes
-
-# an inspecting function that will allow us to get all functions in a file
-# as a list
-import inspect
+import numpy as np
 
 import OpenGL.GL as gl
 
+from glib import GLIBError, GLIBParser
+from programs import ProgramCache, LinkedProgram, SceneProgram
+from preprocessor import ShaderPreprocessor, IncludeError
+from geometry import GeometryRegistry, MeshBuffer, InstanceBuffer, attributeLocations
+from uniforms import UniformStore, activeUniforms, setNumber, uploadVariable
+from uniformpanel import UniformPanel
+from profiler import FrameProfiler
+from scheduler import FrameScheduler
+from lod import LevelOfDetail
+import culling
+import loaders
+from axes import CoreAxes
+from textures import TextureCache
+from passes import FramebufferPool, FullscreenQuad, passVertexShader, corePassVertexShader
+import transforms
+
+# ask Qt for a core profile context for every OpenGL widget. This has to
+# happen before the QApplication is made
+def useCoreProfile():
+    surfaceFormat = QSurfaceFormat.defaultFormat()
+    surfaceFormat.setVersion(3, 3)
+    surfaceFormat.setProfile(QSurfaceFormat.CoreProfile)
+    QSurfaceFormat.setDefaultFormat(surfaceFormat)
+
 # generate and show a popup error message box
 def generateErrorMessage(label, text, moreDetails=""):
     msg = QMessageBox()
@@ -41,85 +55,14 @@ def makeSliderLabel(text):
     slider.setStyleSheet("QLabel { qproperty-alignment: AlignCenter; }")
     return slider
 
-def denormalizeSliderRange(min, value, max):
-    range = max - min
-    step = range / 100.0
-    return value * step
-
-def normalizeSliderRange(min, value, max):
-    range = max - min
-    step = range / 100.0
-    mult = 1 / step
-    normalMin = int(math.floor(min * mult))
-    normalMax = int(math.floor(max * mult))
-    normalValue = int(math.floor(value * mult))
-    return (normalMin, normalValue, normalMax)
-
-# returns a list of lines, each line split by white space into a list
-def parseGLIB(glibFile):
-    # read our glib file
-    with open(glibFile) as f:
-        glibContents = f.readlines()
-    # trim whitespace off the ends of strings
-    glibContents = [x.strip() for x in glibContents]
-    # split each argument by whitespace
-    glibContents = [x.split() for x in glibContents]
-    # remove all empty lines
-    glibContents = [x for x in glibContents if x != []]
-    return glibContents
-
-def parseUniformVariables(glibContents):
-    # a list of all our programs
-    programs = []
-    # the current program number we are on
-    programNumber = 0
-    # a flag to let us know if we are currently in a program scope (aka. between brackets)
-    inProgram = False
-
-    for line in glibContents:
-        # if we find an open bracket at the begining of a line, throw an error
-        if line[0] == "{":
-            print("""
-                Error: Unexpected open bracket.
-                Please place your opening brackets at the end of your program line""")
-            exit(1)
-
-        # if we got to a program
-        if line[0].lower() == "program":
-            programs.append({})
-            # get our program name
-            programs[programNumber]["name"] = line[1]
-            programs[programNumber]["variables"] = []
-            # if the user opened up a scope, that means they are going to have
-            # uniform variables that we are going to use in our program
-            if line[2] == "{":
-                inProgram = True
-                # move on to the next line
-                continue
-
-        if line[0] == "}":
-            inProgram = False
-            programNumber += 1
-
-        if inProgram:
-            # store the name, min default and max values
-            programs[programNumber]["variables"].append({
-                "name": line[0],
-                # remove the opening <
-                "min": float(line[1][1:]),
-                "value": float(line[2]),
-                # remove the closing >
-                "max": float(line[3][:-1])
-            })
-    return programs
-
-
 class Window(QWidget):
 
     def __init__(self):
         super(Window, self).__init__()
 
         self.glWidget = MakeGLWidget()
+        # update the uniform panel whenever the glib file declares different uniform variables
+        self.glWidget.uniformVariablesChanged.connect(self.showUniforms)
 
         # create our horizontal main layout
         self.mainLayout = QHBoxLayout()
@@ -128,8 +71,11 @@ class Window(QWidget):
         # expand the glWidget to fill all available space
         self.glWidget.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
-        # this is a container that will hold all our uniform variable sliders
-        self.uniformVariableSliders = QVBoxLayout()
+        # this holds the widgets for all our uniform variables, and only shows
+        # up once a glib file has some
+        self.uniformPanel = UniformPanel()
+        self.uniformPanel.uniformChanged.connect(self.glWidget.setUniformVariable)
+        self.uniformPanel.hide()
 
         # this is where we will hold all our control systems
         self.controlBar = self.makeControlBar()
@@ -186,6 +132,21 @@ class Window(QWidget):
         self.axisCheckbox.stateChanged.connect(self.glWidget.toggleAxes)
 
         checkBoxes.addWidget(self.axisCheckbox)
+
+        # turn on timing every frame, and show how long frames are taking
+        self.profilerCheckbox = self.makeCheckBox("Profiler")
+        self.profilerCheckbox.stateChanged.connect(self.toggleProfiler)
+        checkBoxes.addWidget(self.profilerCheckbox)
+
+        # keep drawing frames so that shaders using uTime and uFrame animate
+        self.animateCheckbox = self.makeCheckBox("Animate")
+        self.animateCheckbox.stateChanged.connect(lambda state: self.glWidget.scheduler.setContinuous(state == Qt.Checked))
+        checkBoxes.addWidget(self.animateCheckbox)
+
+        # draw shapes more coarsely the smaller they are on the screen
+        self.lodCheckbox = self.makeCheckBox("LOD")
+        self.lodCheckbox.stateChanged.connect(lambda state: self.glWidget.setLevelOfDetail(state == Qt.Checked))
+        checkBoxes.addWidget(self.lodCheckbox)
         # checkBoxes.addWidget(self.makeCheckBox("Orthographic"))
         controlBar.addLayout(checkBoxes)
 
@@ -193,10 +154,29 @@ class Window(QWidget):
         loadGlibButton.clicked.connect(self.getGLIB)
 
         reloadGlibButton = QPushButton("Reload GLIB File")
-        reloadGlibButton.clicked.connect(self.glWidget.loadGLIB)
+        reloadGlibButton.clicked.connect(self.glWidget.reloadGLIB)
 
         controlBar.addWidget(loadGlibButton)
         controlBar.addWidget(reloadGlibButton)
+
+        # show whether the shaders are still compiling and how long they took
+        self.compileStatus = makeSliderLabel("")
+        self.glWidget.compileStatusChanged.connect(self.compileStatus.setText)
+        controlBar.addWidget(self.compileStatus)
+
+        # the frame times, which only show up while the profiler is on
+        self.profilerLabel = makeSliderLabel("")
+        self.profilerLabel.hide()
+        self.exportTraceButton = QPushButton("Export Frame Trace")
+        self.exportTraceButton.clicked.connect(self.exportFrameTrace)
+        self.exportTraceButton.hide()
+        # refresh the frame times a couple of times a second
+        self.profilerTimer = QTimer(self)
+        self.profilerTimer.setInterval(500)
+        self.profilerTimer.timeout.connect(lambda: self.profilerLabel.setText(self.glWidget.profiler.summary()))
+        controlBar.addWidget(self.profilerLabel)
+        controlBar.addWidget(self.exportTraceButton)
+
         controlBar.addWidget(self.xLabel)
         controlBar.addWidget(self.xSlider)
         controlBar.addWidget(self.yLabel)
@@ -205,64 +185,11 @@ class Window(QWidget):
         controlBar.addWidget(self.zSlider)
         controlBar.addWidget(self.zoomLabel)
         controlBar.addWidget(self.zoomSlider)
+        controlBar.addWidget(self.uniformPanel)
         return controlBar
 
-    # remove all child elements from the layout
-    def clearLayout(self, layout):
-        # remove them in reverse order so that it does not shift the contents
-        # around while they are being removed
-        for i in reversed(range(layout.count())):
-            # when you set the parent to None, the cleaner automatically removes
-            # the widget
-            layout.itemAt(i).widget().setParent(None)
-
-        return layout
-
-    def addSliders(self, programs):
-        variableSliders = []
-        sliderLabels = []
-
-        programNumber = 0
-
-        self.uniformVariableSliders = self.clearLayout(self.uniformVariableSliders)
-
-        # for every program we have
-        for program in programs:
-            for key, value in program.items():
-                # if we see variables
-                if key == "variables":
-                    for variable in value:
-                        # convert the floats to an integer range
-                        sliderRange = normalizeSliderRange(variable["min"], variable["value"], variable["max"])
-                        # make a slider with a min and max value
-                        slider = self.createSlider(sliderRange[0], sliderRange[2])
-                        # set the slider to the default variable
-                        slider.setValue(sliderRange[1])
-                        # make a label for our slider
-                        label = makeSliderLabel(variable["name"])
-
-                        # define the program and variable names as variables
-                        variableName = variable["name"]
-                        # this is a tricky line, so it is in the readme
-                        slider.valueChanged.connect( lambda newValue, programNumber=programNumber, variableName=variableName: self.glWidget.setUniformVariable(programNumber, variableName, newValue) )
-                        # add the label and slider to their respective arrays
-                        sliderLabels.append(label)
-                        variableSliders.append(slider)
-            programNumber += 1
-
-        # just in case we have an uneven number of sliders and labels
-        if len(variableSliders) != len(sliderLabels):
-            print("Error: the number of sliders and labels do not match")
-            exit(1)
-
-        # only add in our uniform variable sliders if a program exists
-        if programNumber > 0:
-            self.controlBar.addLayout(self.uniformVariableSliders)
-
-        # for every slider and label
-        for x in range(0,len(variableSliders)):
-            self.uniformVariableSliders.addWidget(sliderLabels[x])
-            self.uniformVariableSliders.addWidget(variableSliders[x])
+    def showUniforms(self, programs):
+        self.uniformPanel.setPrograms(programs, self.glWidget.uniformVariables)
 
     def makeCheckBox(self, label):
         checkBox = QCheckBox(label)
@@ -278,6 +205,27 @@ class Window(QWidget):
         slider.setRange(start, end)
         return slider
 
+    def toggleProfiler(self, state):
+        profilerOn = state == Qt.Checked
+        self.glWidget.profiler.setEnabled(profilerOn)
+        self.profilerLabel.setVisible(profilerOn)
+        self.exportTraceButton.setVisible(profilerOn)
+        if profilerOn:
+            self.profilerTimer.start()
+        else:
+            self.profilerTimer.stop()
+        self.glWidget.scheduler.requestFrame()
+
+    def exportFrameTrace(self):
+        # it returns a tuple with the path and the filter type
+        fileName = QFileDialog.getSaveFileName(self, "Export Frame Trace", "frames.csv", "CSV (*.csv);;JSON (*.json)")[0]
+        if fileName != '':
+            try:
+                self.glWidget.profiler.export(fileName)
+            except (IOError, OSError) as error:
+                # like a folder we can not write to, or a full disk
+                generateErrorMessage("Export Error", "Could not write the frame trace to " + fileName, str(error))
+
     def getGLIB(self):
         # prompt the user for the file location
         dialog = QFileDialog()
@@ -285,10 +233,8 @@ class Window(QWidget):
         self.glibFile = dialog.getOpenFileName()[0]
         # if the user did not cancel the file selection
         if (self.glibFile != ''):
-            self.glibContents = parseGLIB(self.glibFile)
-            self.addSliders(parseUniformVariables(self.glibContents))
-
-            # now that we have the glib location, load it in
+            # now that we have the glib location, load it in. The glWidget will
+            # tell us which sliders to make once it has parsed the file
             self.glWidget.setGLIB(self.glibFile)
             self.glWidget.loadGLIB()
 
@@ -298,6 +244,10 @@ class MakeGLWidget(QOpenGLWidget):
     yRotationChanged = pyqtSignal(int)
     zRotationChanged = pyqtSignal(int)
     zoomChanged = pyqtSignal(int)
+    # sends out the programs from the glib file when their uniform variables change
+    uniformVariablesChanged = pyqtSignal(list)
+    # tells the user how compiling the shaders is going
+    compileStatusChanged = pyqtSignal(str)
 
     def __init__(self, parent=None):
         super(MakeGLWidget, self).__init__(parent)
@@ -309,26 +259,124 @@ class MakeGLWidget(QOpenGLWidget):
             "y": 0,
             "z": 0
         }
-        self.uniformVariables = {}
+        # a uniform store for every program in the glib file
+        self.uniformVariables = []
+        # the numbers the widgets set since the last frame
+        self.pendingUniforms = {}
+        # the programs and uniform variables the glib file declared last time
+        # we loaded it, so we know whether we need new sliders
+        self.uniformDeclarations = None
 
         self.axisOn = 2
 
         self.programOn = False
 
+        # every shader program we have linked, so we only compile when the
+        # shader source actually changes
+        self.programCache = ProgramCache()
+        # pastes the files our shaders #include into them, and remembers which
+        # shaders include which files
+        self.preprocessor = ShaderPreprocessor()
+        # every program of the glib file, which the shapes are drawn with by
+        # their number
+        self.scenePrograms = []
+        # the linked program we are drawing with, while we draw a frame
+        self.currentProgram = None
+        # the uniform store whose values are in each linked program, since
+        # programs with the same shaders share one, and the stores of all the
+        # programs that share each one
+        self.uniformOwners = {}
+        self.sharedStores = {}
+        # the programs the driver is still compiling, by their shaders. We
+        # keep drawing with the programs we have until all of them are ready
+        self.pendingPrograms = {}
+        # the program of every pass in the glib file, the uniforms each one
+        # has, and the ones the driver is still building
+        self.passPrograms = []
+        self.passUniforms = []
+        # the variable and version of every slider value each pass was last sent
+        self.passUploads = []
+        self.pendingPasses = []
+        # checks in on the compiler every frame while a program is being built
+        self.compileTimer = QTimer(self)
+        self.compileTimer.setInterval(16)
+        self.compileTimer.timeout.connect(self.checkCompile)
+
+        # every shape we have built, so we only build a shape once
+        self.geometry = GeometryRegistry()
+
+        # every texture we have loaded, which are decoded in the background
+        self.textureCache = TextureCache()
+        # the sampler uniform and texture cache key of every texture the glib
+        # file uses, in the order of their texture units
+        self.textures = []
+        # the texture we last bound to each texture unit
+        self.boundTextures = {}
+
+        # the offscreen target the scene is drawn into and the passes that
+        # are drawn after it, if the glib file has any
+        self.sceneTarget = None
+        self.passes = []
+        # the targets the passes draw into, which are reused every frame
+        self.framebufferPool = FramebufferPool()
+        # the rectangle each pass draws, made once we have a context
+        self.quad = None
+        # hands decoded images to the graphics card while they come in
+        self.textureTimer = QTimer(self)
+        self.textureTimer.setInterval(16)
+        self.textureTimer.timeout.connect(self.checkTextures)
+
+        # measures where the time goes in every frame, when it is turned on
+        self.profiler = FrameProfiler()
+
+        # collects every change into at most one frame per refresh, and keeps
+        # the clock for animated shaders
+        self.scheduler = FrameScheduler(self)
+
         self.lastPos = QPoint()
 
         self.workingDirectory = ""
         self.glibFile = ""
-        self.glibContents = ""
+        # reads the glib file, and remembers its lines so that reading it
+        # again only parses the lines that changed
+        self.glibParser = GLIBParser()
+        # everything the glib file describes, once we have read it
+        self.scene = None
 
         self.scale = 1
-
-        # get all functions in the shapes module
-        self.availableShapes = inspect.getmembers(shapes, inspect.isfunction)
-        self.availableShapes = [i[0] for i in self.availableShapes]
+        # the size of the window in pixels, as of the last resizeGL
+        self.viewport = (1, 1)
+        # picks how finely to tessellate each shape, when LOD is checked
+        self.levelOfDetail = LevelOfDetail()
+
+        # whether we draw with the core profile, with vertex arrays and our own
+        # matrices, rather than display lists and the fixed function pipeline.
+        # this is picked at startup with --core
+        self.core = QSurfaceFormat.defaultFormat().profile() == QSurfaceFormat.CoreProfile
+        # the matrices that place the scene, worked out with numpy every frame
+        self.projection = transforms.identity()
+        self.modelView = transforms.identity()
+
+        # the shapes to draw every frame, compiled from the glib file
+        self.drawPlan = []
+        # the same shapes with the ones next to each other merged into
+        # batches, and the bounding sphere of each one for culling
+        self.drawItems = []
+        self.drawCenters, self.drawRadii = culling.boundingSpheres([])
+        # the position the matrices were last moved to while drawing
+        self.placedPosition = None
 
         self.backgroundColor = QColor.fromCmykF(0.0, 0.0, 0.0, 1.0)
 
+        # when we render without a window there is nobody to click through
+        # error messages, so we raise them instead
+        self.headless = False
+
+        # watch the glib file and its shaders so that saving any of them
+        # reloads just the part that changed
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.fileChanged)
+
     def getOpenglInfo(self):
         info = """
             Vendor: {0}
@@ -344,83 +392,473 @@ class MakeGLWidget(QOpenGLWidget):
 
         return info
 
+    # where we save compiled shader programs between runs
+    def programCacheDirectory(self):
+        return os.path.join(QStandardPaths.writableLocation(QStandardPaths.CacheLocation), "programs")
+
     def minimumSizeHint(self):
         return QSize(150, 150)
 
     def sizeHint(self):
         return QSize(4000, 4000)
 
+    def showError(self, label, text):
+        if self.headless:
+            raise RuntimeError(label + ": " + text)
+        generateErrorMessage(label, text)
+
     def toggleAxes(self, value):
         self.axisOn = value
-        self.update()
-
-    def glibCommandToFunction(self, command):
-        # get the function name
-        function = command[0].lower() + "("
-        # start at the first argument and add in all the arguments that
-        # have a comma after them
-        for x in range(1,len(command) - 1):
-            function += command[x]
-            function += ","
-        # add in the last argument with a closing parenthisis
-        function += command[-1] + ")"
-        return function
+        self.scheduler.requestFrame()
 
     def setGLIB(self, glibFile):
+        # the shapes, textures and targets of the last file are no use to a
+        # new one, so give their memory back to the graphics card
+        if glibFile != self.glibFile and self.isValid():
+            self.makeCurrent()
+            self.geometry.clear()
+            self.textureCache.clear()
+            self.framebufferPool.clear()
+            self.doneCurrent()
+        # along with the meshes it loaded that were never drawn
+        if glibFile != self.glibFile:
+            loaders.clearMeshes()
         self.glibFile = glibFile
         # get the directory that the glib file comes from so we can look for shaders
         self.workingDirectory = os.path.dirname(self.glibFile)
-        self.glibContents = parseGLIB(glibFile)
+        # a new file always gets a new set of sliders, which start at the
+        # values it gives them
+        self.uniformDeclarations = None
+        self.uniformVariables = []
+        self.pendingUniforms = {}
+        # and starts its animation from the beginning
+        self.scheduler.resetClock()
+        self.glibParser = GLIBParser()
+        self.levelOfDetail.clear()
+
+    # read the glib file again and load whatever changed in it
+    def reloadGLIB(self):
+        if self.glibFile == "":
+            return
+        self.loadGLIB()
 
     def loadGLIB(self):
+        # read the glib file once, and work out everything we have to draw
+        # before we touch any shaders
+        try:
+            scene = self.glibParser.parse(self.glibFile)
+            # the files a glib file reads can go away while we read them
+            textures = [(texture["name"], TextureCache.key(texture["file"])) for texture in scene.textures]
+        except (GLIBError, OSError) as error:
+            self.showError("GLIB Error", str(error))
+            return
+        self.scene = scene
+        self.drawPlan = self.scene.drawPlan
+        self.drawItems = culling.sortDrawItems(culling.batchDrawPlan(self.drawPlan))
+        self.drawCenters, self.drawRadii = culling.boundingSpheres(self.drawItems)
+
+        self.sceneTarget = self.scene.target
+        self.passes = self.scene.passes
+
+        # start decoding any textures we do not have yet, and keep drawing
+        # while they load
+        self.textures = textures
+        self.textureCache.use([key for name, key in self.textures])
+        if self.textureCache.pending:
+            self.textureTimer.start()
+
+        # only start over with new uniform variables and sliders if the glib
+        # file declares different ones, otherwise keep the values we have
+        programs = self.scene.programs
+        if programs != self.uniformDeclarations:
+            self.uniformDeclarations = programs
+            # variables that are declared just like before keep their values
+            self.applyUniformChanges()
+            previousStores = dict([(uniformStore.name, uniformStore) for uniformStore in self.uniformVariables])
+            self.uniformVariables = [UniformStore(program, previousStores.get(program["name"])) for program in programs]
+            self.uniformVariablesChanged.emit(programs)
+
+        # a glib file without any programs draws everything with its shaders
+        declaredPrograms = programs
+        if not declaredPrograms and (self.scene.vertex is not None or self.scene.fragment is not None):
+            declaredPrograms = [{"name": None, "vertex": self.scene.vertex, "fragment": self.scene.fragment}]
+
         # to keep track of whether we have a missing file
         missingShader = False
-
-        # for every line in our glib file
-        for line in self.glibContents:
-            # if the line starts with the keyword Vertex, we will be loading a
-            # vertex file
-            if line[0].lower() == 'vertex':
-                # add the absolute path, and the file name
-                self.vertexFile = self.workingDirectory + '/' + line[1] + '.vert'
-                print("Looking for", self.vertexFile)
-
-                # if the file exists
-                if os.path.isfile(self.vertexFile):
-                    print("Found", self.vertexFile)
-                    self.vertOn = True
-                else:
+        # the programs we drew with until now keep drawing while the new ones
+        # compile
+        linkedPrograms = dict([(sceneProgram.shaders(), sceneProgram.linked) for sceneProgram in self.scenePrograms])
+        scenePrograms = []
+        for number, program in enumerate(declaredPrograms):
+            shaderFiles = []
+            for shader, extension, kind in ((program["vertex"], ".vert", "vertex"), (program["fragment"], ".frag", "fragment")):
+                if shader is None:
                     missingShader = True
-                    generateErrorMessage("Missing Shader", "Could not find your vertex shader file. Aborting loading the files")
-
-            if line[0].lower() == 'fragment':
-                self.fragmentFile = self.workingDirectory + '/' + line[1] + '.frag'
-                print("Looking for", self.fragmentFile)
-                if os.path.isfile(self.fragmentFile):
-                    print("Found", self.fragmentFile)
-                    self.fragOn = True
-                else:
+                    self.showError("Missing Shader", "The program " + (program["name"] or "") + " has no " + kind + " shader. Aborting loading the files")
+                    break
+                # add the absolute path, and the file name
+                shaderFile = self.workingDirectory + '/' + shader + extension
+                print("Looking for", shaderFile)
+                if not os.path.isfile(shaderFile):
                     missingShader = True
-                    generateErrorMessage("Missing Shader", "Could not find your fragment shader file. Aborting loading the files")
-
-        self.uniformVariables = parseUniformVariables(self.glibContents)
-
+                    self.showError("Missing Shader", "Could not find your " + kind + " shader file " + shader + extension + ". Aborting loading the files")
+                    break
+                print("Found", shaderFile)
+                shaderFiles.append(shaderFile)
+            if missingShader:
+                break
+
+            sceneProgram = SceneProgram(program["name"], shaderFiles[0], shaderFiles[1], self.uniformVariables[number] if programs else None)
+            sceneProgram.linked = linkedPrograms.get(sceneProgram.shaders())
+            if sceneProgram.linked is not None:
+                # the textures might be in different units now
+                sceneProgram.linked.samplersDirty = True
+            scenePrograms.append(sceneProgram)
+
+        # a glib file without any shaders just draws its shapes
+        if not declaredPrograms:
+            self.scenePrograms = []
+            self.programOn = False
         # if we are not missing a shader, turn on the shader program
-        if not missingShader:
+        elif not missingShader:
+            self.scenePrograms = scenePrograms
             self.programOn = True
 
-        self.update()
-
-    def setUniformVariable(self, program, variableName, value):
-        for variable in self.uniformVariables[program]["variables"]:
-            if variable["name"] == variableName:
-                variable["value"] = value;
-        self.update()
+            # we need an OpenGL context to build the program in. If we have not
+            # been initialized yet, initializeGL will build it for us
+            if self.isValid():
+                self.makeCurrent()
+                # any new uniform variables need to find their place in the
+                # program we keep drawing with while the new one compiles
+                self.bindUniforms()
+                self.buildProgram()
+                self.doneCurrent()
+
+        self.watchFiles()
+        self.scheduler.requestFrame()
+
+    # the files that the shapes in the scene are read from, like meshes and
+    # the files that place the copies of instanced shapes
+    def sceneFiles(self):
+        textureFiles = [texture["file"] for texture in self.scene.textures] if self.scene is not None else []
+        return [sceneFile for command in self.drawPlan for sceneFile in command.get("files", [])] + textureFiles
+
+    # the shaders of the scene's programs and its passes that are there to be
+    # read, each one once
+    def shaderFiles(self):
+        programShaders = [shaderFile for sceneProgram in self.scenePrograms for shaderFile in sceneProgram.shaders()]
+        passShaders = [renderPass[shader] for renderPass in self.passes for shader in ("vertex", "fragment") if renderPass[shader]]
+        shaderFiles = []
+        for shaderFile in programShaders + passShaders:
+            if shaderFile not in shaderFiles and os.path.isfile(shaderFile):
+                shaderFiles.append(shaderFile)
+        return shaderFiles
+
+    # every file that our shaders include, as of the last time we built them
+    def includedFiles(self):
+        includedFiles = []
+        for shaderFile in self.shaderFiles():
+            includedFiles += [path for path in self.preprocessor.includedFiles(shaderFile, self.workingDirectory) if path not in includedFiles]
+        return includedFiles
+
+    # watch the glib file and every shader, included file and scene file it
+    # uses for changes
+    def watchFiles(self):
+        files = [self.glibFile] + self.sceneFiles() + self.shaderFiles() + self.includedFiles()
+
+        if self.watcher.files():
+            self.watcher.removePaths(self.watcher.files())
+        self.watcher.addPaths(files)
+
+    # start watching any files our shaders include that we are not watching
+    # yet, like when a shader was just saved with a new #include
+    def watchIncludes(self):
+        includedFiles = [path for path in self.includedFiles() if path not in self.watcher.files()]
+        if includedFiles:
+            self.watcher.addPaths(includedFiles)
+
+    def fileChanged(self, path):
+        # a lot of editors save by replacing the file, which makes the watcher
+        # forget about it, so start watching it again
+        if os.path.isfile(path) and path not in self.watcher.files():
+            self.watcher.addPath(path)
+
+        if path == self.glibFile or path in self.sceneFiles():
+            # the scene itself changed, so parse it again
+            self.reloadGLIB()
+        elif not os.path.isfile(path):
+            # the file is in the middle of being saved, we will get another
+            # change once it is written
+            return
+        elif self.programOn and self.isValid() and (path in self.shaderFiles() or self.preprocessor.dependents(path)):
+            # only a shader or a file they include changed, so keep the scene,
+            # shapes and sliders we have and just rebuild the shader programs.
+            # A file no shader includes anymore is left alone. Only the shaders
+            # that include a changed file are put back together, and only
+            # programs whose source changed are compiled
+            self.makeCurrent()
+            self.buildProgram()
+            self.doneCurrent()
+            self.scheduler.requestFrame()
+
+    # start compiling our shaders. The program cache will only do the work if
+    # the source code of the shaders has changed since the last time, and we
+    # keep drawing with the programs we have until the new ones are ready
+    def buildProgram(self):
+        defaultVertexSource = corePassVertexShader if self.core else passVertexShader
+        try:
+            # programs with the same shaders are only built once
+            sources = {}
+            for sceneProgram in self.scenePrograms:
+                if sceneProgram.shaders() not in sources:
+                    sources[sceneProgram.shaders()] = (self.readShader(sceneProgram.vertexFile), self.readShader(sceneProgram.fragmentFile))
+            passSources = [(self.readShader(renderPass["vertex"]) if renderPass["vertex"] else defaultVertexSource, self.readShader(renderPass["fragment"])) for renderPass in self.passes]
+        except IncludeError as error:
+            # keep drawing with the programs we have until it is fixed
+            self.showError("Include Error", str(error))
+            return
+        except OSError as error:
+            # a shader or a file it includes can go away between the watcher
+            # telling us it changed and us reading it
+            self.showError("Shader Error", str(error))
+            return
+        finally:
+            self.watchIncludes()
+
+        # newer shaders replace any we were still compiling
+        for pendingProgram in self.pendingPrograms.values():
+            pendingProgram.discard()
+
+        # different shader files can still have the same source code
+        started = {}
+        self.pendingPrograms = {}
+        for shaders, shaderSources in sources.items():
+            if shaderSources not in started:
+                started[shaderSources] = self.programCache.startProgram(*shaderSources)
+            self.pendingPrograms[shaders] = started[shaderSources]
+
+        # the passes are built along with the scene's programs, and the ones
+        # without a vertex shader get one that covers the window
+        for pendingPass in self.pendingPasses:
+            pendingPass.discard()
+        self.pendingPasses = [self.programCache.startProgram(passVertexSource, passFragmentSource) for passVertexSource, passFragmentSource in passSources]
+
+        if not all([pendingProgram.finished for pendingProgram in started.values()]):
+            self.compileStatusChanged.emit("Compiling shaders...")
+        self.compileTimer.start()
+
+    # the source code of a shader with the files it includes pasted in
+    def readShader(self, shaderFile):
+        return self.preprocessor.expand(shaderFile, self.workingDirectory)
+
+    # see if the driver is done with the programs we are compiling
+    def checkCompile(self):
+        if not self.pendingPrograms or not self.isValid():
+            self.compileTimer.stop()
+            return
+
+        self.makeCurrent()
+        # if the driver can not compile in the background, this is where we
+        # wait for it, which is still outside of drawing a frame
+        if all([pendingProgram.isReady() for pendingProgram in self.pendingPrograms.values()]) and all([pendingPass.isReady() for pendingPass in self.pendingPasses]):
+            self.finishProgram()
+        self.doneCurrent()
+
+    def finishProgram(self):
+        pendingPrograms = self.pendingPrograms
+        self.pendingPrograms = {}
+        self.compileTimer.stop()
+
+        programs = {}
+        failed = False
+        compileTime = None
+        for shaders, pendingProgram in pendingPrograms.items():
+            wasCompiled = not pendingProgram.finished
+            programs[shaders] = self.programCache.finishProgram(pendingProgram)
+            if programs[shaders] is None:
+                failed = True
+            elif wasCompiled:
+                # the programs were compiled side by side
+                compileTime = max(compileTime or 0.0, pendingProgram.compileTime)
+        self.finishPasses()
+
+        # if the shaders of a program did not compile, keep drawing it with the
+        # last version that did so a typo does not take down the whole scene.
+        # Programs with the same shaders share their linked program
+        linkedPrograms = dict([(sceneProgram.linked.program, sceneProgram.linked) for sceneProgram in self.scenePrograms if sceneProgram.linked is not None])
+        for sceneProgram in self.scenePrograms:
+            program = programs.get(sceneProgram.shaders())
+            if program is not None:
+                if program not in linkedPrograms:
+                    linkedPrograms[program] = LinkedProgram(program)
+                sceneProgram.linked = linkedPrograms[program]
+
+        if failed:
+            print("Keeping the last shader program that compiled")
+            self.compileStatusChanged.emit("Shaders failed to compile")
+        elif compileTime is not None:
+            self.profiler.addEvent("compile", compileTime)
+            self.compileStatusChanged.emit("Compiled shaders in {0:.1f} ms".format(compileTime * 1000))
+
+        # release any programs we built from an older version of the shaders
+        self.programCache.release([sceneProgram.linked.program for sceneProgram in self.scenePrograms if sceneProgram.linked is not None] + self.passPrograms)
+        self.bindUniforms()
+        self.scheduler.requestFrame()
+
+    # whether every program of the glib file has linked, at least once
+    def programsLinked(self):
+        return all([sceneProgram.linked is not None for sceneProgram in self.scenePrograms])
+
+    def finishPasses(self):
+        passPrograms = [self.programCache.finishProgram(pendingPass) for pendingPass in self.pendingPasses]
+        self.pendingPasses = []
+        # like the scene's program, keep drawing the last passes that compiled
+        if None in passPrograms and len(self.passPrograms) == len(passPrograms):
+            print("Keeping the last pass programs that compiled")
+            return
+        self.passPrograms = [program or 0 for program in passPrograms]
+        self.passUniforms = [activeUniforms(program) if program else {} for program in self.passPrograms]
+        # a newly linked pass has none of the sliders' values in it yet
+        self.passUploads = [{} for program in self.passPrograms]
+
+    # wait for the program we are compiling to be ready, for when we can not
+    # wait on the compile timer, like when rendering without a window
+    def waitForProgram(self):
+        if self.pendingPrograms and self.isValid():
+            self.makeCurrent()
+            self.finishProgram()
+            self.doneCurrent()
+
+    # hand the textures that are done decoding to the graphics card
+    def checkTextures(self):
+        if not self.textureCache.pending:
+            self.textureTimer.stop()
+            return
+        if not self.isValid():
+            return
+
+        self.makeCurrent()
+        uploaded, errors = self.textureCache.uploadFinished()
+        self.doneCurrent()
+        self.textureLoaded(uploaded, errors)
+
+    # wait for every texture to be loaded, for when we can not wait on the
+    # texture timer, like when rendering without a window
+    def waitForTextures(self):
+        if self.textureCache.pending and self.isValid():
+            self.makeCurrent()
+            uploaded, errors = self.textureCache.uploadFinished(wait=True)
+            self.doneCurrent()
+            self.textureLoaded(uploaded, errors)
+
+    def textureLoaded(self, uploaded, errors):
+        if uploaded:
+            # uploading binds the new textures, so our bindings are gone
+            self.boundTextures = {}
+            self.scheduler.requestFrame()
+        for error in errors:
+            self.showError("Texture Error", error)
+
+    # bind every texture to its texture unit. Textures that are still loading
+    # are left unbound, and a texture that is already bound costs nothing
+    def bindTextures(self, linkedProgram):
+        if linkedProgram.samplersDirty:
+            for unit, (name, key) in enumerate(self.textures):
+                location = gl.glGetUniformLocation(linkedProgram.program, name)
+                if location != -1:
+                    gl.glUniform1i(location, unit)
+            linkedProgram.samplersDirty = False
+
+        for unit, (name, key) in enumerate(self.textures):
+            texture = self.textureCache.get(key)
+            textureName = texture.texture if texture is not None else 0
+            if self.boundTextures.get(unit) != textureName:
+                gl.glActiveTexture(gl.GL_TEXTURE0 + unit)
+                gl.glBindTexture(gl.GL_TEXTURE_2D, textureName)
+                self.boundTextures[unit] = textureName
+
+    # find where each uniform variable lives in the program it is drawn with
+    def bindUniforms(self):
+        self.sharedStores = {}
+        for sceneProgram in self.scenePrograms:
+            if sceneProgram.linked is not None and sceneProgram.uniformStore is not None:
+                sceneProgram.uniformStore.bind(sceneProgram.linked.program)
+                self.sharedStores.setdefault(sceneProgram.linked.program, []).append(sceneProgram.uniformStore)
+        # which means every store has to send all of its values again
+        self.uniformOwners = {}
+
+    # start drawing with a program of the glib file, and send it whatever
+    # changed since we last drew with it. Returns whether we can draw with it,
+    # which the core profile can not until it has linked
+    def useProgram(self, sceneProgram):
+        linkedProgram = sceneProgram.linked
+        self.currentProgram = linkedProgram
+        # the matrices are sent again with the first shape we place
+        self.placedPosition = None
+        if linkedProgram is None:
+            # without the core profile the shapes are drawn without shaders
+            gl.glUseProgram(0)
+            return not self.core
+        gl.glUseProgram(linkedProgram.program)
+
+        # programs with the same shaders share a linked program, and each one
+        # sees the values of the others, like a single program with all of
+        # their sliders would. Its own values go in last, so they win when
+        # two of them have a variable with the same name
+        uniformStore = sceneProgram.uniformStore
+        if uniformStore is not None:
+            sharedStores = self.sharedStores.get(linkedProgram.program, [])
+            if self.uniformOwners.get(linkedProgram.program) is not uniformStore:
+                for sharedStore in sharedStores:
+                    sharedStore.invalidate()
+                self.uniformOwners[linkedProgram.program] = uniformStore
+            for sharedStore in sharedStores:
+                if sharedStore is not uniformStore and sharedStore.dirty:
+                    uniformStore.dirty.update(sharedStore.dirty.intersection(uniformStore.variables))
+                    sharedStore.upload()
+            uniformStore.upload()
+
+        self.bindTextures(linkedProgram)
+        # the animation clock changes every frame, so it always goes up
+        if linkedProgram.timeUniform is not None:
+            setNumber(linkedProgram.timeUniform[0], linkedProgram.timeUniform[1], self.scheduler.animationTime)
+        if linkedProgram.frameUniform is not None:
+            setNumber(linkedProgram.frameUniform[0], linkedProgram.frameUniform[1], self.scheduler.frame)
+        return True
+
+    # set the numbers of a uniform variable from its widget, starting at the
+    # index-th number of the variable. A slider that is dragged quickly moves
+    # many times a frame, so only the last numbers each widget set before the
+    # next frame are kept
+    def setUniformVariable(self, program, variableName, index, values):
+        self.pendingUniforms[(program, variableName, index)] = values
+        self.scheduler.requestFrame()
+
+    # hand the numbers the widgets set since the last frame to the programs
+    def applyUniformChanges(self):
+        for (program, variableName, index), values in self.pendingUniforms.items():
+            if program < len(self.uniformVariables):
+                self.uniformVariables[program].setValues(variableName, index, values)
+        self.pendingUniforms = {}
+
+    # set a uniform variable to an exact value, in every program that has it
+    def setUniformValue(self, variableName, value):
+        found = False
+        for uniformStore in self.uniformVariables:
+            if variableName in uniformStore.variables:
+                uniformStore.setValue(variableName, value)
+                found = True
+        self.scheduler.requestFrame()
+        return found
+
+    def setLevelOfDetail(self, enabled):
+        self.levelOfDetail.enabled = enabled
+        self.scheduler.requestFrame()
 
     def changeZoom(self, value):
         self.scale = value / 100.0
         self.zoomChanged.emit(value)
-        self.update()
+        self.scheduler.requestFrame()
 
     def setRotation(self, axis, angle):
         angle = self.normalizeAngle(angle)
@@ -432,7 +870,7 @@ class MakeGLWidget(QOpenGLWidget):
                 self.yRotationChanged.emit(angle)
             elif axis == 'z':
                 self.zRotationChanged.emit(angle)
-            self.update()
+            self.scheduler.requestFrame()
 
     # initialize the GL context. This is only called once on setup
     def initializeGL(self):
@@ -442,141 +880,255 @@ class MakeGLWidget(QOpenGLWidget):
         # set the background to a dark grey
         self.setClearColor(self.backgroundColor.darker())
 
-        # create an arrows object (call list)
-        self.axis = self.Arrow()
+        if self.core:
+            # the core profile has no display lists, so the axes get a vertex
+            # array, and every program puts its attributes where our vertex
+            # arrays expect them
+            self.axis = CoreAxes()
+            self.programCache.bindAttributes(attributeLocations)
+        else:
+            # create an arrows object (call list)
+            self.axis = self.Arrow()
+            gl.glShadeModel(gl.GL_SMOOTH)
 
-        gl.glShadeModel(gl.GL_SMOOTH)
         gl.glEnable(gl.GL_DEPTH_TEST)
         gl.glEnable(gl.GL_CULL_FACE)
 
-    # evaluate a shape written in the glib file
-    def evaluateShape(self, command):
-        # get the name of the shape (function) from the glib file
-        function = self.glibCommandToFunction(command)
-        # call the function associated with the name
-        gl.glCallList(eval(function))
-
-    def evaluateCommand(self, command):
-        # if the shape we got is in the list of available shapes
-        if command[0] in self.availableShapes:
-            # call the command associated with that shape
-            self.evaluateShape(command)
-
-    def createProgram(self, shaderList):
-        program = gl.glCreateProgram()
-
-        for shader in shaderList:
-            gl.glAttachShader(program, shader)
+        self.quad = FullscreenQuad(self.core)
 
-        gl.glLinkProgram(program)
+        # compile shaders in the background if the driver lets us
+        self.programCache.enableParallelCompile()
+        # a saved program only works with the exact driver that saved it
+        self.programCache.useBinaryCache(self.programCacheDirectory(), self.getOpenglInfo())
 
-        status = gl.glGetProgramiv(program, gl.GL_LINK_STATUS)
-        if status == gl.GL_FALSE:
-            # Note that getting the error log is much simpler in Python than in C/C++
-            # and does not require explicit handling of the string buffer
-            strInfoLog = gl.glGetProgramInfoLog(program)
-            print("Linker failure: \n" + strInfoLog)
-
-        for shader in shaderList:
-            gl.glDetachShader(program, shader)
-
-        return program
-
-    def loadShader(self, shaderType, shaderFile):
-        if os.path.isfile(shaderFile):
-            with open(shaderFile, 'r') as f:
-                shaderData = f.read()
-        else:
-            # this should have been taken care of already, but this is here just
-            # incase
-            raise IOError("Could not find shader file")
-
-        shader = gl.glCreateShader(shaderType)
-        gl.glShaderSource(shader, shaderData) # note that this is a simpler function call than in C
-
-        # This shader compilation is more explicit than the one used in
-        # framework.cpp, which relies on a glutil wrapper function.
-        # This is made explicit here mainly to decrease dependence on pyOpenGL
-        # utilities and wrappers, which docs caution may change in future versions.
-        gl.glCompileShader(shader)
-
-        status = gl.glGetShaderiv(shader, gl.GL_COMPILE_STATUS)
-        if status == gl.GL_FALSE:
-            # Note that getting the error log is much simpler in Python than in C/C++
-            # and does not require explicit handling of the string buffer
-            strShaderType = ""
-            if shaderType is gl.GL_VERTEX_SHADER:
-                strShaderType = "vertex"
-            elif shaderType is gl.GL_GEOMETRY_SHADER:
-                strShaderType = "geometry"
-            elif shaderType is gl.GL_FRAGMENT_SHADER:
-                strShaderType = "fragment"
-
-            print("Compilation failure for " + strShaderType + " shader:\n")
-
-        return shader
+        # if a glib file was loaded before we had a context, build it now
+        if self.programOn:
+            self.buildProgram()
+            # without a window the first frame is the one that gets saved, so
+            # it waits for the programs to link instead of drawing without them
+            if self.headless:
+                self.finishProgram()
 
     # this function runs every time something on the GL window changes
     def paintGL(self):
+        self.scheduler.frameStarted()
+        self.applyUniformChanges()
+        self.profiler.beginFrame()
+        self.profiler.beginPhase("setup")
+
+        # the targets drawn so far this frame, by name
+        targets = {}
+        # draw the scene into its target once the passes that read it are
+        # ready, and straight into the window until then
+        passesReady = self.passes and len(self.passPrograms) == len(self.passes) and all(self.passPrograms)
+        if passesReady and self.sceneTarget is not None:
+            targets[self.sceneTarget["name"]] = self.bindTarget(self.sceneTarget["name"], self.sceneTarget["format"])
+
         gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
-        gl.glLoadIdentity()
-
-        # if we never loaded in a glib file
-        if not self.programOn:
-            gl.glTranslated(0.0, 0.0, -10.0)
-            # set the rotations
-            gl.glRotated(self.rotation['x'] / 16.0, 1.0, 0.0, 0.0)
-            gl.glRotated(self.rotation['y'] / 16.0, 0.0, 1.0, 0.0)
-            gl.glRotated(self.rotation['z'] / 16.0, 0.0, 0.0, 1.0)
-            gl.glScalef(self.scale, self.scale, self.scale)
-
-            # if the box is checked
+
+        # move the scene back, then set the rotations and the zoom
+        self.modelView = transforms.translate(0.0, 0.0, -10.0)
+        self.modelView = self.modelView @ transforms.rotate(self.rotation['x'] / 16.0, 1.0, 0.0, 0.0)
+        self.modelView = self.modelView @ transforms.rotate(self.rotation['y'] / 16.0, 0.0, 1.0, 0.0)
+        self.modelView = self.modelView @ transforms.rotate(self.rotation['z'] / 16.0, 0.0, 0.0, 1.0)
+        self.modelView = self.modelView @ transforms.scale(self.scale, self.scale, self.scale)
+
+        # draw the axes if the box is checked
+        if self.core:
             if (self.axisOn == 2):
-                # add in our axis
-                gl.glCallList(self.axis)
+                self.axis.draw(self.projection @ self.modelView)
         else:
+            # hand our matrix to the fixed function pipeline, so shaders can
+            # keep using gl_ModelViewProjectionMatrix and friends
+            gl.glMatrixMode(gl.GL_MODELVIEW)
+            gl.glLoadMatrixf(np.ascontiguousarray(self.modelView.T))
             # don't use a shader program while we draw the axes
             gl.glUseProgram(0)
-
-            shaderList = []
-            shaderList.append(self.loadShader(gl.GL_VERTEX_SHADER, self.vertexFile))
-            shaderList.append(self.loadShader(gl.GL_FRAGMENT_SHADER, self.fragmentFile))
-            program = self.createProgram(shaderList)
-            for shader in shaderList:
-                gl.glDeleteShader(shader)
-
-            gl.glTranslated(0.0, 0.0, -10.0)
-            gl.glRotated(self.rotation['x'] / 16.0, 1.0, 0.0, 0.0)
-            gl.glRotated(self.rotation['y'] / 16.0, 0.0, 1.0, 0.0)
-            gl.glRotated(self.rotation['z'] / 16.0, 0.0, 0.0, 1.0)
-            gl.glScalef(self.scale, self.scale, self.scale)
-
-            # if the box is checked for axis on
             if (self.axisOn == 2):
                 gl.glCallList(self.axis)
 
-            # bind the shader program
+        self.profiler.endPhase("setup")
+
+        # if we loaded in a glib file
+        if self.programOn:
+            # how many pixels one unit of the scene covers, which is how the
+            # level of detail knows how big each shape is on the screen. The
+            # shorter side of the window spans one unit before zooming
+            pixelsPerUnit = min(self.viewport) * self.devicePixelRatioF() * self.scale
+
+            # only draw what is on the screen
+            self.profiler.beginPhase("cull")
+            visible = culling.visibleShapes(self.drawCenters, self.drawRadii, self.projection @ self.modelView)
+            self.profiler.endPhase("cull")
+
+            # for every shape in the glib file. They are sorted by the program
+            # they are drawn with, so we only switch programs and send their
+            # uniform variables once for each program
+            self.profiler.beginPhase("draw")
+            sceneProgram = None
+            drawable = False
+            for commandNumber in np.flatnonzero(visible):
+                command = self.drawItems[commandNumber]
+                # a glib file that is missing a shader keeps drawing with the
+                # programs of the last one that was not
+                programNumber = min(command["program"], len(self.scenePrograms) - 1)
+                if self.scenePrograms[programNumber] is not sceneProgram:
+                    sceneProgram = self.scenePrograms[programNumber]
+                    self.profiler.endPhase("draw")
+                    self.profiler.beginPhase("uniforms")
+                    drawable = self.useProgram(sceneProgram)
+                    self.profiler.endPhase("uniforms")
+                    self.profiler.beginPhase("draw")
+                if not drawable:
+                    continue
+
+                self.profiler.beginQuery("{0} {1}".format(commandNumber, command["name"]))
+                self.placeShape(command["position"])
+                arguments = self.levelOfDetail.arguments(command, pixelsPerUnit)
+                if "instances" in command:
+                    self.drawInstances(command, arguments)
+                elif self.core or command["function"] is None:
+                    # there are no display lists in the core profile
+                    self.getMeshBuffer(command, arguments).draw()
+                else:
+                    # get the shape from the registry, which will only call the
+                    # function for the shape if it has not been built yet
+                    gl.glCallList(self.geometry.get(command["name"], command["function"], arguments))
+                self.profiler.endQuery()
+            self.profiler.endPhase("draw")
+            self.currentProgram = None
+
+        if passesReady:
+            self.profiler.beginPhase("passes")
+            self.drawPasses(targets)
+            self.profiler.endPhase("passes")
+
+        self.profiler.endFrame()
+
+    # the size of the window in pixels on the screen
+    def framebufferSize(self):
+        ratio = self.devicePixelRatioF()
+        return int(round(self.viewport[0] * ratio)), int(round(self.viewport[1] * ratio))
+
+    # start drawing into a target from the pool, or into the window if there
+    # is no target name
+    def bindTarget(self, name, targetFormat):
+        width, height = self.framebufferSize()
+        target = None
+        if name is None:
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.defaultFramebufferObject())
+        else:
+            target = self.framebufferPool.acquire(width, height, targetFormat)
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, target.framebuffer)
+        gl.glViewport(0, 0, width, height)
+        return target
+
+    # draw every pass over the whole window, each one reading the targets
+    # drawn before it
+    def drawPasses(self, targets):
+        width, height = self.framebufferSize()
+        targetWidth, targetHeight = FramebufferPool.targetSize(width, height)
+        # the pass inputs go in the texture units after the glib file's textures
+        firstUnit = len(self.textures)
+        gl.glDisable(gl.GL_DEPTH_TEST)
+
+        for renderPass, program, uniforms, uploads in zip(self.passes, self.passPrograms, self.passUniforms, self.passUploads):
+            self.profiler.beginQuery("pass " + renderPass["shader"])
+            target = self.bindTarget(renderPass["output"], renderPass["format"])
             gl.glUseProgram(program)
 
-            # for every program
-            for x in range(0, len(self.uniformVariables)):
-                # for every variable in that program
-                for y in range(0, len(self.uniformVariables[x]["variables"])):
-                    # get the name of that variable
-                    uniformVariable = gl.glGetUniformLocation(program, self.uniformVariables[x]["variables"][y]["name"])
-
-                    value = denormalizeSliderRange(self.uniformVariables[x]["variables"][y]["min"], self.uniformVariables[x]["variables"][y]["value"], self.uniformVariables[x]["variables"][y]["max"])
-
-                    # set the uniform value
-                    gl.glUniform1f(uniformVariable, value)
+            for unit, passInput in enumerate(renderPass["inputs"], firstUnit):
+                gl.glActiveTexture(gl.GL_TEXTURE0 + unit)
+                gl.glBindTexture(gl.GL_TEXTURE_2D, targets[passInput["target"]].texture)
+                if passInput["uniform"] in uniforms:
+                    gl.glUniform1i(uniforms[passInput["uniform"]][0], unit)
+                self.boundTextures.pop(unit, None)
+
+            # targets can be bigger than the window, so tell the shaders how
+            # much of them the window covers and how big a texel is
+            if "uTargetScale" in uniforms:
+                gl.glUniform2f(uniforms["uTargetScale"][0], width / float(targetWidth), height / float(targetHeight))
+            if "uTexelSize" in uniforms:
+                gl.glUniform2f(uniforms["uTexelSize"][0], 1.0 / targetWidth, 1.0 / targetHeight)
+            # the passes can use the sliders and the clock too. The last program
+            # that declares a variable gives its value, and a value is only
+            # sent again once it changed since this pass was last sent it
+            variables = {}
+            for uniformStore in self.uniformVariables:
+                for name in uniformStore.variables.keys() & uniforms.keys():
+                    variables[name] = uniformStore.variables[name]
+            for name, variable in variables.items():
+                uploaded = uploads.get(name)
+                if uploaded is not None and uploaded[0] is variable and uploaded[1] == variable["version"]:
+                    continue
+                if isinstance(variable["value"], list):
+                    uploadVariable(uniforms[name][0], variable)
+                else:
+                    setNumber(uniforms[name][0], uniforms[name][1], variable["value"])
+                uploads[name] = (variable, variable["version"])
+            if "uTime" in uniforms:
+                setNumber(uniforms["uTime"][0], uniforms["uTime"][1], self.scheduler.animationTime)
+            if "uFrame" in uniforms:
+                setNumber(uniforms["uFrame"][0], uniforms["uFrame"][1], self.scheduler.frame)
+
+            self.quad.draw()
+            if target is not None:
+                targets[renderPass["output"]] = target
+            self.profiler.endQuery()
 
-            # for every command in the glib file
-            for command in self.glibContents:
-                # evaluate and run the command
-                self.evaluateCommand(command)
+        gl.glEnable(gl.GL_DEPTH_TEST)
+        # hand every target back for the next frame
+        self.framebufferPool.releaseAll()
+
+    # the shape of a command in buffers on the graphics card, which are made
+    # the first time we draw it and kept in the registry alongside the
+    # display lists
+    def getMeshBuffer(self, command, arguments):
+        return self.geometry.get(command["name"] + " buffer", lambda *arguments: MeshBuffer(command["mesh"](*arguments), self.core), arguments, MeshBuffer.release)
+
+    # draw every copy of an instanced shape in a single call. The matrices of
+    # the copies are uploaded into a buffer the first time we draw them too
+    def drawInstances(self, command, arguments):
+        # only a shader can put the copies where they go, so there is nothing
+        # to draw until the program has linked
+        if self.currentProgram is None:
+            return
+        meshBuffer = self.getMeshBuffer(command, arguments)
+        instanceBuffer = self.geometry.get("instances", lambda *instances: InstanceBuffer(command["matrices"]), command["instances"], InstanceBuffer.release)
+        meshBuffer.drawInstanced(instanceBuffer, self.currentProgram.instanceMatrixLocation)
+
+    # move the shapes we draw next to the position that the translate lines of
+    # the glib file put them at. Shapes next to each other usually share a
+    # position, so the matrices only change when it does
+    def placeShape(self, position):
+        if position == self.placedPosition:
+            return
+        self.placedPosition = position
+        modelView = self.modelView @ transforms.translate(*position)
+        if not self.core:
+            gl.glLoadMatrixf(np.ascontiguousarray(modelView.T))
+        self.uploadMatrices(modelView)
+
+    # send the matrices that place the scene to the program we are drawing
+    # with, for every one of the matrixUniforms that it uses
+    def uploadMatrices(self, modelView):
+        if self.currentProgram is None or not self.currentProgram.matrixLocations:
+            return
+        matrices = {
+            "uModelViewMatrix": modelView,
+            "uProjectionMatrix": self.projection,
+            "uModelViewProjectionMatrix": self.projection @ modelView
+        }
+        for name, location in self.currentProgram.matrixLocations.items():
+            # our matrices are written row by row, so OpenGL has to transpose them
+            if name == "uNormalMatrix":
+                gl.glUniformMatrix3fv(location, 1, gl.GL_TRUE, transforms.normalMatrix(modelView))
+            else:
+                gl.glUniformMatrix4fv(location, 1, gl.GL_TRUE, matrices[name])
 
     # whenever the screen is resized
     def resizeGL(self, width, height):
+        self.viewport = (width, height)
         # get the smallest edge
         minSide = min(width, height)
         # the default x and y spans -.5 to .5
@@ -589,10 +1141,11 @@ class MakeGLWidget(QOpenGLWidget):
         else:
             yRange = (height / width) * xRange
 
-        gl.glMatrixMode(gl.GL_PROJECTION)
-        gl.glLoadIdentity()
-        gl.glOrtho(-xRange, xRange, -yRange, yRange, 0.01, 1000.)
-        gl.glMatrixMode(gl.GL_MODELVIEW)
+        self.projection = transforms.ortho(-xRange, xRange, -yRange, yRange, 0.01, 1000.)
+        if not self.core:
+            gl.glMatrixMode(gl.GL_PROJECTION)
+            gl.glLoadMatrixf(np.ascontiguousarray(self.projection.T))
+            gl.glMatrixMode(gl.GL_MODELVIEW)
 
     def mousePressEvent(self, event):
         self.lastPos = event.pos()
@@ -670,6 +1223,16 @@ class MakeGLWidget(QOpenGLWidget):
 
 
 if __name__ == '__main__':
+    # render glib files straight to images without opening a window
+    if "--headless" in sys.argv:
+        import headless
+        sys.exit(headless.main([arg for arg in sys.argv[1:] if arg != "--headless"]))
+
+    # draw with vertex arrays and a core profile context instead of display
+    # lists and the fixed function pipeline
+    if "--core" in sys.argv:
+        useCoreProfile()
+
     app = QApplication(sys.argv)
     window = Window()
     window.show()
@@ -0,0 +1,109 @@
+import numpy as np
+
+# the vertex data for a shape, stored as one numpy array per attribute rather
+# than one object per vertex, so that building and uploading a shape is done
+# with a handful of array operations instead of a python loop per vertex
+class Mesh(object):
+    def __init__(self, positions, normals, texcoords, indices, tangents=None):
+        super(Mesh, self).__init__()
+        # one row per vertex
+        self.positions = np.ascontiguousarray(positions, dtype=np.float32)
+        self.normals = np.ascontiguousarray(normals, dtype=np.float32)
+        self.texcoords = np.ascontiguousarray(texcoords, dtype=np.float32)
+        self.tangents = None if tangents is None else np.ascontiguousarray(tangents, dtype=np.float32)
+        # three vertex indices for every triangle
+        self.indices = np.ascontiguousarray(indices, dtype=np.uint32).ravel()
+
+    def vertexCount(self):
+        return len(self.positions)
+
+    # how far the furthest vertex is from the middle of the mesh
+    def boundingRadius(self):
+        if len(self.positions) == 0:
+            return 0.0
+        return float(np.sqrt((self.positions ** 2).sum(axis=1).max()))
+
+    # pack the texture coordinates, normals and positions of every vertex next
+    # to each other, which is the GL_T2F_N3F_V3F interleaved array layout
+    def interleaved(self):
+        return np.ascontiguousarray(np.hstack((self.texcoords, self.normals, self.positions)), dtype=np.float32)
+
+# split every quad in a grid of rows x columns vertices into two triangles
+def gridIndices(rows, columns):
+    row, column = np.meshgrid(np.arange(rows - 1), np.arange(columns - 1), indexing='ij')
+    corner = (row * columns + column).ravel()
+    # the four corners of each quad, counter clockwise
+    a = corner
+    b = corner + 1
+    c = corner + columns + 1
+    d = corner + columns
+    return np.stack((a, b, c, a, c, d), axis=1).astype(np.uint32)
+
+# the corners of each face of a cube that is 2 units across, counter clockwise
+# when looking at the face, in the same order that shapes.cube draws them
+cubeCorners = np.array([
+    [-1, -1,  1], [ 1, -1,  1], [ 1,  1,  1], [-1,  1,  1],
+    [-1, -1, -1], [-1,  1, -1], [ 1,  1, -1], [ 1, -1, -1],
+    [ 1, -1,  1], [ 1, -1, -1], [ 1,  1, -1], [ 1,  1,  1],
+    [-1, -1,  1], [-1,  1,  1], [-1,  1, -1], [-1, -1, -1],
+    [-1,  1,  1], [ 1,  1,  1], [ 1,  1, -1], [-1,  1, -1],
+    [-1, -1,  1], [-1, -1, -1], [ 1, -1, -1], [ 1, -1,  1]
+], dtype=np.float32)
+
+cubeNormals = np.repeat(np.array([
+    [0, 0, 1], [0, 0, -1], [1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0]
+], dtype=np.float32), 4, axis=0)
+
+cubeTexcoords = np.array([
+    [0, 0], [1, 0], [1, 1], [0, 1],
+    [0, 0], [0, 1], [1, 1], [1, 0],
+    [0, 0], [1, 0], [1, 1], [0, 1],
+    [0, 0], [0, 1], [1, 1], [1, 0],
+    [0, 0], [1, 0], [1, 1], [0, 1],
+    [0, 0], [0, 1], [1, 1], [1, 0]
+], dtype=np.float32)
+
+# put several meshes together into one, so they can all be drawn with a
+# single call. Their vertices are kept as they are
+def mergeMeshes(meshList):
+    vertexCounts = [mesh.vertexCount() for mesh in meshList]
+    # every mesh's indices count from where its vertices start in the merged one
+    firstVertices = np.cumsum([0] + vertexCounts[:-1])
+    return Mesh(
+        np.concatenate([mesh.positions for mesh in meshList]),
+        np.concatenate([mesh.normals for mesh in meshList]),
+        np.concatenate([mesh.texcoords for mesh in meshList]),
+        np.concatenate([mesh.indices + np.uint32(first) for mesh, first in zip(meshList, firstVertices)])
+    )
+
+def cubeMesh(dx, dy, dz):
+    positions = cubeCorners * (np.array([dx, dy, dz], dtype=np.float32) / 2.0)
+    # two triangles for every face
+    face = np.arange(0, 24, 4)[:, np.newaxis]
+    indices = np.hstack((face, face + 1, face + 2, face, face + 2, face + 3))
+    return Mesh(positions, cubeNormals, cubeTexcoords, indices)
+
+def sphereMesh(radius, slices, stacks):
+    numLngs = 3 if slices < 3 else int(slices)
+    numLats = 3 if stacks < 3 else int(stacks)
+
+    # the latitude of each row of vertices and the longitude of each column
+    lat = np.linspace(-np.pi / 2.0, np.pi / 2.0, numLats)[:, np.newaxis]
+    lng = np.linspace(-np.pi, np.pi, numLngs)[np.newaxis, :]
+
+    xz = np.cos(lat)
+    y = np.sin(lat)
+    x = xz * np.cos(lng)
+    z = -xz * np.sin(lng)
+    # broadcast every value up to a full rows x columns grid
+    y = np.broadcast_to(y, x.shape)
+    normals = np.stack((x, y, z), axis=-1).reshape(-1, 3)
+
+    s = np.broadcast_to((lng + np.pi) / (2.0 * np.pi), x.shape)
+    t = np.broadcast_to((lat + np.pi / 2.0) / np.pi, x.shape)
+    texcoords = np.stack((s, t), axis=-1).reshape(-1, 2)
+
+    tangents = np.stack((-y * np.cos(lng), np.broadcast_to(xz, x.shape), y * np.sin(lng)), axis=-1).reshape(-1, 3)
+    tangents /= np.linalg.norm(tangents, axis=1)[:, np.newaxis]
+
+    return Mesh(radius * normals, normals, texcoords, gridIndices(numLats, numLngs), tangents)
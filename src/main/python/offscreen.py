@@ -0,0 +1,149 @@
+import ctypes
+
+import OpenGL.GL as gl
+from OpenGL import EGL
+
+from PyQt5.QtGui import QImage
+
+from main import MakeGLWidget
+
+# draws without a window system at all. Qt can only make an OpenGL context on
+# Linux through a window system, so without a display we ask EGL for a context
+# that has no surface and draw into a framebuffer object of our own. PyOpenGL
+# has to be told to use EGL with PYOPENGL_PLATFORM=egl before it is imported,
+# which headless does for us
+
+# an OpenGL context that is not tied to any window
+class EGLContext(object):
+    def __init__(self, core=False):
+        super(EGLContext, self).__init__()
+        self.context = EGL.EGL_NO_CONTEXT
+
+        try:
+            self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+            EGL.eglInitialize(self.display, None, None)
+
+            config = EGL.EGLConfig()
+            configCount = EGL.EGLint()
+            # we never draw to a surface, and asking for none matches every
+            # configuration rather than only the ones that have windows
+            configAttributes = [EGL.EGL_SURFACE_TYPE, 0, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE]
+            EGL.eglChooseConfig(self.display, (EGL.EGLint * len(configAttributes))(*configAttributes), ctypes.byref(config), 1, ctypes.byref(configCount))
+            if configCount.value == 0:
+                raise RuntimeError("OpenGL Error: EGL has no configuration that can draw with OpenGL")
+
+            # the same versions that --core asks Qt for
+            EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+            contextAttributes = []
+            if core:
+                contextAttributes = [
+                    EGL.EGL_CONTEXT_MAJOR_VERSION, 3,
+                    EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+                    EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT
+                ]
+            contextAttributes.append(EGL.EGL_NONE)
+            self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, (EGL.EGLint * len(contextAttributes))(*contextAttributes))
+        except EGL.EGLError as error:
+            raise RuntimeError("OpenGL Error: could not create an OpenGL context with EGL, " + str(error))
+        if self.context == EGL.EGL_NO_CONTEXT:
+            raise RuntimeError("OpenGL Error: could not create an OpenGL context with EGL")
+
+    def makeCurrent(self):
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context)
+
+    def release(self):
+        if self.context != EGL.EGL_NO_CONTEXT:
+            EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            EGL.eglDestroyContext(self.display, self.context)
+            self.context = EGL.EGL_NO_CONTEXT
+
+# the color and depth buffers we draw into in place of a window
+class OffscreenFramebuffer(object):
+    def __init__(self, width, height):
+        super(OffscreenFramebuffer, self).__init__()
+        self.width = width
+        self.height = height
+
+        self.colorBuffer, self.depthBuffer = [int(buffer) for buffer in gl.glGenRenderbuffers(2)]
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, self.colorBuffer)
+        gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_RGBA8, width, height)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, self.depthBuffer)
+        gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_DEPTH_COMPONENT24, width, height)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, 0)
+
+        self.framebuffer = int(gl.glGenFramebuffers(1))
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.framebuffer)
+        gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0, gl.GL_RENDERBUFFER, self.colorBuffer)
+        gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER, gl.GL_DEPTH_ATTACHMENT, gl.GL_RENDERBUFFER, self.depthBuffer)
+        status = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+        if status != gl.GL_FRAMEBUFFER_COMPLETE:
+            self.release()
+            raise RuntimeError("OpenGL Error: could not make a {0}x{1} framebuffer to draw into".format(width, height))
+
+    # the pixels as an image, the right way up
+    def read(self):
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.framebuffer)
+        gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 1)
+        pixels = gl.glReadPixels(0, 0, self.width, self.height, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE)
+        # OpenGL starts at the bottom row, and mirrored copies the pixels out
+        # of the buffer PyOpenGL gave us
+        return QImage(pixels, self.width, self.height, self.width * 4, QImage.Format_RGBA8888).mirrored()
+
+    def release(self):
+        gl.glDeleteFramebuffers(1, [self.framebuffer])
+        gl.glDeleteRenderbuffers(2, [self.colorBuffer, self.depthBuffer])
+
+# a MakeGLWidget that draws with its own EGL context instead of the one Qt
+# would make for the window. It is never shown, so grabFramebuffer does the
+# work Qt does when a widget gets painted
+class OffscreenGLWidget(MakeGLWidget):
+    def __init__(self, parent=None):
+        super(OffscreenGLWidget, self).__init__(parent)
+        self.eglContext = EGLContext(self.core)
+        self.target = None
+        self.initialized = False
+
+    def isValid(self):
+        return self.eglContext.context != EGL.EGL_NO_CONTEXT
+
+    def makeCurrent(self):
+        self.eglContext.makeCurrent()
+
+    # the context stays current, since nothing else draws in this process
+    def doneCurrent(self):
+        pass
+
+    def defaultFramebufferObject(self):
+        return 0 if self.target is None else self.target.framebuffer
+
+    # there is no screen, so every pixel is one pixel
+    def devicePixelRatioF(self):
+        return 1.0
+
+    def grabFramebuffer(self):
+        self.makeCurrent()
+        width, height = max(1, self.width()), max(1, self.height())
+        if self.target is None or (self.target.width, self.target.height) != (width, height):
+            if self.target is not None:
+                self.target.release()
+            self.target = OffscreenFramebuffer(width, height)
+
+        if not self.initialized:
+            self.initialized = True
+            self.initializeGL()
+        self.resizeGL(width, height)
+
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.target.framebuffer)
+        gl.glViewport(0, 0, width, height)
+        self.paintGL()
+        gl.glFinish()
+        return self.target.read()
+
+    def release(self):
+        if self.isValid():
+            self.makeCurrent()
+            if self.target is not None:
+                self.target.release()
+                self.target = None
+        self.eglContext.release()
@@ -0,0 +1,171 @@
+import ctypes
+
+import numpy as np
+
+import OpenGL.GL as gl
+
+# the pieces for drawing a scene in several passes. The scene can be drawn
+# into an offscreen target instead of the window, and every pass after that
+# draws a rectangle over the whole window with its own shaders, reading the
+# targets drawn before it, into a target of its own or into the window
+
+# the formats a target can be made in, and the internal format, format and
+# type of its texture
+targetFormats = {
+    "rgba8": (gl.GL_RGBA8, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE),
+    "rgba16f": (gl.GL_RGBA16F, gl.GL_RGBA, gl.GL_HALF_FLOAT),
+    "rgba32f": (gl.GL_RGBA32F, gl.GL_RGBA, gl.GL_FLOAT)
+}
+
+# targets are made a little bigger than the window, rounded up to a multiple
+# of this, so resizing the window does not have to make new ones every frame
+targetGranularity = 256
+
+# how many frames a target can go unused before we delete it
+targetLifetime = 300
+
+# the vertex shader for passes that do not bring their own. It hands the
+# fragment shader vST, which goes from 0 to 1 across the part of the targets
+# that the window covers
+passVertexShader = """#version 120
+uniform vec2 uTargetScale;
+varying vec2 vST;
+
+void main() {
+  vST = (gl_Vertex.xy * 0.5 + 0.5) * uTargetScale;
+  gl_Position = vec4(gl_Vertex.xy, 0.0, 1.0);
+}
+"""
+
+corePassVertexShader = """#version 330 core
+uniform vec2 uTargetScale;
+in vec2 aPosition;
+out vec2 vST;
+
+void main() {
+  vST = (aPosition * 0.5 + 0.5) * uTargetScale;
+  gl_Position = vec4(aPosition, 0.0, 1.0);
+}
+"""
+
+# a texture to draw into, with a depth buffer so scenes can be drawn into it too
+class RenderTarget(object):
+    def __init__(self, width, height, targetFormat):
+        super(RenderTarget, self).__init__()
+        self.width = width
+        self.height = height
+        self.format = targetFormat
+        # the last frame that used this target
+        self.lastUsed = 0
+
+        internalFormat, pixelFormat, pixelType = targetFormats[targetFormat]
+        self.texture = int(gl.glGenTextures(1))
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture)
+        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, internalFormat, width, height, 0, pixelFormat, pixelType, None)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+        self.depthBuffer = int(gl.glGenRenderbuffers(1))
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, self.depthBuffer)
+        gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_DEPTH_COMPONENT24, width, height)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, 0)
+
+        self.framebuffer = int(gl.glGenFramebuffers(1))
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.framebuffer)
+        gl.glFramebufferTexture2D(gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0, gl.GL_TEXTURE_2D, self.texture, 0)
+        gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER, gl.GL_DEPTH_ATTACHMENT, gl.GL_RENDERBUFFER, self.depthBuffer)
+        status = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+        if status != gl.GL_FRAMEBUFFER_COMPLETE:
+            self.release()
+            raise RuntimeError("Could not make a " + targetFormat + " target of " + str(width) + "x" + str(height))
+
+    def release(self):
+        gl.glDeleteFramebuffers(1, [self.framebuffer])
+        gl.glDeleteRenderbuffers(1, [self.depthBuffer])
+        gl.glDeleteTextures([self.texture])
+
+# hands out render targets by size and format, and takes them back at the end
+# of every frame. A frame that needs the same targets as the last one gets the
+# very same ones back, so nothing is made while the window is drawing
+class FramebufferPool(object):
+    def __init__(self):
+        super(FramebufferPool, self).__init__()
+        # the targets nobody is using right now, by their size and format
+        self.free = {}
+        # the targets handed out this frame
+        self.used = []
+        self.frame = 0
+
+    # the size of the targets we make to cover width x height pixels
+    @staticmethod
+    def targetSize(width, height):
+        return -(-width // targetGranularity) * targetGranularity, -(-height // targetGranularity) * targetGranularity
+
+    # a target that covers width x height pixels, which may be bigger
+    def acquire(self, width, height, targetFormat):
+        width, height = self.targetSize(width, height)
+        targets = self.free.setdefault((width, height, targetFormat), [])
+        target = targets.pop() if targets else RenderTarget(width, height, targetFormat)
+        target.lastUsed = self.frame
+        self.used.append(target)
+        return target
+
+    # take back every target that was handed out this frame, and delete the
+    # ones that have not been used in a while
+    def releaseAll(self):
+        for target in self.used:
+            self.free[(target.width, target.height, target.format)].append(target)
+        self.used = []
+        self.frame += 1
+
+        for key, targets in self.free.items():
+            for target in [target for target in targets if self.frame - target.lastUsed > targetLifetime]:
+                targets.remove(target)
+                target.release()
+
+    # delete every target, which needs an OpenGL context
+    def clear(self):
+        for targets in self.free.values():
+            for target in targets:
+                target.release()
+        self.free = {}
+
+# two triangles that cover the whole window
+class FullscreenQuad(object):
+    def __init__(self, core=False):
+        super(FullscreenQuad, self).__init__()
+        corners = np.array([[-1, -1], [1, -1], [-1, 1], [1, 1]], dtype=np.float32)
+
+        self.vertexArray = None
+        if core:
+            self.vertexArray = int(gl.glGenVertexArrays(1))
+            gl.glBindVertexArray(self.vertexArray)
+        self.vertexBuffer = int(gl.glGenBuffers(1))
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vertexBuffer)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, corners, gl.GL_STATIC_DRAW)
+        if core:
+            # the core pass vertex shader reads the corners from aPosition,
+            # which every program has at location 0
+            gl.glEnableVertexAttribArray(0)
+            gl.glVertexAttribPointer(0, 2, gl.GL_FLOAT, gl.GL_FALSE, 8, ctypes.c_void_p(0))
+            gl.glBindVertexArray(0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    def draw(self):
+        if self.vertexArray is not None:
+            gl.glBindVertexArray(self.vertexArray)
+            gl.glDrawArrays(gl.GL_TRIANGLE_STRIP, 0, 4)
+            gl.glBindVertexArray(0)
+            return
+        # without the core profile the corners go in through gl_Vertex
+        gl.glPushClientAttrib(gl.GL_CLIENT_VERTEX_ARRAY_BIT)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vertexBuffer)
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glVertexPointer(2, gl.GL_FLOAT, 0, ctypes.c_void_p(0))
+        gl.glDrawArrays(gl.GL_TRIANGLE_STRIP, 0, 4)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        gl.glPopClientAttrib()
@@ -0,0 +1,124 @@
+import os
+import re
+import hashlib
+
+from glib import GLIBError
+
+# pastes the files that shaders #include into them before they are compiled,
+# since GLSL has no way to share code between shaders on its own. Included
+# files are found relative to the folder the glib file is in, and can include
+# other files themselves
+#
+#   #include "lib/lighting.glsl"
+#
+# every file is only read again once it changes on disk, and every shader is
+# only put back together once one of the files it includes actually changed
+
+includePattern = re.compile(r'^\s*#\s*include\s+["<]([^">]+)[">]')
+versionPattern = re.compile(r'^\s*#\s*version\s+(\d+)(\s+es\b)?', re.MULTILINE)
+
+class IncludeError(GLIBError):
+    pass
+
+# a file as we last read it, along with the lines that include other files
+class SourceFile(object):
+    def __init__(self, path):
+        super(SourceFile, self).__init__()
+        self.mtime = os.path.getmtime(path)
+        with open(path, 'r') as f:
+            text = f.read()
+        self.text = text
+        self.hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        self.lines = text.splitlines()
+        # the line numbers and names of the files this one includes
+        self.includes = []
+        for lineNumber, line in enumerate(self.lines, 1):
+            match = includePattern.match(line)
+            if match is not None:
+                self.includes.append((lineNumber, match.group(1)))
+
+class ShaderPreprocessor(object):
+    def __init__(self):
+        super(ShaderPreprocessor, self).__init__()
+        # every file we have read, by its path
+        self.files = {}
+        # every shader we have put together, by its path and the folder its
+        # includes come from, with the hash of every file that went into it
+        self.expanded = {}
+
+    # read a file, unless we have it already and it has not changed since
+    def readFile(self, path):
+        sourceFile = self.files.get(path)
+        if sourceFile is None or sourceFile.mtime != os.path.getmtime(path):
+            sourceFile = SourceFile(path)
+            self.files[path] = sourceFile
+        return sourceFile
+
+    # the source code of a shader with all of its includes pasted in
+    def expand(self, shaderFile, workingDirectory):
+        key = (shaderFile, workingDirectory)
+        if key in self.expanded:
+            hashes, source = self.expanded[key]
+            # a file that was saved without changing does not count
+            try:
+                if all([self.readFile(path).hash == fileHash for path, fileHash in hashes.items()]):
+                    return source
+            except OSError:
+                pass
+
+        # before GLSL 3.30, and GLSL ES 3.00, a #line sets the number of the
+        # line after the next one, not of the next one. A shader without a
+        # #version is GLSL 1.10
+        version = versionPattern.search(self.readFile(shaderFile).text) if os.path.isfile(shaderFile) else None
+        versionNumber = 110 if version is None else int(version.group(1))
+        newLines = versionNumber >= 300 if version is not None and version.group(2) else versionNumber >= 330
+        lineOffset = 0 if newLines else 1
+
+        hashes = {}
+        lines = self.paste(shaderFile, workingDirectory, lineOffset, hashes, [])
+        source = "\n".join(lines) + "\n"
+        self.expanded[key] = (hashes, source)
+        return source
+
+    # the lines of a file with its includes pasted in. Each file is only
+    # pasted in the first time it is included, and the hash of every file we
+    # read is collected along the way
+    def paste(self, path, workingDirectory, lineOffset, hashes, includedFrom):
+        if not os.path.isfile(path):
+            raise IOError("Could not find shader file")
+        sourceFile = self.readFile(path)
+        hashes[path] = sourceFile.hash
+        # the number the compiler gives this file in its error messages
+        fileNumber = len(hashes) - 1
+
+        # keep the line numbers in the compiler's error messages pointing at
+        # the right lines of every file
+        lines = ["#line {0} {1}".format(1 - lineOffset, fileNumber)] if includedFrom else []
+        includes = dict(sourceFile.includes)
+        for lineNumber, line in enumerate(sourceFile.lines, 1):
+            if lineNumber not in includes:
+                lines.append(line)
+                continue
+
+            includeName = includes[lineNumber]
+            includeFile = os.path.normpath(os.path.join(workingDirectory, includeName))
+            if includeFile == path or includeFile in includedFrom:
+                raise IncludeError("'" + includeName + "' includes itself", lineNumber, None, path)
+            if not os.path.isfile(includeFile):
+                raise IncludeError("Could not find the include file '" + includeName + "'", lineNumber, None, path)
+            if includeFile in hashes:
+                lines.append("")
+                continue
+
+            lines += self.paste(includeFile, workingDirectory, lineOffset, hashes, includedFrom + [path])
+            lines.append("#line {0} {1}".format(lineNumber + 1 - lineOffset, fileNumber))
+        return lines
+
+    # every file that a shader includes, as of the last time we put it together
+    def includedFiles(self, shaderFile, workingDirectory):
+        hashes, source = self.expanded.get((shaderFile, workingDirectory), ({}, None))
+        return [path for path in hashes if path != shaderFile]
+
+    # the shaders that include a file, directly or through another include
+    def dependents(self, path):
+        return [shaderFile for (shaderFile, workingDirectory), (hashes, source) in self.expanded.items() if path in hashes]
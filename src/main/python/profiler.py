@@ -0,0 +1,166 @@
+import csv
+import json
+import time
+from collections import deque
+
+import OpenGL.GL as gl
+
+# older versions of PyOpenGL do not know about timer queries, in which case we
+# only time things on the CPU
+try:
+    from OpenGL.GL.ARB.timer_query import glInitTimerQueryARB
+except ImportError:
+    glInitTimerQueryARB = None
+
+# returns the value at a percentile of a sorted list
+def percentile(sortedValues, percent):
+    if not sortedValues:
+        return 0.0
+    index = int(round((len(sortedValues) - 1) * percent / 100.0))
+    return sortedValues[index]
+
+# keeps track of where the time goes in every frame we draw. The CPU time of
+# each phase of drawing a frame is measured with a timer, and the GPU time of
+# every draw command is measured with a GL_TIME_ELAPSED query. The graphics card
+# finishes those queries a few frames later, so we pick up the answers once
+# they are ready instead of waiting for them.
+# nothing is measured unless the profiler is enabled
+class FrameProfiler(object):
+    def __init__(self, historyLength=1000):
+        super(FrameProfiler, self).__init__()
+        self.enabled = False
+        # the most recent frames, oldest first
+        self.frames = deque(maxlen=historyLength)
+        self.frameNumber = 0
+        # the frame we are in the middle of drawing
+        self.currentFrame = None
+        # when each phase of the current frame started
+        self.phaseStarts = {}
+        # times that happened outside of drawing, like compiling shaders,
+        # which get added to the next frame
+        self.eventTimes = {}
+
+        # whether the driver can time things on the GPU, which we only know once
+        # we have an OpenGL context
+        self.gpuTiming = None
+        # GPU queries waiting on an answer, oldest first, as (frame, label, query)
+        self.pendingQueries = deque()
+        # queries that we can use again
+        self.freeQueries = []
+        self.currentQuery = None
+
+    def setEnabled(self, enabled):
+        self.enabled = bool(enabled)
+
+    # these need an OpenGL context to be current
+    def beginFrame(self):
+        if not self.enabled:
+            return
+        if self.gpuTiming is None:
+            self.gpuTiming = glInitTimerQueryARB is not None and bool(glInitTimerQueryARB())
+        self.collectQueries()
+
+        self.currentFrame = {
+            "frame": self.frameNumber,
+            "frameTime": 0.0,
+            "cpu": dict(self.eventTimes),
+            "gpu": {}
+        }
+        self.eventTimes = {}
+        self.frameNumber += 1
+        self.phaseStarts = {"frame": time.perf_counter()}
+
+    def endFrame(self):
+        if self.currentFrame is None:
+            return
+        self.currentFrame["frameTime"] = (time.perf_counter() - self.phaseStarts["frame"]) * 1000.0
+        self.frames.append(self.currentFrame)
+        self.currentFrame = None
+
+    def beginPhase(self, phase):
+        if self.currentFrame is not None:
+            self.phaseStarts[phase] = time.perf_counter()
+
+    def endPhase(self, phase):
+        if self.currentFrame is not None:
+            elapsed = (time.perf_counter() - self.phaseStarts[phase]) * 1000.0
+            self.currentFrame["cpu"][phase] = self.currentFrame["cpu"].get(phase, 0.0) + elapsed
+
+    # record something that took time outside of drawing a frame, in seconds
+    def addEvent(self, phase, seconds):
+        if self.enabled:
+            self.eventTimes[phase] = self.eventTimes.get(phase, 0.0) + seconds * 1000.0
+
+    # start timing a draw command on the GPU
+    def beginQuery(self, label):
+        if self.currentFrame is None or not self.gpuTiming:
+            return
+        if self.freeQueries:
+            query = self.freeQueries.pop()
+        else:
+            query = int(gl.glGenQueries(1)[0])
+        gl.glBeginQuery(gl.GL_TIME_ELAPSED, query)
+        self.currentQuery = (self.currentFrame, label, query)
+
+    def endQuery(self):
+        if self.currentQuery is None:
+            return
+        gl.glEndQuery(gl.GL_TIME_ELAPSED)
+        self.pendingQueries.append(self.currentQuery)
+        self.currentQuery = None
+
+    # pick up the answers to every GPU query that is finished, without waiting
+    def collectQueries(self):
+        available = gl.GLint()
+        elapsed = gl.GLuint64()
+        while self.pendingQueries:
+            frame, label, query = self.pendingQueries[0]
+            gl.glGetQueryObjectiv(query, gl.GL_QUERY_RESULT_AVAILABLE, available)
+            # queries finish in order, so if this one is not done neither are
+            # any of the ones after it
+            if not available.value:
+                break
+            gl.glGetQueryObjectui64v(query, gl.GL_QUERY_RESULT, elapsed)
+            # the answer is in nanoseconds
+            frame["gpu"][label] = frame["gpu"].get(label, 0.0) + elapsed.value / 1000000.0
+            self.pendingQueries.popleft()
+            self.freeQueries.append(query)
+
+    # the 50th, 90th and 99th percentile of the recent frame times, in milliseconds
+    def percentiles(self):
+        frameTimes = sorted([frame["frameTime"] for frame in self.frames])
+        return (percentile(frameTimes, 50), percentile(frameTimes, 90), percentile(frameTimes, 99))
+
+    def summary(self):
+        if not self.frames:
+            return "No frames drawn yet"
+        p50, p90, p99 = self.percentiles()
+        text = "Frame p50 {0:.2f} ms  p90 {1:.2f} ms  p99 {2:.2f} ms".format(p50, p90, p99)
+
+        # the newest frames are still waiting on the GPU, so show the newest
+        # one that has its answers
+        for frame in reversed(self.frames):
+            if frame["gpu"]:
+                text += "\nGPU {0:.2f} ms over {1} draws".format(sum(frame["gpu"].values()), len(frame["gpu"]))
+                break
+        return text
+
+    # write every frame we have to a file, either as json or as csv with a
+    # column for each phase and draw command
+    def export(self, fileName):
+        frames = list(self.frames)
+        if fileName.lower().endswith(".json"):
+            with open(fileName, 'w') as f:
+                json.dump(frames, f, indent=2)
+            return
+
+        cpuPhases = sorted(set([phase for frame in frames for phase in frame["cpu"]]))
+        gpuLabels = sorted(set([label for frame in frames for label in frame["gpu"]]))
+        with open(fileName, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "frameTime"] + ["cpu " + phase for phase in cpuPhases] + ["gpu " + label for label in gpuLabels])
+            for frame in frames:
+                row = [frame["frame"], frame["frameTime"]]
+                row += [frame["cpu"].get(phase, "") for phase in cpuPhases]
+                row += [frame["gpu"].get(label, "") for label in gpuLabels]
+                writer.writerow(row)
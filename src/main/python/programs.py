@@ -0,0 +1,395 @@
+import os
+import time
+import struct
+import hashlib
+import tempfile
+
+import numpy as np
+
+import OpenGL.GL as gl
+from OpenGL.error import GLError
+
+from uniforms import activeUniforms
+
+# some drivers can compile shaders on their own threads, and let us ask if
+# they are done instead of making us wait. Older versions of PyOpenGL do not
+# know about the extension, so we just compile the normal way with those
+try:
+    from OpenGL.GL.KHR.parallel_shader_compile import glInitParallelShaderCompileKHR, glMaxShaderCompilerThreadsKHR, GL_COMPLETION_STATUS_KHR
+except ImportError:
+    glInitParallelShaderCompileKHR = None
+
+# the uniform variables glman fills in with the matrices that place the scene,
+# for shaders that do not use the built in ones, which the core profile does
+# not have
+matrixUniforms = ("uModelViewMatrix", "uProjectionMatrix", "uModelViewProjectionMatrix", "uNormalMatrix")
+
+# make a fingerprint of the source code for every shader in a program so that
+# we can tell whether any of them actually changed
+def sourceHash(sources):
+    digest = hashlib.sha1()
+    for source in sources:
+        digest.update(source.encode('utf-8'))
+        # separate each source so that moving code from one shader to the next
+        # still gives us a different hash
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def readShader(shaderFile):
+    if os.path.isfile(shaderFile):
+        with open(shaderFile, 'r') as f:
+            return f.read()
+    # this should have been taken care of already, but this is here just
+    # incase
+    raise IOError("Could not find shader file")
+
+# hand the shader to the driver to compile. We don't ask whether it worked
+# here, because asking makes us wait for the compiler to finish
+def compileShader(shaderType, shaderData):
+    shader = gl.glCreateShader(shaderType)
+    gl.glShaderSource(shader, shaderData) # note that this is a simpler function call than in C
+
+    # This shader compilation is more explicit than the one used in
+    # framework.cpp, which relies on a glutil wrapper function.
+    # This is made explicit here mainly to decrease dependence on pyOpenGL
+    # utilities and wrappers, which docs caution may change in future versions.
+    gl.glCompileShader(shader)
+    return shader
+
+# returns whether the shader compiled, and prints out why if it did not
+def checkShader(shaderType, shader):
+    status = gl.glGetShaderiv(shader, gl.GL_COMPILE_STATUS)
+    if status == gl.GL_FALSE:
+        # Note that getting the error log is much simpler in Python than in C/C++
+        # and does not require explicit handling of the string buffer
+        strShaderType = ""
+        if shaderType == gl.GL_VERTEX_SHADER:
+            strShaderType = "vertex"
+        elif shaderType == gl.GL_GEOMETRY_SHADER:
+            strShaderType = "geometry"
+        elif shaderType == gl.GL_FRAGMENT_SHADER:
+            strShaderType = "fragment"
+
+        print("Compilation failure for " + strShaderType + " shader:\n")
+        print(gl.glGetShaderInfoLog(shader))
+        return False
+    return True
+
+# returns whether the program linked, and prints out why if it did not
+def checkProgram(program):
+    status = gl.glGetProgramiv(program, gl.GL_LINK_STATUS)
+    if status == gl.GL_FALSE:
+        # Note that getting the error log is much simpler in Python than in C/C++
+        # and does not require explicit handling of the string buffer
+        strInfoLog = gl.glGetProgramInfoLog(program)
+        print("Linker failure: \n" + str(strInfoLog))
+        return False
+    return True
+
+# a shader program that the driver might still be compiling and linking
+class PendingProgram(object):
+    def __init__(self, key, shaderSources=(), program=None, parallel=False, retrievable=False, attributeLocations=None):
+        super(PendingProgram, self).__init__()
+        self.key = key
+        self.parallel = parallel
+        self.startTime = time.perf_counter()
+        # how long it took to build the program, once it is finished
+        self.compileTime = 0.0
+
+        # the program was already built, so there is nothing to wait for
+        if program is not None:
+            self.program = program
+            self.shaderList = []
+            self.finished = True
+            return
+
+        self.finished = False
+        self.shaderList = [(shaderType, compileShader(shaderType, source)) for shaderType, source in shaderSources]
+
+        self.program = gl.glCreateProgram()
+        for shaderType, shader in self.shaderList:
+            gl.glAttachShader(self.program, shader)
+        # put vertex attributes where our vertex arrays expect them
+        for name, location in (attributeLocations or {}).items():
+            gl.glBindAttribLocation(self.program, location, name)
+        # let the driver know that we want to save the linked program to disk
+        if retrievable:
+            gl.glProgramParameteri(self.program, gl.GL_PROGRAM_BINARY_RETRIEVABLE_HINT, gl.GL_TRUE)
+        gl.glLinkProgram(self.program)
+
+    # whether we can finish the program without having to wait on the driver
+    def isReady(self):
+        if self.finished or not self.parallel:
+            return True
+        # PyOpenGL does not know how big the answer to this question is, so we
+        # have to give it somewhere to put it
+        status = gl.GLint()
+        gl.glGetProgramiv(self.program, GL_COMPLETION_STATUS_KHR, status)
+        return status.value == gl.GL_TRUE
+
+    # returns the linked program, or None if it failed to compile or link.
+    # if the driver is still working on it, this waits for it to finish
+    def finish(self):
+        if self.finished:
+            return self.program
+        self.finished = True
+
+        compiled = all([checkShader(shaderType, shader) for shaderType, shader in self.shaderList])
+        linked = compiled and checkProgram(self.program)
+
+        # once the program is linked we no longer need the shaders
+        for shaderType, shader in self.shaderList:
+            gl.glDetachShader(self.program, shader)
+            gl.glDeleteShader(shader)
+        self.shaderList = []
+        self.compileTime = time.perf_counter() - self.startTime
+
+        # don't hand back a program that we can not draw with
+        if not linked:
+            gl.glDeleteProgram(self.program)
+            self.program = None
+        return self.program
+
+    # throw away a program we no longer want, finished or not
+    def discard(self):
+        for shaderType, shader in self.shaderList:
+            gl.glDeleteShader(shader)
+        self.shaderList = []
+        if not self.finished and self.program is not None:
+            gl.glDeleteProgram(self.program)
+        self.finished = True
+        self.program = None
+
+# delete a file that might already be gone
+def removeFile(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+# saves linked programs to disk so that the next time we see the same shaders
+# we can skip compiling them entirely. A saved program only works with the
+# driver that made it, so the files are keyed by the driver as well as the
+# shader sources. The oldest files are deleted once they take up more than
+# maxBytes. All of these functions need an OpenGL context to be current
+class ProgramBinaryCache(object):
+    def __init__(self, directory, driver, maxBytes=64 * 1024 * 1024):
+        super(ProgramBinaryCache, self).__init__()
+        self.directory = directory
+        # the vendor, renderer and version strings of the driver
+        self.driver = driver
+        self.maxBytes = maxBytes
+
+    # some drivers can not save programs at all
+    def isSupported(self):
+        return gl.glGetIntegerv(gl.GL_NUM_PROGRAM_BINARY_FORMATS) > 0
+
+    def binaryFile(self, key):
+        name = hashlib.sha1((key + self.driver).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + ".bin")
+
+    # returns a linked program, or None if we do not have one that the driver
+    # will accept. Other processes share the folder and can delete or be
+    # writing a file while we read it, which just counts as not having it
+    def load(self, key):
+        binaryFile = self.binaryFile(key)
+        try:
+            with open(binaryFile, 'rb') as f:
+                data = f.read()
+            # the first four bytes are the format the driver gave us
+            binaryFormat = struct.unpack('<I', data[:4])[0]
+        except (OSError, struct.error):
+            return None
+        binary = np.frombuffer(data[4:], dtype=np.uint8)
+
+        program = gl.glCreateProgram()
+        try:
+            gl.glProgramBinary(program, binaryFormat, binary, len(binary))
+            accepted = gl.glGetProgramiv(program, gl.GL_LINK_STATUS) == gl.GL_TRUE
+        except GLError:
+            accepted = False
+
+        # the driver is free to turn down a binary, for example after it was
+        # updated, in which case we compile the shaders like normal
+        if not accepted:
+            gl.glDeleteProgram(program)
+            removeFile(binaryFile)
+            return None
+
+        # mark the file as recently used so it is the last to be deleted
+        try:
+            os.utime(binaryFile)
+        except OSError:
+            pass
+        return program
+
+    def save(self, key, program):
+        length = gl.glGetProgramiv(program, gl.GL_PROGRAM_BINARY_LENGTH)
+        if length == 0:
+            return
+
+        binary = np.zeros(length, dtype=np.uint8)
+        binaryLength = gl.GLsizei()
+        binaryFormat = gl.GLenum()
+        gl.glGetProgramBinary(program, length, binaryLength, binaryFormat, binary)
+
+        # write to a temporary file of our own first, so that a half written
+        # file is never mistaken for a program, and two processes saving the
+        # same program do not write into the same file. If the folder can not
+        # be written to, the program just is not saved
+        temporaryFile = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            handle, temporaryFile = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+            with os.fdopen(handle, 'wb') as f:
+                f.write(struct.pack('<I', binaryFormat.value))
+                f.write(binary[:binaryLength.value].tobytes())
+            os.replace(temporaryFile, self.binaryFile(key))
+        except OSError:
+            if temporaryFile is not None:
+                removeFile(temporaryFile)
+            return
+
+        self.evict()
+
+    # delete the least recently used files until we are back under maxBytes.
+    # another process can delete the same files at the same time
+    def evict(self):
+        binaryFiles = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".bin"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                binaryFiles.append((stat.st_mtime, stat.st_size, name))
+
+        totalBytes = sum([size for mtime, size, name in binaryFiles])
+        # oldest files first
+        for mtime, size, name in sorted(binaryFiles):
+            if totalBytes <= self.maxBytes:
+                break
+            removeFile(os.path.join(self.directory, name))
+            totalBytes -= size
+
+# holds on to every linked shader program so that we only compile and link
+# when the source code of a shader changes, not every time we draw a frame.
+# all of these functions need an OpenGL context to be current
+class ProgramCache(object):
+    def __init__(self):
+        super(ProgramCache, self).__init__()
+        # linked programs, keyed by the hash of their shader sources
+        self.programs = {}
+        # whether the driver compiles shaders in the background for us
+        self.parallel = False
+        # where we save linked programs on disk, if the driver lets us
+        self.binaryCache = None
+        # where every program puts its vertex attributes, if it matters
+        self.attributeLocations = None
+
+    # let the driver compile on as many threads as it wants, if it can
+    def enableParallelCompile(self):
+        if glInitParallelShaderCompileKHR is not None and glInitParallelShaderCompileKHR():
+            # this number tells the driver to pick how many threads to use
+            glMaxShaderCompilerThreadsKHR(0xFFFFFFFF)
+            self.parallel = True
+        return self.parallel
+
+    # save every program we link to disk, and look there before compiling
+    def useBinaryCache(self, directory, driver):
+        binaryCache = ProgramBinaryCache(directory, driver)
+        if binaryCache.isSupported():
+            self.binaryCache = binaryCache
+        return self.binaryCache is not None
+
+    # link every program with its vertex attributes at these locations
+    def bindAttributes(self, attributeLocations):
+        self.attributeLocations = attributeLocations
+
+    # start building a program without waiting for the driver to finish
+    def startProgram(self, vertexSource, fragmentSource):
+        sources = [vertexSource, fragmentSource]
+        # the same shaders linked with different attribute locations are a
+        # different program
+        if self.attributeLocations:
+            sources.append(repr(sorted(self.attributeLocations.items())))
+        key = sourceHash(sources)
+
+        # only compile and link if we have never seen this source code before
+        if key in self.programs:
+            return PendingProgram(key, program=self.programs[key])
+
+        # we might have linked these shaders the last time we ran
+        if self.binaryCache is not None:
+            program = self.binaryCache.load(key)
+            if program is not None:
+                self.programs[key] = program
+                return PendingProgram(key, program=program)
+
+        shaderSources = [(gl.GL_VERTEX_SHADER, vertexSource), (gl.GL_FRAGMENT_SHADER, fragmentSource)]
+        return PendingProgram(key, shaderSources, parallel=self.parallel, retrievable=self.binaryCache is not None, attributeLocations=self.attributeLocations)
+
+    # returns the linked program, or None if it failed to compile or link
+    def finishProgram(self, pendingProgram):
+        wasCompiled = not pendingProgram.finished
+        program = pendingProgram.finish()
+        # a program that failed to link is not worth remembering
+        if program is not None:
+            self.programs[pendingProgram.key] = program
+            # save anything we just compiled so we do not have to next time
+            if wasCompiled and self.binaryCache is not None:
+                self.binaryCache.save(pendingProgram.key, program)
+        return program
+
+    # build a program and wait for it to be ready
+    def getProgram(self, vertexSource, fragmentSource):
+        return self.finishProgram(self.startProgram(vertexSource, fragmentSource))
+
+    # delete every program that is not in the list of programs to keep
+    def release(self, keep=()):
+        for key, program in list(self.programs.items()):
+            if program not in keep:
+                gl.glDeleteProgram(program)
+                del self.programs[key]
+
+# a linked program, along with where it reads everything glman sends it
+# besides the uniform variables of the glib file. This needs an OpenGL context
+class LinkedProgram(object):
+    def __init__(self, program):
+        super(LinkedProgram, self).__init__()
+        self.program = program
+        # where the program reads the matrix of each copy of an instanced
+        # shape, or -1 if it does not use one
+        self.instanceMatrixLocation = gl.glGetAttribLocation(program, "aInstanceMatrix")
+        uniforms = activeUniforms(program)
+        # where the program reads each of the matrixUniforms, if it uses them
+        self.matrixLocations = dict([(name, uniforms[name][0]) for name in matrixUniforms if name in uniforms])
+        # the location and type of the built in uTime and uFrame uniforms, if
+        # the program uses them
+        self.timeUniform = uniforms.get("uTime")
+        self.frameUniform = uniforms.get("uFrame")
+        # whether the program still needs to be told which unit each sampler
+        # reads from
+        self.samplersDirty = True
+
+# one of the programs of a glib file, with the shaders it is built from and
+# the uniform store of its sliders. Programs with the same shaders share a
+# linked program, and each one keeps drawing with the last linked program it
+# had until a new one is ready
+class SceneProgram(object):
+    def __init__(self, name, vertexFile, fragmentFile, uniformStore=None):
+        super(SceneProgram, self).__init__()
+        self.name = name
+        self.vertexFile = vertexFile
+        self.fragmentFile = fragmentFile
+        # None for a glib file without any programs
+        self.uniformStore = uniformStore
+        self.linked = None
+
+    # the shaders, which tell apart the programs that need linking
+    def shaders(self):
+        return (self.vertexFile, self.fragmentFile)
@@ -0,0 +1,90 @@
+import time
+
+from PyQt5.QtCore import Qt, QObject, QTimer
+from PyQt5.QtGui import QGuiApplication
+
+# decides when the OpenGL widget draws its next frame. Everything that changes
+# what is on screen asks for a frame, and however many times that happens
+# between two refreshes of the display, only one frame gets drawn.
+# in continuous mode a frame is drawn every refresh, and the animation clock
+# that drives the uTime and uFrame uniforms keeps running. When nothing is
+# asking for frames and we are not animating, no timers run at all
+class FrameScheduler(QObject):
+    def __init__(self, widget):
+        super(FrameScheduler, self).__init__(widget)
+        self.widget = widget
+
+        # how often the display refreshes, in milliseconds
+        self.interval = 1000.0 / 60.0
+        # when we last asked Qt for a frame
+        self.lastFrameTime = 0.0
+
+        # fires once for the next frame we were asked for
+        self.frameTimer = QTimer(self)
+        self.frameTimer.setSingleShot(True)
+        self.frameTimer.setTimerType(Qt.PreciseTimer)
+        self.frameTimer.timeout.connect(self.drawFrame)
+
+        # fires every refresh while we are animating
+        self.continuous = False
+        self.animationTimer = QTimer(self)
+        self.animationTimer.setTimerType(Qt.PreciseTimer)
+        self.animationTimer.timeout.connect(self.drawFrame)
+
+        # the animation clock, which only moves while we are animating
+        self.animationTime = 0.0
+        self.animationStart = 0.0
+        self.frame = 0
+
+    # the refresh rate of the screen the widget is on, or of the main screen
+    # if it is not on one yet
+    def refreshInterval(self):
+        window = self.widget.window().windowHandle()
+        screen = window.screen() if window is not None else QGuiApplication.primaryScreen()
+        if screen is not None and screen.refreshRate() > 0:
+            return 1000.0 / screen.refreshRate()
+        return 1000.0 / 60.0
+
+    # ask for a frame to be drawn. This can be called as often as we like
+    def requestFrame(self):
+        # the animation timer is already drawing every frame
+        if self.continuous or self.frameTimer.isActive():
+            return
+        self.interval = self.refreshInterval()
+        # draw straight away if we have not drawn in a while, otherwise wait
+        # for the next refresh
+        sinceLastFrame = (time.perf_counter() - self.lastFrameTime) * 1000.0
+        self.frameTimer.start(int(max(0.0, self.interval - sinceLastFrame)))
+
+    def drawFrame(self):
+        self.lastFrameTime = time.perf_counter()
+        self.widget.update()
+
+    def setContinuous(self, continuous):
+        continuous = bool(continuous)
+        if continuous == self.continuous:
+            return
+        self.continuous = continuous
+
+        if continuous:
+            self.interval = self.refreshInterval()
+            # carry on from where the clock was paused
+            self.animationStart = time.perf_counter() - self.animationTime
+            self.frameTimer.stop()
+            self.animationTimer.start(int(round(self.interval)))
+        else:
+            self.animationTimer.stop()
+            self.requestFrame()
+
+    # called at the start of every frame we draw, to move the clock forward
+    def frameStarted(self):
+        if self.continuous:
+            self.animationTime = time.perf_counter() - self.animationStart
+            self.frame += 1
+
+    # start the animation over from the beginning
+    def resetClock(self):
+        self.animationTime = 0.0
+        self.animationStart = time.perf_counter()
+        self.frame = 0
+        self.requestFrame()
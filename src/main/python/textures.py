@@ -0,0 +1,174 @@
+import os
+import ctypes
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import OpenGL.GL as gl
+
+from PyQt5.QtGui import QImage
+
+# loads the images that a glib file binds to sampler uniforms. Decoding an
+# image is slow, so it happens on a pool of threads while the window keeps
+# running, and only handing the pixels to the graphics card happens on the
+# thread with the OpenGL context. Textures stay on the graphics card after
+# the glib file stops using them, until they have to make room for others
+
+# read an image file into rows of RGBA bytes, with the bottom row first since
+# that is where OpenGL starts. QImage can be used from any thread
+def decodeImage(imageFile):
+    image = QImage(imageFile)
+    if image.isNull():
+        raise IOError("Could not read the image '" + os.path.basename(imageFile) + "'")
+    image = image.convertToFormat(QImage.Format_RGBA8888).mirrored()
+
+    bits = image.constBits()
+    bits.setsize(image.byteCount())
+    rows = np.frombuffer(bits, dtype=np.uint8).reshape(image.height(), image.bytesPerLine())
+    # copy the pixels out, since the QImage owns the memory they are in
+    return np.array(rows[:, :image.width() * 4])
+
+class Texture(object):
+    def __init__(self, texture, width, height):
+        super(Texture, self).__init__()
+        self.texture = texture
+        self.width = width
+        self.height = height
+        # the mipmaps add up to another third of the full size image
+        self.size = width * height * 4 * 4 // 3
+
+    def release(self):
+        gl.glDeleteTextures([self.texture])
+
+# every texture we have loaded, by the image file and the time it was changed,
+# so a texture is only decoded again once its file changes
+class TextureCache(object):
+    def __init__(self, budget=256 * 1024 * 1024, uploadBudget=32 * 1024 * 1024):
+        super(TextureCache, self).__init__()
+        # how many bytes of textures we keep on the graphics card at most,
+        # unless the scene needs more than that
+        self.budget = budget
+        # how many bytes we hand to the graphics card at once, so that a big
+        # set of textures is spread out over a few frames
+        self.uploadBudget = uploadBudget
+        self.executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+        # the loaded textures, from least to most recently used
+        self.entries = OrderedDict()
+        # the images that are still being decoded
+        self.pending = {}
+        # the images that could not be read, so we do not keep trying
+        self.failed = set()
+        # the textures the scene uses, which are never thrown out
+        self.inUse = set()
+        # the buffer the pixels go through on their way to the graphics card
+        self.pixelBuffer = None
+        self.size = 0
+
+    # the key of an image file, which changes whenever the file does
+    @staticmethod
+    def key(imageFile):
+        return (imageFile, os.path.getmtime(imageFile))
+
+    # start decoding every texture the scene uses that we do not have yet
+    def use(self, keys):
+        self.inUse = set(keys)
+        for key in keys:
+            if key not in self.entries and key not in self.pending and key not in self.failed:
+                self.pending[key] = self.executor.submit(decodeImage, key[0])
+
+    # the texture for an image file if it is loaded, or None while it is not
+    def get(self, key):
+        texture = self.entries.get(key)
+        if texture is not None:
+            self.entries.move_to_end(key)
+        return texture
+
+    # hand the images that are done decoding to the graphics card, up to the
+    # upload budget. Returns the textures that were uploaded and the errors of
+    # the ones that could not be read. This needs an OpenGL context
+    def uploadFinished(self, wait=False):
+        uploaded = []
+        errors = []
+        uploadedBytes = 0
+        for key, future in list(self.pending.items()):
+            if uploadedBytes >= self.uploadBudget and not wait:
+                break
+            if not future.done() and not wait:
+                continue
+            del self.pending[key]
+            try:
+                pixels = future.result()
+            except IOError as error:
+                self.failed.add(key)
+                errors.append(str(error))
+                continue
+            self.entries[key] = self.upload(pixels)
+            uploaded.append(key)
+            uploadedBytes += pixels.nbytes
+
+            # an older version of the same file is no use anymore
+            for oldKey in [oldKey for oldKey in self.entries if oldKey[0] == key[0] and oldKey != key]:
+                self.remove(oldKey)
+
+        self.evict()
+        return uploaded, errors
+
+    # copy the pixels into a pixel buffer object, and make the texture from
+    # that, so the driver can copy them to the graphics card in its own time
+    def upload(self, pixels):
+        height, rowBytes = pixels.shape
+        width = rowBytes // 4
+
+        if self.pixelBuffer is None:
+            self.pixelBuffer = int(gl.glGenBuffers(1))
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, self.pixelBuffer)
+        # giving the buffer new storage every time means we never wait on the
+        # last upload to finish with it
+        gl.glBufferData(gl.GL_PIXEL_UNPACK_BUFFER, pixels.nbytes, None, gl.GL_STREAM_DRAW)
+        pointer = gl.glMapBufferRange(gl.GL_PIXEL_UNPACK_BUFFER, 0, pixels.nbytes, gl.GL_MAP_WRITE_BIT | gl.GL_MAP_INVALIDATE_BUFFER_BIT)
+        ctypes.memmove(pointer, pixels.ctypes.data, pixels.nbytes)
+        gl.glUnmapBuffer(gl.GL_PIXEL_UNPACK_BUFFER)
+
+        texture = int(gl.glGenTextures(1))
+        gl.glBindTexture(gl.GL_TEXTURE_2D, texture)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+        # with a pixel buffer bound, the last argument is where in the buffer
+        # the pixels start
+        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA8, width, height, 0, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, 0)
+
+        # let the graphics card build the smaller versions of the image
+        gl.glGenerateMipmap(gl.GL_TEXTURE_2D)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR_MIPMAP_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_REPEAT)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_REPEAT)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+        texture = Texture(texture, width, height)
+        self.size += texture.size
+        return texture
+
+    def remove(self, key):
+        texture = self.entries.pop(key)
+        self.size -= texture.size
+        texture.release()
+
+    # delete the least recently used textures that the scene does not use
+    # until we are back under budget
+    def evict(self):
+        for key in list(self.entries):
+            if self.size <= self.budget:
+                break
+            if key not in self.inUse:
+                self.remove(key)
+
+    # delete every texture, which needs an OpenGL context
+    def clear(self):
+        for key in list(self.entries):
+            self.remove(key)
+        if self.pixelBuffer is not None:
+            gl.glDeleteBuffers(1, [self.pixelBuffer])
+            self.pixelBuffer = None
@@ -0,0 +1,49 @@
+import math
+
+import numpy as np
+
+# builds the 4x4 matrices that place the scene, the same ones that glTranslate,
+# glRotate, glScale and glOrtho would make. They are numpy arrays written the
+# way you would on paper, so the matrix that is applied last goes first:
+#   modelView = translate(0, 0, -10) @ rotate(angle, 1, 0, 0) @ scale(2, 2, 2)
+# OpenGL reads matrices one column at a time, so they are transposed when
+# they are sent over
+
+def identity():
+    return np.identity(4, dtype=np.float32)
+
+def translate(x, y, z):
+    matrix = identity()
+    matrix[:3, 3] = (x, y, z)
+    return matrix
+
+def scale(x, y, z):
+    return np.diag(np.array([x, y, z, 1.0], dtype=np.float32))
+
+# a rotation of angle degrees around the axis (x, y, z)
+def rotate(angle, x, y, z):
+    axis = np.array([x, y, z], dtype=np.float64)
+    axis /= np.linalg.norm(axis)
+    x, y, z = axis
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    matrix = identity()
+    matrix[:3, :3] = [
+        [x * x * (1 - c) + c,     x * y * (1 - c) - z * s, x * z * (1 - c) + y * s],
+        [y * x * (1 - c) + z * s, y * y * (1 - c) + c,     y * z * (1 - c) - x * s],
+        [z * x * (1 - c) - y * s, z * y * (1 - c) + x * s, z * z * (1 - c) + c]
+    ]
+    return matrix
+
+def ortho(left, right, bottom, top, near, far):
+    matrix = identity()
+    matrix[0, 0] = 2.0 / (right - left)
+    matrix[1, 1] = 2.0 / (top - bottom)
+    matrix[2, 2] = -2.0 / (far - near)
+    matrix[:3, 3] = (-(right + left) / (right - left), -(top + bottom) / (top - bottom), -(far + near) / (far - near))
+    return matrix
+
+# the matrix that turns normals into eye space, which is the inverse transpose
+# of the top left corner of the model view matrix
+def normalMatrix(modelView):
+    return np.ascontiguousarray(np.linalg.inv(modelView[:3, :3]).T, dtype=np.float32)
@@ -0,0 +1,414 @@
+from PyQt5.QtCore import Qt, QEvent, QAbstractItemModel, QModelIndex, QPersistentModelIndex, QSize, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QGridLayout, QLineEdit, QTreeView, QStyledItemDelegate,
+                             QAbstractItemView, QSlider, QCheckBox, QPushButton, QDoubleSpinBox, QColorDialog)
+
+# the panel of widgets for the uniform variables of a glib file. The variables
+# sit in a tree with a branch for every program, and only the rows that are
+# scrolled into view get widgets, so a glib file with hundreds of variables
+# is as quick to load and scroll through as one with a handful
+
+# sliders only move in whole steps, so the slider of a number covers the
+# range of the number in this many steps
+sliderSteps = 1000
+
+# where the slider of a number between min and max sits for a value
+def sliderPosition(min, value, max):
+    return int(round((value - min) * sliderSteps / float(max - min)))
+
+# the value of a number between min and max for where its slider sits
+def sliderValue(min, position, max):
+    return min + (max - min) * position / float(sliderSteps)
+
+# show a color on a button, along with its alpha if it has one
+def setButtonColor(button, color):
+    button.setStyleSheet("QPushButton {{ background-color: rgba({0}, {1}, {2}, {3}); }}".format(color.red(), color.green(), color.blue(), color.alpha()))
+
+# how many lines of widgets a variable needs. Every number of a vector gets
+# its own slider, and a matrix is a grid of four rows
+def editorLines(variable):
+    if variable["type"] == "mat4":
+        return 4
+    if variable["type"] in ("vec2", "vec3", "vec4"):
+        return variable["components"]
+    return 1
+
+# the row of every element of every variable of every program, as the program
+# name, variable name and element that find the row again after a reload,
+# along with the number of the program and the variable
+def uniformRows(programs):
+    rows = []
+    for programNumber, program in enumerate(programs):
+        for variable in program["variables"]:
+            # every element of an array gets a row of its own
+            elements = [None] if variable["size"] is None else range(variable["size"])
+            for element in elements:
+                rows.append(((program["name"], variable["name"], element), programNumber, variable))
+    return rows
+
+# the same declaration apart from the value it starts out with, which means
+# the widgets of its row can stay the way they are
+def sameWidgets(variable, otherVariable):
+    return dict(variable, value=None) == dict(otherVariable, value=None)
+
+# a program in the tree, with its rows and the ones the filter lets through
+class ProgramGroup(object):
+    def __init__(self, name):
+        super(ProgramGroup, self).__init__()
+        self.name = name
+        self.programNumber = 0
+        self.rows = []
+        self.shown = []
+        # where the group is among the groups that are shown
+        self.position = 0
+
+# a single element of a uniform variable in the tree
+class UniformRow(object):
+    def __init__(self, key):
+        super(UniformRow, self).__init__()
+        self.key = key
+        self.group = None
+        self.programNumber = 0
+        self.variable = None
+        # where the row is among the rows of its group that are shown
+        self.position = 0
+
+    @property
+    def element(self):
+        return self.key[2]
+
+    @property
+    def label(self):
+        return self.variable["name"] if self.element is None else self.variable["name"] + "[" + str(self.element) + "]"
+
+    # the index of the first number of this element among every number of
+    # the variable
+    @property
+    def first(self):
+        return (self.element or 0) * self.variable["components"]
+
+# the uniform variables as a tree of programs, with a column for the name and
+# a column for the value of every variable. The rows are kept by their program
+# and variable name, so when the glib file is loaded again the rows that are
+# still there stay the same rows, and the view keeps their widgets, where it is
+# scrolled to, and which programs are open
+class UniformModel(QAbstractItemModel):
+    def __init__(self, parent=None):
+        super(UniformModel, self).__init__(parent)
+        self.groups = []
+        self.shownGroups = []
+        self.filterText = ""
+        # the stores the values of the variables come from
+        self.uniformStores = []
+
+    # whether the filter lets a row through
+    def matches(self, row, filterText):
+        filterText = filterText.lower()
+        return filterText in row.label.lower() or filterText in str(row.group.name).lower()
+
+    # the numbers of an element of a variable as the program has them now
+    def values(self, row):
+        if row.programNumber < len(self.uniformStores):
+            variable = self.uniformStores[row.programNumber].variables.get(row.variable["name"], row.variable)
+        else:
+            variable = row.variable
+        value = variable["value"]
+        if not isinstance(value, list):
+            return [value]
+        return value[row.first:row.first + row.variable["components"]]
+
+    def setPrograms(self, programs, uniformStores):
+        self.uniformStores = uniformStores
+        groups = dict([(group.name, group) for group in self.groups])
+        rows = dict([(row.key, row) for group in self.groups for row in group.rows])
+
+        newGroups = []
+        for key, programNumber, variable in uniformRows(programs):
+            if not newGroups or newGroups[-1].name != key[0]:
+                group = groups.pop(key[0], None) or ProgramGroup(key[0])
+                group.programNumber = programNumber
+                group.rows = []
+                newGroups.append(group)
+            row = rows.get(key) or UniformRow(key)
+            row.group = newGroups[-1]
+            row.programNumber = programNumber
+            row.variable = variable
+            newGroups[-1].rows.append(row)
+        self.rearrange(newGroups, self.filterText)
+
+    def setFilter(self, filterText):
+        self.rearrange(self.groups, filterText)
+
+    # move the rows around without starting the model over, and tell the
+    # view where every row it knows about went
+    def rearrange(self, groups, filterText):
+        self.layoutAboutToBeChanged.emit()
+        oldIndexes = self.persistentIndexList()
+        oldItems = [(index.internalPointer(), index.column()) for index in oldIndexes]
+
+        self.groups = groups
+        self.filterText = filterText
+        self.shownGroups = []
+        for group in groups:
+            if filterText:
+                group.shown = [row for row in group.rows if self.matches(row, filterText)]
+            else:
+                group.shown = list(group.rows)
+            for position, row in enumerate(group.shown):
+                row.position = position
+            if group.shown:
+                group.position = len(self.shownGroups)
+                self.shownGroups.append(group)
+        shownGroups = set(self.shownGroups)
+        shownRows = set([row for group in self.shownGroups for row in group.shown])
+
+        newIndexes = []
+        for item, column in oldItems:
+            if item in shownGroups or item in shownRows:
+                newIndexes.append(self.createIndex(item.position, column, item))
+            else:
+                newIndexes.append(QModelIndex())
+        self.changePersistentIndexList(oldIndexes, newIndexes)
+        self.layoutChanged.emit()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, self.shownGroups[row])
+        return self.createIndex(row, column, parent.internalPointer().shown[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        item = index.internalPointer()
+        if isinstance(item, ProgramGroup):
+            return QModelIndex()
+        return self.createIndex(item.group.position, 0, item.group)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self.shownGroups)
+        item = parent.internalPointer()
+        if isinstance(item, ProgramGroup) and parent.column() == 0:
+            return len(item.shown)
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return 2
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        item = index.internalPointer()
+        if isinstance(item, ProgramGroup):
+            return item.name if index.column() == 0 else None
+        if index.column() == 0:
+            return item.label
+        # what shows for a moment before the row gets its widgets
+        return " ".join(["{0:g}".format(value) for value in self.values(item)])
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        if isinstance(index.internalPointer(), UniformRow) and index.column() == 1:
+            return Qt.ItemIsEnabled | Qt.ItemIsEditable
+        return Qt.ItemIsEnabled
+
+# makes the widgets for the value column. Numbers get a slider, each number of
+# a vector gets its own, bools get a check box, colors a button that opens a
+# color picker, and matrices a grid of number boxes
+class UniformDelegate(QStyledItemDelegate):
+    def __init__(self, panel):
+        super(UniformDelegate, self).__init__(panel)
+        self.panel = panel
+        # how tall a line of widgets is, which is measured once
+        self.lineHeight = max([widget.sizeHint().height() for widget in (QSlider(Qt.Horizontal), QDoubleSpinBox(), QPushButton())])
+
+    def sizeHint(self, option, index):
+        size = super(UniformDelegate, self).sizeHint(option, index)
+        item = index.internalPointer()
+        if isinstance(item, UniformRow):
+            return QSize(size.width(), editorLines(item.variable) * self.lineHeight)
+        return size
+
+    def createEditor(self, parent, option, index):
+        row = index.internalPointer()
+        variable = row.variable
+        values = index.model().values(row)
+
+        # set numbers of this element, counting from its first one
+        def setValues(index, newValues):
+            self.panel.uniformChanged.emit(row.programNumber, variable["name"], row.first + index, newValues)
+
+        if variable["type"] == "bool":
+            checkBox = QCheckBox(parent)
+            checkBox.setChecked(values[0])
+            checkBox.toggled.connect(lambda checked: setValues(0, [checked]))
+            return checkBox
+
+        if variable["type"] == "color":
+            button = QPushButton(parent)
+            button.color = QColor.fromRgbF(*values)
+            setButtonColor(button, button.color)
+            def pickColor():
+                options = QColorDialog.ShowAlphaChannel if variable["components"] == 4 else QColorDialog.ColorDialogOptions()
+                color = QColorDialog.getColor(button.color, self.panel, variable["name"], options)
+                # the picker gives back an invalid color when it is cancelled
+                if color.isValid():
+                    button.color = color
+                    setButtonColor(button, color)
+                    setValues(0, list(color.getRgbF())[:variable["components"]])
+            button.clicked.connect(pickColor)
+            return button
+
+        container = QWidget(parent)
+        if variable["type"] == "mat4":
+            # the matrix is laid out row by row like in the glib file
+            layout = QGridLayout(container)
+            for index, value in enumerate(values):
+                spinBox = QDoubleSpinBox()
+                spinBox.setRange(-1000000.0, 1000000.0)
+                spinBox.setDecimals(4)
+                spinBox.setSingleStep(0.1)
+                spinBox.setValue(value)
+                spinBox.valueChanged.connect(lambda newValue, index=index: setValues(index, [newValue]))
+                layout.addWidget(spinBox, index // 4, index % 4)
+        else:
+            layout = QVBoxLayout(container)
+            for index, value in enumerate(values):
+                slider = QSlider(Qt.Horizontal)
+                if variable["type"] == "int":
+                    # whole numbers get a step for every number
+                    slider.setRange(variable["min"], variable["max"])
+                    slider.setValue(value)
+                    slider.valueChanged.connect(lambda newValue, index=index: setValues(index, [newValue]))
+                else:
+                    slider.setRange(0, sliderSteps)
+                    slider.setValue(sliderPosition(variable["min"], value, variable["max"]))
+                    # this is a tricky line, so it is in the readme
+                    slider.valueChanged.connect(lambda position, index=index: setValues(index, [sliderValue(variable["min"], position, variable["max"])]))
+                layout.addWidget(slider)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        return container
+
+    # the widgets change the values themselves as they move, so there is
+    # nothing to hand back to the model
+    def setEditorData(self, editor, index):
+        pass
+
+    def setModelData(self, editor, model, index):
+        pass
+
+# the tree of uniform variables and a box to filter them by name. Every
+# time the view scrolls, resizes, or opens or closes a program, the rows that
+# came into view get widgets and the ones that left it give theirs back
+class UniformPanel(QWidget):
+    # the program number, variable name, index of the first number, and the
+    # numbers a widget set
+    uniformChanged = pyqtSignal(int, str, int, list)
+
+    def __init__(self, parent=None):
+        super(UniformPanel, self).__init__(parent)
+        self.model = UniformModel(self)
+
+        self.filterBox = QLineEdit()
+        self.filterBox.setPlaceholderText("Filter uniforms")
+        self.filterBox.setClearButtonEnabled(True)
+        self.filterBox.textChanged.connect(self.setFilter)
+
+        self.view = QTreeView()
+        self.view.setModel(self.model)
+        self.view.setItemDelegateForColumn(1, UniformDelegate(self))
+        self.view.setHeaderHidden(True)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view.setSelectionMode(QAbstractItemView.NoSelection)
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.view.setColumnWidth(0, 100)
+
+        # the rows that have widgets right now, with their index in the view
+        self.editors = {}
+        # moving the scroll bar fires for every pixel, so the rows are only
+        # looked at once the events of this go around of the event loop are
+        # handled
+        self.editorTimer = QTimer(self)
+        self.editorTimer.setSingleShot(True)
+        self.editorTimer.timeout.connect(self.updateEditors)
+        self.view.verticalScrollBar().valueChanged.connect(lambda value: self.editorTimer.start())
+        self.view.expanded.connect(lambda index: self.editorTimer.start())
+        self.view.collapsed.connect(lambda index: self.editorTimer.start())
+        self.view.viewport().installEventFilter(self)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.filterBox)
+        layout.addWidget(self.view)
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Resize:
+            self.editorTimer.start()
+        return False
+
+    def setPrograms(self, programs, uniformStores):
+        # rows that are going away, or whose widgets would look different,
+        # give their widgets back before the model changes
+        declarations = dict([(key, variable) for key, programNumber, variable in uniformRows(programs)])
+        for row in list(self.editors):
+            if row.key not in declarations or not sameWidgets(row.variable, declarations[row.key]):
+                self.closeEditor(row)
+
+        # the numbers the widgets that stay show right now
+        shownValues = dict([(row, self.model.values(row)) for row in self.editors])
+
+        openGroups = set([group.name for group in self.model.groups if self.view.isExpanded(self.model.createIndex(group.position, 0, group))])
+        newGroups = set([program["name"] for program in programs]) - set([group.name for group in self.model.groups])
+        self.model.setPrograms(programs, uniformStores)
+        # and the ones whose variables start over get new widgets
+        for row in list(self.editors):
+            if self.model.values(row) != shownValues[row]:
+                self.closeEditor(row)
+        # programs start out open, and stay the way they were after a reload
+        for group in self.model.shownGroups:
+            if group.name in openGroups or group.name in newGroups:
+                self.view.expand(self.model.createIndex(group.position, 0, group))
+        self.setVisible(bool(self.model.groups))
+        self.updateEditors()
+
+    def setFilter(self, filterText):
+        for row in list(self.editors):
+            if filterText and not self.model.matches(row, filterText):
+                self.closeEditor(row)
+        self.model.setFilter(filterText)
+        # every program with a match is opened so the matches can be seen
+        self.view.expandAll()
+        self.updateEditors()
+
+    def closeEditor(self, row):
+        index = self.editors.pop(row)
+        if index.isValid():
+            self.view.closePersistentEditor(QModelIndex(index))
+
+    # the rows of variables that are in view, from the top of the view down
+    def visibleRows(self):
+        rows = []
+        height = self.view.viewport().height()
+        index = self.view.indexAt(self.view.viewport().rect().topLeft())
+        while index.isValid() and self.view.visualRect(index).top() < height:
+            item = index.internalPointer()
+            if isinstance(item, UniformRow):
+                rows.append((item, index.sibling(index.row(), 1)))
+            index = self.view.indexBelow(index)
+        return rows
+
+    # give widgets to the rows in view, and take them from the ones that are not
+    def updateEditors(self):
+        visibleRows = self.visibleRows()
+        visible = set([row for row, index in visibleRows])
+        for row in list(self.editors):
+            if row not in visible:
+                self.closeEditor(row)
+        for row, index in visibleRows:
+            if row not in self.editors:
+                self.view.openPersistentEditor(index)
+                self.editors[row] = QPersistentModelIndex(index)
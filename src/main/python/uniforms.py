@@ -0,0 +1,136 @@
+import numpy as np
+
+import OpenGL.GL as gl
+
+from glib import uniformTypes
+
+# the location and type of every uniform variable a linked program uses, by
+# name. This needs an OpenGL context to be current
+def activeUniforms(shaderProgram):
+    uniforms = {}
+    for index in range(gl.glGetProgramiv(shaderProgram, gl.GL_ACTIVE_UNIFORMS)):
+        name, size, uniformType = gl.glGetActiveUniform(shaderProgram, index)
+        # arrays are listed by their first element, but are found by their name
+        name = name.decode()
+        if name.endswith("[0]"):
+            name = name[:-3]
+        uniforms[name] = (gl.glGetUniformLocation(shaderProgram, name), uniformType)
+    return uniforms
+
+# send a number to a uniform, whether the shader declared it as a float or an int
+def setNumber(location, uniformType, value):
+    if uniformType == gl.GL_FLOAT:
+        gl.glUniform1f(location, value)
+    else:
+        gl.glUniform1i(location, int(value))
+
+# the functions that send a whole array of floats to a uniform, by how many
+# floats make up one element
+floatUploads = {
+    1: gl.glUniform1fv,
+    2: gl.glUniform2fv,
+    3: gl.glUniform3fv,
+    4: gl.glUniform4fv
+}
+
+# send a uniform variable from a glib file to a uniform. An array is sent all
+# at once with a single call, however many elements it has
+def uploadVariable(location, variable):
+    value = variable["value"]
+    if not isinstance(value, list):
+        if variable["type"] == "float":
+            gl.glUniform1f(location, value)
+        else:
+            gl.glUniform1i(location, int(value))
+        return
+    count = variable["size"] or 1
+    if variable["type"] == "mat4":
+        # matrices are written row by row in the glib file
+        gl.glUniformMatrix4fv(location, count, gl.GL_TRUE, np.array(value, dtype=np.float32))
+    elif variable["type"] in ("int", "bool"):
+        gl.glUniform1iv(location, count, np.array(value, dtype=np.int32))
+    else:
+        floatUploads[variable["components"]](location, count, np.array(value, dtype=np.float32))
+
+# the uniform variables of one program in a glib file, looked up by name.
+# the location of every variable is only looked up once per linked shader
+# program, and only the variables that changed since the last frame are sent
+# to the graphics card
+class UniformStore(object):
+    # a store for the program the glib file declared last time it was loaded
+    # can be given, and every variable declared just like it was there keeps
+    # the value it had
+    def __init__(self, program, previous=None):
+        super(UniformStore, self).__init__()
+        self.name = program["name"]
+        # the variables as the glib file declares them
+        self.declarations = dict([(variable["name"], variable) for variable in program["variables"]])
+
+        # each variable holds its name, type, value, and min and max like the
+        # glib file declares it, along with its location in the linked shader
+        # program. Lists are copied so changing a value in place does not
+        # change the declaration
+        self.variables = {}
+        for variable in program["variables"]:
+            value = variable["value"]
+            if previous is not None and previous.declarations.get(variable["name"]) == variable:
+                value = previous.variables[variable["name"]]["value"]
+            self.variables[variable["name"]] = dict(variable, value=list(value) if isinstance(value, list) else value, location=-1, version=0)
+
+        # the names of the variables that still need to be sent to the shader.
+        # Other programs that read our variables, like passes, keep track of
+        # them by the version of each variable, which goes up on every change
+        self.dirty = set(self.variables)
+
+    # look up where every variable lives in a newly linked shader program.
+    # this needs an OpenGL context to be current
+    def bind(self, shaderProgram):
+        for variable in self.variables.values():
+            variable["location"] = gl.glGetUniformLocation(shaderProgram, variable["name"])
+        # a newly linked program has none of our values in it yet
+        self.invalidate()
+
+    # send every variable again, for when the program lost our values
+    def invalidate(self):
+        self.dirty = set(self.variables)
+
+    # set the whole value of a variable, which is a number for a single
+    # number and a list of every number otherwise
+    def setValue(self, variableName, value):
+        variable = self.variables[variableName]
+        kind = uniformTypes[variable["type"]][1]
+        if isinstance(variable["value"], list):
+            if not isinstance(value, list) or len(value) != len(variable["value"]):
+                raise ValueError("'" + variableName + "' takes " + str(len(variable["value"])) + " numbers")
+            value = [kind(number) for number in value]
+        elif isinstance(value, list):
+            raise ValueError("'" + variableName + "' takes a single number")
+        else:
+            value = kind(value)
+        if variable["value"] != value:
+            variable["value"] = value
+            variable["version"] += 1
+            self.dirty.add(variableName)
+
+    # set some of the numbers of a variable, starting at the index-th one
+    # of the flat list that holds every component of every element
+    def setValues(self, variableName, index, values):
+        variable = self.variables[variableName]
+        if not isinstance(variable["value"], list):
+            self.setValue(variableName, values[0])
+            return
+        kind = uniformTypes[variable["type"]][1]
+        values = [kind(number) for number in values]
+        if variable["value"][index:index + len(values)] != values:
+            variable["value"][index:index + len(values)] = values
+            variable["version"] += 1
+            self.dirty.add(variableName)
+
+    # send every changed variable to the shader program that is currently in use
+    def upload(self):
+        for variableName in self.dirty:
+            variable = self.variables[variableName]
+            # the shader compiler removes uniforms that are never used
+            if variable["location"] != -1:
+                uploadVariable(variable["location"], variable)
+        self.dirty.clear()
@@ -0,0 +1,11 @@
+#version 120
+
+varying vec3 vColor;
+
+void main() {
+  // the color comes from where the vertex is before it is moved, so a shape
+  // looks the same wherever it is placed and whatever it is batched with
+  vColor = gl_Vertex.xyz * 2.0 + 0.5;
+
+  gl_Position = gl_ModelViewProjectionMatrix * gl_Vertex;
+}
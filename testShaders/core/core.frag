@@ -0,0 +1,27 @@
+#version 330 core
+
+in vec3 vN, vL, vE;
+in vec2 vST;
+out vec4 fragColor;
+
+uniform float uShininess, uKa, uKd, uKs;
+const vec3 uColor = vec3(0.0, 0.9, 0.9), uSpecularColor = vec3(1.0, 0.5, 0.5);
+
+void main() {
+  vec3 Normal = normalize(vN);
+  vec3 Light  = normalize(vL);
+  vec3 Eye    = normalize(vE);
+
+  vec3 ambient = uKa * uColor;
+
+  float d = max(dot(Normal, Light), 0.0);
+  vec3 diffuse = uKd * d * uColor;
+  float s = 0.;
+
+  if( dot(Normal,Light) > 0. ) {
+    vec3 ref = normalize( reflect( -Light, Normal ) );
+    s = pow( max( dot(Eye,ref),0. ), uShininess );
+  }
+  vec3 specular = uKs * s * uSpecularColor;
+  fragColor = vec4( ambient + diffuse + specular, 1. );
+}
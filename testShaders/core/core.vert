@@ -0,0 +1,25 @@
+#version 330 core
+
+// the core profile has no gl_Vertex or gl_ModelViewMatrix, so glman hands
+// every shape and matrix over under these names instead
+in vec3 aPosition;
+in vec3 aNormal;
+in vec2 aTexCoord;
+
+uniform mat4 uModelViewMatrix;
+uniform mat4 uModelViewProjectionMatrix;
+uniform mat3 uNormalMatrix;
+
+out vec3 vN, vL, vE;
+out vec2 vST;
+const vec3 LIGHTPOSITION = vec3(0.5, 0.5, 0.0);
+
+void main() {
+  vST = aTexCoord;
+  vec4 ECposition = uModelViewMatrix * vec4(aPosition, 1.0);
+  vN = normalize(uNormalMatrix * aNormal);
+  vL = LIGHTPOSITION - ECposition.xyz;
+  vE = vec3(0.0, 0.0, 0.0) - ECposition.xyz;
+
+  gl_Position = uModelViewProjectionMatrix * vec4(aPosition, 1.0);
+}
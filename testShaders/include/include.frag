@@ -0,0 +1,9 @@
+#version 120
+
+// lighting.glsl includes the varyings too, but they only get pasted in once
+#include "lib/varyings.glsl"
+#include "lib/lighting.glsl"
+
+void main() {
+  gl_FragColor = vec4( lighting(), 1. );
+}
@@ -0,0 +1,25 @@
+#include "lib/varyings.glsl"
+
+uniform float uShininess, uKa, uKd, uKs;
+const vec3 uColor = vec3(0.0, 0.9, 0.9), uSpecularColor = vec3(1.0, 0.5, 0.5);
+
+// ambient, diffuse and specular lighting of uColor, from the vectors the
+// vertex shader handed us
+vec3 lighting() {
+  vec3 Normal = normalize(vN);
+  vec3 Light  = normalize(vL);
+  vec3 Eye    = normalize(vE);
+
+  vec3 ambient = uKa * uColor;
+
+  float d = max(dot(Normal, Light), 0.0);
+  vec3 diffuse = uKd * d * uColor;
+  float s = 0;
+
+  if( dot(Normal,Light) > 0. ) {
+    vec3 ref = normalize( reflect( -Light, Normal ) );
+    s = pow( max( dot(Eye,ref),0. ), uShininess );
+  }
+  vec3 specular = uKs * s * uSpecularColor;
+  return ambient + diffuse + specular;
+}
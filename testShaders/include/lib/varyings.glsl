@@ -0,0 +1,2 @@
+varying vec3 vColor, vN, vL, vE;
+varying vec2 vST;
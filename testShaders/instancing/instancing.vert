@@ -0,0 +1,16 @@
+#version 120
+#extension GL_ARB_draw_instanced : enable
+
+// the matrix that places this copy of the shape, one per copy
+attribute mat4 aInstanceMatrix;
+
+varying vec3 vColor;
+
+void main() {
+  vec4 pos = aInstanceMatrix * gl_Vertex;
+  // give every copy its own color from its number
+  float id = float(gl_InstanceIDARB);
+  vColor = vec3(mod(id, 10.0), mod(floor(id / 10.0), 10.0), floor(id / 100.0)) / 9.0;
+
+  gl_Position = gl_ModelViewProjectionMatrix * pos;
+}
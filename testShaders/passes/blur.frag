@@ -0,0 +1,17 @@
+#version 120
+
+uniform sampler2D uImage;
+uniform vec2 uTexelSize;
+uniform float uRadius;
+varying vec2 vST;
+
+// average a 9x9 grid of texels spread out over uRadius texels
+void main() {
+  vec4 sum = vec4(0.0);
+  for (int x = -4; x <= 4; x++) {
+    for (int y = -4; y <= 4; y++) {
+      sum += texture2D(uImage, vST + vec2(x, y) * uTexelSize * uRadius / 4.0);
+    }
+  }
+  gl_FragColor = sum / 81.0;
+}
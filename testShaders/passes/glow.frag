@@ -0,0 +1,13 @@
+#version 120
+
+uniform sampler2D uScene;
+uniform sampler2D uBlurred;
+uniform float uGlow;
+varying vec2 vST;
+
+// add the blurred scene on top of the sharp one so that it glows
+void main() {
+  vec4 scene = texture2D(uScene, vST);
+  vec4 blurred = texture2D(uBlurred, vST);
+  gl_FragColor = vec4(scene.rgb + uGlow * blurred.rgb, 1.0);
+}
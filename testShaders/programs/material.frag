@@ -0,0 +1,28 @@
+#version 120
+
+varying vec3 vColor, vN, vL, vE;
+varying vec2 vST;
+
+uniform float uRed, uGreen, uBlue;
+uniform float uKa, uKd, uKs, uShininess;
+const vec3 uSpecularColor = vec3(1.0, 1.0, 1.0);
+
+void main() {
+  vec3 color = vec3(uRed, uGreen, uBlue);
+  vec3 Normal = normalize(vN);
+  vec3 Light  = normalize(vL);
+  vec3 Eye    = normalize(vE);
+
+  vec3 ambient = uKa * color;
+
+  float d = max(dot(Normal, Light), 0.0);
+  vec3 diffuse = uKd * d * color;
+  float s = 0;
+
+  if( dot(Normal,Light) > 0. ) {
+    vec3 ref = normalize( reflect( -Light, Normal ) );
+    s = pow( max( dot(Eye,ref),0. ), uShininess );
+  }
+  vec3 specular = uKs * s * uSpecularColor;
+  gl_FragColor = vec4( ambient + diffuse + specular, 1. );
+}
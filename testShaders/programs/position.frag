@@ -0,0 +1,7 @@
+#version 120
+
+varying vec3 vColor;
+
+void main() {
+  gl_FragColor = vec4(vColor, 1.0);
+}
@@ -0,0 +1,11 @@
+#version 120
+
+varying vec3 vColor;
+
+void main() {
+  vec4 pos = gl_Vertex;
+  // the shapes here are small, so spread their colors out
+  vColor = pos.xyz * 4.0 + 0.5;
+
+  gl_Position = gl_ModelViewProjectionMatrix * gl_Vertex;
+}
@@ -0,0 +1,9 @@
+#version 120
+
+uniform sampler2D uTexture;
+uniform float uRepeat;
+varying vec2 vST;
+
+void main() {
+  gl_FragColor = texture2D(uTexture, vST * uRepeat);
+}
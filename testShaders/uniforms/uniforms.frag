@@ -0,0 +1,31 @@
+#version 120
+
+const int MAXLIGHTS = 4;
+
+uniform int uLightCount;
+uniform vec3 uLightPositions[MAXLIGHTS];
+uniform vec3 uLightColors[MAXLIGHTS];
+uniform vec3 uColor;
+uniform float uKa;
+uniform bool uBands;
+uniform float uBandWeights[4];
+
+varying vec3 vN, vPosition;
+
+void main() {
+  vec3 Normal = normalize(vN);
+  vec3 light = vec3(uKa);
+
+  for (int i = 0; i < MAXLIGHTS; i++) {
+    if (i >= uLightCount) {
+      break;
+    }
+    float d = max(dot(Normal, normalize(uLightPositions[i] - vPosition)), 0.0);
+    // cartoon shading picks the brightness from the table of bands
+    if (uBands) {
+      d = uBandWeights[int(min(d * 4.0, 3.0))];
+    }
+    light += d * uLightColors[i];
+  }
+  gl_FragColor = vec4(light * uColor, 1.0);
+}
@@ -0,0 +1,14 @@
+#version 120
+
+uniform mat4 uTransform;
+
+varying vec3 vN, vPosition;
+
+void main() {
+  vec4 position = uTransform * gl_Vertex;
+  vec4 ECposition = gl_ModelViewMatrix * position;
+  vN = normalize(gl_NormalMatrix * mat3(uTransform) * gl_Normal);
+  vPosition = ECposition.xyz;
+
+  gl_Position = gl_ModelViewProjectionMatrix * position;
+}